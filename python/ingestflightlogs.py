@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# Copyright 2026 Donour Sizemore
+#
+# This file is part of RacePi
+#
+# RacePi is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 2.
+#
+# RacePi is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RacePi.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Recover and load flight recorder logs left by the sensor logger, such as
+sessions interrupted by a power loss. Run before the logger is started.
+"""
+
+import sys
+
+from racepi.database.db_handler import DbHandler
+from racepi.database.session_cache import SessionCache, get_cache_dir
+from racepi.sensor.recorder.flight_recorder import find_flight_logs, get_flight_log_dir, \
+    recover_flight_log, ingest_flight_log
+
+DEFAULT_SQLITE_FILE = '/external/racepi_data/test.db'
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if a != '--keep']
+    keep = len(args) < len(sys.argv) - 1
+    dbfile = args[0] if args else DEFAULT_SQLITE_FILE
+    log_dir = args[1] if len(args) > 1 else get_flight_log_dir(dbfile)
+
+    logs = find_flight_logs(log_dir)
+    if not logs:
+        sys.exit(0)
+
+    db_handler = DbHandler(dbfile)
+    db_handler.connect()
+    session_cache = SessionCache(get_cache_dir(dbfile))
+    if not session_cache.is_available():
+        session_cache = None
+
+    for path in logs:
+        try:
+            reader = recover_flight_log(path)
+            print("Recovered %s: %d blocks, %d samples, %d corrupt bytes, %d lost blocks" %
+                  (path, reader.block_count, reader.sample_count, reader.corrupt_bytes, reader.lost_blocks))
+            ingest_flight_log(path, db_handler, session_cache, keep)
+            print("Loaded session %s" % reader.session_id)
+        except Exception as e:
+            print("Failed to load %s: %s" % (path, e))
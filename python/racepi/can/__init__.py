@@ -14,7 +14,7 @@
 # You should have received a copy of the GNU General Public License
 # along with RacePi.  If not, see <http://www.gnu.org/licenses/>.
 
-from racepi.can.data import CanFrameValueExtractor, CanFrame
+from racepi.can.data import CanFrameValueExtractor, CanFrame, CanSample
 from math import pi
 
 # Focus RS Mk3 CAN converters
@@ -17,6 +17,120 @@
 Decoding and transform tools for CAN frames.
 """
 
+from collections import namedtuple
+
+import numpy as np
+
+# flags, as defined by socketcan in the top bits of the can_id
+CAN_EFF_FLAG = 0x80000000  # extended (29bit) frame format
+CAN_RTR_FLAG = 0x40000000  # remote transmission request
+CAN_ERR_FLAG = 0x20000000  # error message frame
+CAN_SFF_MASK = 0x000007FF
+CAN_EFF_MASK = 0x1FFFFFFF
+
+# legacy samples are hex strings of a 3 character (11bit) id followed by the payload
+LEGACY_ID_LEN = 3
+# extended ids are written as 8 characters, as in STN11xx monitor output
+EXTENDED_ID_LEN = 8
+
+CAN_MAX_DLEN = 8
+
+
+def payloads_to_array(payloads):
+    """
+    Pack frame payloads into an array for vectorized decoding. Short
+    payloads are padded with zero bytes, as in CanFrameValueExtractor.
+
+    :param payloads: sequence of payloads as bytes or hex strings
+    :return: (N, 8) uint8 array
+    """
+    packed = bytearray()
+    for p in payloads:
+        if isinstance(p, str):
+            p = bytes.fromhex(p)
+        if len(p) > CAN_MAX_DLEN:
+            raise ValueError("Invalid can payload length: %d" % len(p))
+        packed += p
+        packed += bytes(CAN_MAX_DLEN - len(p))
+    return np.frombuffer(bytes(packed), dtype=np.uint8).reshape(-1, CAN_MAX_DLEN)
+
+
+class CanSample(namedtuple('CanSample', ['arbitration_id', 'payload', 'dlc', 'flags'])):
+    """
+    Binary CAN frame, as recorded by the CAN sensor handlers.
+
+    arbitration_id is an integer without flag bits, payload is bytes of
+    length dlc and flags holds the socketcan CAN_*_FLAG bits.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def create(cls, arbitration_id, payload, flags=0):
+        """
+        :param arbitration_id: integer id
+        :param payload: bytes or hex string of data payload
+        :param flags: socketcan flag bits
+        :return: CanSample
+        """
+        if isinstance(payload, str):
+            payload = bytes.fromhex(payload)
+        else:
+            payload = bytes(payload)
+        if len(payload) > 8:
+            raise ValueError("Invalid can payload length: %d" % len(payload))
+        return cls(arbitration_id, payload, len(payload), flags)
+
+    @classmethod
+    def from_hex(cls, value, extended=None):
+        """
+        Parse a hex string sample of an id followed by the payload, such as
+        the legacy '085deadbeef' or the extended '18daf1100211223344'
+
+        :param value: hex string, spaces are ignored
+        :param extended: True for an 8 digit (29bit) id, False for a 3 digit
+            (11bit) id. If None, the format is taken from the length: the
+            payload has an even number of digits, so 11bit samples have an
+            odd length and 29bit samples an even length.
+        :raises: ValueError if the string is not a valid sample
+        """
+        value = value.replace(' ', '')
+        if extended is None:
+            extended = len(value) % 2 == 0
+        id_len = EXTENDED_ID_LEN if extended else LEGACY_ID_LEN
+        if len(value) <= id_len:
+            raise ValueError("Invalid can data: " + value)
+        arbitration_id = int(value[:id_len], 16)
+        if extended:
+            if arbitration_id > CAN_EFF_MASK:
+                raise ValueError("Invalid can id: " + value[:id_len])
+            return cls.create(arbitration_id, value[id_len:], CAN_EFF_FLAG)
+        return cls.create(arbitration_id, value[id_len:])
+
+    @classmethod
+    def coerce(cls, value):
+        """
+        :param value: CanSample or legacy hex string sample
+        :return: CanSample
+        :raises: ValueError if the value is not a valid sample
+        """
+        if isinstance(value, cls):
+            return value
+        if isinstance(value, str):
+            return cls.from_hex(value)
+        raise ValueError("Invalid can data: " + str(value))
+
+    def to_hex(self):
+        """
+        :return: legacy hex string representation of sample
+        :raises: ValueError for extended ids, which the legacy format cannot hold
+        """
+        if self.arbitration_id > CAN_SFF_MASK:
+            raise ValueError("Extended id in legacy sample: 0x%x" % self.arbitration_id)
+        return "%03x" % self.arbitration_id + self.payload.hex()
+
+    def is_rtr(self):
+        return bool(self.flags & CAN_RTR_FLAG)
+
 
 class CanFrameValueExtractor:
     """
@@ -65,6 +179,42 @@ class CanFrameValueExtractor:
         mask = (field >> bas) << bas
         return (mask ^ field) >> (bas-self.len)
 
+    def __get_fields(self, frames):
+        frames = np.asarray(frames)
+        if frames.ndim == 1:
+            if frames.dtype != np.uint64:
+                raise ValueError("Packed frames must be uint64")
+            packed = frames
+        elif frames.ndim == 2 and frames.dtype == np.uint8 and frames.shape[1] <= CAN_MAX_DLEN:
+            if frames.shape[1] < CAN_MAX_DLEN:
+                frames = np.pad(frames, ((0, 0), (0, CAN_MAX_DLEN - frames.shape[1])))
+            # first payload byte is the most significant, as in __get_field
+            packed = np.ascontiguousarray(frames).view('>u8').ravel()
+        else:
+            raise ValueError("Frames must be an (N, 8) uint8 array or uint64 column")
+
+        shift = np.uint64(64 - self.start - self.len)
+        mask = np.uint64((1 << self.len) - 1)
+        return (packed.astype(np.uint64) >> shift) & mask
+
+    def convert_frames(self, frames):
+        """
+        Convert an array of data frames to values, vectorized
+        equivalent of convert_frame.
+
+        Linear transforms are computed in floating point. Custom
+        transforms are applied to each field in turn, since they
+        may not support arrays.
+
+        :param frames: (N, 8) uint8 array of payloads, see payloads_to_array,
+            or uint64 array of payloads packed with the first byte most significant
+        :return: float array of translated values
+        """
+        fields = self.__get_fields(frames)
+        if self.transform:
+            return np.array([self.transform(int(f)) for f in fields], dtype=np.float64)
+        return self.a*(fields.astype(np.float64)+self.b) + self.c
+
     def convert_frame(self, frame):
         """
         Convert the specified data frame to a
@@ -89,10 +239,16 @@ class CanFrame:
 
     def __init__(self, arbitration_id, payload):
         """
-        :param arbitration_id: hex string of arbId
-        :param payload: hex string of data payload
+        :param arbitration_id: hex string or integer of arbId
+        :param payload: hex string or bytes of data payload
         """
-        self.arbId, self.payload = self.__from_message_strings(arbitration_id, payload)
+        if isinstance(arbitration_id, int):
+            arbitration_id = "%04x" % arbitration_id if arbitration_id <= 0xFFFF else "%08x" % arbitration_id
+        if isinstance(payload, (bytes, bytearray)):
+            self.arbId, _ = self.__from_message_strings(arbitration_id, '')
+            self.payload = bytearray(payload)
+        else:
+            self.arbId, self.payload = self.__from_message_strings(arbitration_id, payload)
 
     @staticmethod
     def __from_message_strings(arbitration_id, payload):
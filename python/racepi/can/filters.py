@@ -0,0 +1,133 @@
+# Copyright 2026 Donour Sizemore
+#
+# This file is part of RacePi
+#
+# RacePi is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 2
+#
+# RacePi is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RacePi.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Acceptance filters for CAN receivers, in the socketcan (can_id, can_mask)
+form used by CAN_RAW_FILTER. A frame is accepted by a filter when
+received_id & mask == can_id & mask, including the flag bits.
+"""
+
+from racepi.can.data import CAN_EFF_FLAG, CAN_RTR_FLAG, CAN_SFF_MASK, CAN_EFF_MASK
+
+# maximum number of filters accepted by the kernel, CAN_RAW_FILTER_MAX
+MAX_KERNEL_FILTERS = 512
+
+# accepts every frame
+ACCEPT_ALL_FILTERS = [(0, 0)]
+
+
+def __parse_spec(spec):
+    """
+    :param spec: filter specification, see build_can_filters
+    :return: (frame formats, first id, last id), where the formats are
+        False for standard and True for extended frames
+    """
+    if hasattr(spec, 'frame_id'):
+        # cantools message. DBC files commonly mark 11 bit messages as
+        # extended, so, like the DL1 decoders, match the id without flags
+        # and accept both frame formats for ids that fit in 11 bits.
+        first = last = spec.frame_id & CAN_EFF_MASK
+        if spec.is_extended_frame or spec.frame_id & CAN_EFF_FLAG:
+            formats = (False, True)
+        else:
+            formats = (False,)
+    elif isinstance(spec, tuple):
+        first, last = spec
+        formats = (bool(first & CAN_EFF_FLAG or last & CAN_EFF_FLAG),)
+        first &= CAN_EFF_MASK
+        last &= CAN_EFF_MASK
+    else:
+        formats = (bool(spec & CAN_EFF_FLAG),)
+        first = last = spec & CAN_EFF_MASK
+
+    if first > last:
+        raise ValueError("Invalid CAN id range: 0x%x-0x%x" % (first, last))
+    if last > CAN_SFF_MASK:
+        formats = (True,)
+    return formats, first, last
+
+
+def __merge_ranges(ranges):
+    merged = []
+    for first, last in sorted(ranges):
+        if merged and first <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], last)
+        else:
+            merged.append([first, last])
+    return merged
+
+
+def __range_to_blocks(first, last):
+    """
+    Split an id range into the fewest aligned power of two blocks
+
+    :return: list of (base id, block size)
+    """
+    blocks = []
+    while first <= last:
+        size = first & -first if first else 1 << 29
+        while size > last - first + 1:
+            size >>= 1
+        blocks.append((first, size))
+        first += size
+    return blocks
+
+
+def build_can_filters(specs):
+    """
+    Build the smallest exact set of acceptance filters for a list of
+    arbitration ids. Adjacent and overlapping ids are merged and each
+    range is covered by masked blocks, so no unwanted ids are accepted.
+
+    Ids above 0x7FF, or with CAN_EFF_FLAG set, are extended (29 bit) ids.
+    Cantools messages flagged as extended with ids that fit in 11 bits
+    accept both frame formats.
+    Every filter also matches the frame format and rejects remote
+    transmission requests.
+
+    :param specs: list of integer ids, inclusive (first, last) id ranges or
+        cantools messages. None or an empty list accepts every frame.
+    :return: list of (can_id, can_mask)
+    """
+    if not specs:
+        return list(ACCEPT_ALL_FILTERS)
+
+    ranges = {False: [], True: []}
+    for spec in specs:
+        formats, first, last = __parse_spec(spec)
+        for extended in formats:
+            ranges[extended].append((first, last))
+
+    filters = []
+    for extended in (False, True):
+        id_mask = CAN_EFF_MASK if extended else CAN_SFF_MASK
+        flags = CAN_EFF_FLAG if extended else 0
+        for first, last in __merge_ranges(ranges[extended]):
+            for base, size in __range_to_blocks(first, last):
+                mask = (id_mask & ~(size - 1)) | CAN_EFF_FLAG | CAN_RTR_FLAG
+                filters.append((base | flags, mask))
+
+    if len(filters) > MAX_KERNEL_FILTERS:
+        raise ValueError("Too many CAN filters: %d" % len(filters))
+    return filters
+
+
+def filter_accepts(filters, can_id):
+    """
+    :param filters: list of (can_id, can_mask)
+    :param can_id: received id including flag bits
+    :return: True if any filter accepts the id
+    """
+    return any(can_id & mask == f & mask for f, mask in filters)
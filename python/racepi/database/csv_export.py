@@ -0,0 +1,152 @@
+# Copyright 2026 Donour Sizemore
+#
+# This file is part of RacePi
+#
+# RacePi is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 2.
+#
+# RacePi is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RacePi.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Streaming CSV export of recorded data. Each sensor table is read with
+its own time ordered cursor, in batches, and the cursors are merged by
+timestamp, so an export of any size is produced in constant memory.
+"""
+
+import zlib
+
+from sqlalchemy import select
+
+from racepi.database.objects import GPSData, IMUData, CANData
+from racepi.sensor.data_utilities import iter_ordered_log
+
+EXPORT_COLUMNS = ['session_id', 'timestamp', 'type', 'time', 'speed', 'track', 'lat', 'lon', 'epx', 'epy', 'epv',
+                  'arbitration_id', 'msg', 'r', 'p', 'y', 'x_accel', 'y_accel', 'z_accel', 'x_gyro', 'y_gyro', 'z_gyro']
+
+# channel name: (table, type column value, exported columns)
+EXPORT_CHANNELS = {
+    'gps': (GPSData, 'GPS', ['time', 'speed', 'track', 'lat', 'lon', 'epx', 'epy', 'epv']),
+    'can': (CANData, 'CAN', ['arbitration_id', 'msg']),
+    'imu': (IMUData, 'IMU', ['r', 'p', 'y', 'x_accel', 'y_accel', 'z_accel', 'x_gyro', 'y_gyro', 'z_gyro']),
+}
+
+DEFAULT_FETCH_SIZE = 1000  # rows read from a cursor at a time
+DEFAULT_CHUNK_SIZE = 64 * 1024  # characters of csv text per chunk
+GZIP_WBITS = 16 + zlib.MAX_WBITS  # gzip container
+
+
+def __format_value(v):
+    if v is None:
+        return ''
+    if isinstance(v, bytes):
+        return v.hex()
+    return str(v)
+
+
+def __iter_channel(connection, channel, session_id, start, end, fetch_size):
+    """
+    :return: generator of (timestamp, csv line) of a channel in time order
+    """
+    table, type_name, columns = EXPORT_CHANNELS[channel]
+    query = select([table.session_id, table.timestamp] + [getattr(table, c) for c in columns])
+    if session_id is not None:
+        query = query.where(table.session_id == session_id)
+    if start is not None:
+        query = query.where(table.timestamp >= start)
+    if end is not None:
+        query = query.where(table.timestamp < end)
+    result = connection.execution_options(stream_results=True).execute(query.order_by(table.timestamp))
+
+    # position of each exported column in the csv row
+    positions = [EXPORT_COLUMNS.index(c) for c in columns]
+    empty = [''] * len(EXPORT_COLUMNS)
+    try:
+        while True:
+            rows = result.fetchmany(fetch_size)
+            if not rows:
+                break
+            for row in rows:
+                fields = list(empty)
+                fields[0] = __format_value(row[0])
+                fields[1] = __format_value(row[1])
+                fields[2] = type_name
+                for i, v in zip(positions, row[2:]):
+                    fields[i] = __format_value(v)
+                yield row[1], ','.join(fields)
+    finally:
+        result.close()
+
+
+def __iter_lines(cursors):
+    yield "#" + ','.join(EXPORT_COLUMNS)
+    for _, _, line in iter_ordered_log(cursors):
+        yield line
+
+
+def iter_csv_lines(connection, session_id=None, start=None, end=None, channels=None,
+                   fetch_size=DEFAULT_FETCH_SIZE):
+    """
+    Generate the exported csv lines, a header followed by the rows of
+    every channel in time order
+
+    :param connection: SQLAlchemy connection to the database
+    :param session_id: session to export, all sessions if None
+    :param start: earliest timestamp exported, inclusive
+    :param end: latest timestamp exported, exclusive
+    :param channels: list of channel names to export, all channels if None
+    :param fetch_size: rows read from each cursor at a time
+    :return: generator of csv lines, without line endings
+    :raises: ValueError for unknown channels
+    """
+    if channels is None:
+        channels = list(EXPORT_CHANNELS)
+    for c in channels:
+        if c not in EXPORT_CHANNELS:
+            raise ValueError("Invalid export channel: " + str(c))
+    cursors = {c: __iter_channel(connection, c, session_id, start, end, fetch_size) for c in channels}
+    return __iter_lines(cursors)
+
+
+def iter_chunks(lines, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Join lines into chunks of roughly chunk_size characters, to avoid
+    sending a response fragment for every row
+
+    :param lines: iterable of lines, without line endings
+    :return: generator of text chunks
+    """
+    pending = []
+    size = 0
+    for line in lines:
+        pending.append(line)
+        size += len(line) + 1
+        if size >= chunk_size:
+            pending.append('')
+            yield '\n'.join(pending)
+            pending = []
+            size = 0
+    if pending:
+        pending.append('')
+        yield '\n'.join(pending)
+
+
+def iter_gzip(chunks, level=6):
+    """
+    Compress a stream of text chunks into a gzip stream
+
+    :param chunks: iterable of text chunks
+    :param level: zlib compression level
+    :return: generator of compressed bytes
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, GZIP_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
@@ -15,44 +15,70 @@
 # along with RacePi.  If not, see <http://www.gnu.org/licenses/>.
 
 from uuid import uuid1
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, func
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.orm.exc import NoResultFound, MultipleResultsFound
 
+from racepi.can.data import CanSample
+from racepi.database.migrations import migrate
 from racepi.database.objects import *
+from racepi.database.session_summary import SessionSummary
 from racepi.sensor.data_utilities import uptime_helper
 
 
+# time a connection waits for another connection's write lock, in seconds
+DEFAULT_BUSY_TIMEOUT = 30.0
+
+
 class DbHandler:
     """
     Class for handling RacePi access to sqlite
     """
 
-    def __init__(self, db_path):
+    def __init__(self, db_path, busy_timeout=DEFAULT_BUSY_TIMEOUT):
+        """
+        :param db_path: path of the sqlite database
+        :param busy_timeout: time to wait for a lock held by another connection,
+            in seconds, before failing with "database is locked"
+        """
         self.db_path = db_path
+        self.busy_timeout = busy_timeout
         self.db_session = None
 
     def connect(self):
-        engine = create_engine('sqlite:///' + self.db_path)
+        migrate(self.db_path)
+        # the handler may be used from a writer thread other than the
+        # one that connected, but never from more than one at a time
+        engine = create_engine('sqlite:///' + self.db_path,
+                               connect_args={'check_same_thread': False, 'timeout': self.busy_timeout})
         Base.metadata.bind = engine
         sm = sessionmaker(bind=engine)
         self.db_session = sm()
         self.db_session.execute("PRAGMA foreign_keys = ON;")
         self.db_session.execute("PRAGMA journal_mode = WAL;")
+        self.db_session.commit()
         # TODO: ensure that the requested file exists and that
         # the required tables are here
 
-    def get_new_session(self):
+    @staticmethod
+    def generate_session_id():
+        """
+        :return: new unique session id string
+        """
+        return str(uuid1())
+
+    def get_new_session(self, session_id=None):
         """
         Create new session entry in database
         The session name includes the current system uptime.
 
+        :param session_id: id to use for the session, generated if not specified
         :return: session id as UUID
         """
         if not self.db_session:
             raise RuntimeError("Database not connected")
         s = Session()
-        s.id = str(uuid1())
+        s.id = session_id if session_id else self.generate_session_id()
         s.description = "Created by RacePi (uptime: %.0fs)" % uptime_helper()
         self.db_session.add(s)
         self.db_session.commit()
@@ -82,9 +108,9 @@ class DbHandler:
                 v.speed = float(data.get("speed"))
                 v.track = float(data.get("track"))
                 v.time = data.get("time")
-                v.epv = data.get("epv")
-                v.epx = data.get("epx")
-                v.epy = data.get("epy")
+                v.epv = self.__optional_float(data.get("epv"))
+                v.epx = self.__optional_float(data.get("epx"))
+                v.epy = self.__optional_float(data.get("epy"))
                 self.db_session.add(v)
             except ValueError:
                 # skip invalid data
@@ -120,18 +146,17 @@ class DbHandler:
 
         for sample in can_data:
             t, raw = sample
-            if len(raw) < 5:
+            try:
+                frame = CanSample.coerce(raw)
+            except ValueError:
                 raise RuntimeWarning("Invalid can data: ", raw)
-            else:
-                arb_id = raw[:3]
-                payload = raw[3:]
-                v = CANData()
-                v.timestamp = t
-                v.session_id = session_id
-                v.arbitration_id = int(arb_id, 16)
-                v.rtr = 0
-                v.msg = payload
-                self.db_session.add(v)
+            v = CANData()
+            v.timestamp = t
+            v.session_id = session_id
+            v.arbitration_id = frame.arbitration_id
+            v.rtr = int(frame.is_rtr())
+            v.msg = frame.payload
+            self.db_session.add(v)
 
         self.db_session.commit()
 
@@ -185,6 +210,9 @@ class DbHandler:
         Populate the session info data with metadata from the
         sensor tables. The includes statistics about the session.
 
+        This queries the recorded data. Sessions recorded by the logger
+        are summarized while recording, see write_session_info.
+
         :param session_id: The ID of the session
         :return:
         """
@@ -194,17 +222,32 @@ class DbHandler:
         if not self.db_session:
             raise RuntimeWarning("No database connected")
 
-        gps_data = self.db_session.query(GPSData).filter(GPSData.session_id == session_id).\
-            order_by(GPSData.timestamp).all()
-        imu_data_count = self.db_session.query(IMUData).filter(IMUData.session_id == session_id).\
-            order_by(IMUData.timestamp).count()
-        can_data_count = self.db_session.query(CANData).filter(CANData.session_id == session_id).\
-            order_by(CANData.timestamp).count()
-        tire_data_count = self.db_session.query(TireData).filter(TireData.session_id == session_id).\
-            order_by(TireData.timestamp).count()
-
-        # if we only have one sample of speed, there isn't enough data to calculate stats
-        if len(gps_data) > 2:
+        summary = SessionSummary()
+        gps_count, max_speed, start_time, stop_time = \
+            self.db_session.query(func.count(GPSData.timestamp), func.max(GPSData.speed),
+                                  func.min(GPSData.timestamp), func.max(GPSData.timestamp)).\
+            filter(GPSData.session_id == session_id).one()
+        summary.sample_counts['gps'] = gps_count
+        summary.max_speed = max_speed
+        summary.start_time = start_time
+        summary.stop_time = stop_time
+        for source, table in [('imu', IMUData), ('can', CANData), ('tpms', TireData)]:
+            summary.sample_counts[source] = \
+                self.db_session.query(table).filter(table.session_id == session_id).count()
+
+        self.write_session_info(session_id, summary)
+
+    def write_session_info(self, session_id, summary):
+        """
+        Write session statistics to the session info table
+
+        :param session_id: The ID of the session
+        :param summary: SessionSummary for the session
+        """
+        if not self.db_session:
+            raise RuntimeWarning("No database connected")
+
+        if summary.has_stats():
             try:
                 si = self.db_session.query(SessionInfo).filter(SessionInfo.session_id == session_id).one()
             except NoResultFound:
@@ -212,29 +255,126 @@ class DbHandler:
                 self.db_session.add(si)
             except MultipleResultsFound:
                 print("Warning: Multiple info entries for session " + session_id)
+                return
 
             si.session_id = session_id
-            si.num_data_samples = len(gps_data) + imu_data_count + can_data_count + tire_data_count
-            si.start_time_utc = gps_data[0].timestamp
-            si.duration = gps_data[1].timestamp - gps_data[0].timestamp
-            si.max_speed = max([x.speed for x in gps_data])
+            si.num_data_samples = summary.get_num_data_samples()
+            si.start_time_utc = summary.start_time
+            si.duration = summary.get_duration()
+            si.max_speed = summary.max_speed
 
         self.db_session.commit()
 
+    @staticmethod
+    def __optional_float(v):
+        """
+        :return: float value of v, None for missing values such as gpsd's 'n/a'
+        """
+        try:
+            return float(v)
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def get_gps_rows(gps_data, session_id):
+        """
+        Convert GPS samples to rows for bulk insertion. Invalid samples are skipped.
+        """
+        rows = []
+        for t, data in gps_data:
+            try:
+                rows.append({
+                    'session_id': session_id,
+                    'timestamp': t,
+                    'lat': float(data.get("lat")),
+                    'lon': float(data.get("lon")),
+                    'alt': float(data.get("alt")),
+                    'speed': float(data.get("speed")),
+                    'track': float(data.get("track")),
+                    'time': data.get("time"),
+                    'epv': DbHandler.__optional_float(data.get("epv")),
+                    'epx': DbHandler.__optional_float(data.get("epx")),
+                    'epy': DbHandler.__optional_float(data.get("epy")),
+                })
+            except (TypeError, ValueError):
+                pass  # skip invalid data
+        return rows
+
+    @staticmethod
+    def get_imu_rows(imu_data, session_id):
+        """
+        Convert IMU samples to rows for bulk insertion. Invalid samples are skipped.
+        """
+        rows = []
+        for sample in imu_data:
+            if not sample:
+                continue
+            t, data = sample
+            try:
+                r, p, y = data.get('fusionPose')
+                x_accel, y_accel, z_accel = data.get('accel')
+                x_gyro, y_gyro, z_gyro = data.get('gyro')
+            except (TypeError, ValueError):
+                continue  # skip invalid data
+            rows.append({
+                'session_id': session_id, 'timestamp': t,
+                'r': r, 'p': p, 'y': y,
+                'x_accel': x_accel, 'y_accel': y_accel, 'z_accel': z_accel,
+                'x_gyro': x_gyro, 'y_gyro': y_gyro, 'z_gyro': z_gyro,
+            })
+        return rows
+
+    @staticmethod
+    def get_can_rows(can_data, session_id):
+        """
+        Convert CAN samples to rows for bulk insertion. Invalid samples are skipped.
+        """
+        rows = []
+        for t, raw in can_data:
+            try:
+                frame = CanSample.coerce(raw)
+            except ValueError:
+                continue  # skip invalid data
+            rows.append({
+                'session_id': session_id,
+                'timestamp': t,
+                'arbitration_id': frame.arbitration_id,
+                'rtr': int(frame.is_rtr()),
+                'msg': frame.payload,
+            })
+        return rows
+
     def log_data_from_active_session(self, data, session_id):
         """
-        Write a dictionary of data to the database
+        Write a dictionary of data to the database. All sensor tables are
+        written with bulk inserts in a single transaction, bypassing the
+        ORM unit of work.
 
         :param data: DataBuffer of recorded data
         :param session_id: id of current sessions
+        :return: dictionary of rows written for each sensor source
         """
-        # TODO: change do a single insert/transaction
-        # TODO: change this to a background thread
+        if not self.db_session:
+            raise RuntimeWarning("No database connected")
+
+        sources = data.get_available_sources()
+        inserts = {}
+        if 'gps' in sources:
+            inserts['gps'] = (GPSData, self.get_gps_rows(data.get_sensor_data('gps'), session_id))
+        if 'imu' in sources:
+            inserts['imu'] = (IMUData, self.get_imu_rows(data.get_sensor_data('imu'), session_id))
+        if 'can' in sources:
+            inserts['can'] = (CANData, self.get_can_rows(data.get_sensor_data('can'), session_id))
+        # TODO workout whether TPMS data makes sense to keep
+
         try:
-            self.insert_gps_updates(data.get_sensor_data('gps'), session_id)
-            self.insert_imu_updates(data.get_sensor_data('imu'), session_id)
-            self.insert_can_updates(data.get_sensor_data('can'), session_id)
-            # TODO workout whether TPMS data makes sense to keep
-            # self.db_handler.insert_tpms_updates(self.data.get_sensor_data('tpms'), self.session_id)
-        except TypeError as te:
-            print("Failed to insert data: %s" % te)
+            for table, rows in inserts.values():
+                if rows:
+                    # a list of parameters is sent as a single executemany
+                    self.db_session.execute(table.__table__.insert(), rows)
+            self.db_session.commit()
+        except Exception:
+            self.db_session.rollback()
+            raise
+
+        return {source: rows for source, (_, rows) in inserts.items()}
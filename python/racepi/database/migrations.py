@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# Copyright 2026 Donour Sizemore
+#
+# This file is part of RacePi
+#
+# RacePi is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 2.
+#
+# RacePi is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RacePi.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Versioned schema migrations for RacePi databases.
+
+The schema version is stored in the sqlite user_version pragma. Each
+migration runs in its own transaction together with the version update,
+so an interrupted upgrade leaves the database at the last complete
+version and can simply be rerun.
+
+Usage: python3 -m racepi.database.migrations <sqlite db filename> ...
+"""
+
+import sqlite3
+import sys
+
+# (index name, table, columns)
+SESSION_TIME_INDEXES = [
+    ("ix_gps_data_session_time", "gps_data", "session_id, timestamp"),
+    ("ix_imu_data_session_time", "imu_data", "session_id, timestamp"),
+    ("ix_tire_data_session_time", "tire_data", "session_id, timestamp"),
+    ("ix_can_data_session_id_time", "can_data", "session_id, arbitration_id, timestamp"),
+]
+
+CONVERSION_BATCH_SIZE = 10000
+
+
+def get_tables(conn):
+    return set(r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'"))
+
+
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def add_session_time_indexes(conn):
+    """
+    Index sensor data by session and time, the access pattern for every
+    session query. CAN data is also indexed by arbitration id, since
+    readers usually want a small number of messages from a session.
+    """
+    tables = get_tables(conn)
+    for name, table, columns in SESSION_TIME_INDEXES:
+        # older databases don't have every sensor table
+        if table in tables:
+            conn.execute("CREATE INDEX IF NOT EXISTS %s ON %s (%s)" % (name, table, columns))
+
+
+def convert_can_payloads_to_blob(conn):
+    """
+    Convert CAN payloads stored as hex strings to bytes. Rows are
+    converted in batches to bound memory use on large databases.
+    Unparseable payloads are left unchanged.
+    """
+    if "can_data" not in get_tables(conn):
+        return
+    last_rowid = -1
+    while True:
+        rows = conn.execute("SELECT rowid, msg FROM can_data WHERE rowid > ? AND typeof(msg) = 'text' "
+                            "ORDER BY rowid LIMIT ?", (last_rowid, CONVERSION_BATCH_SIZE)).fetchall()
+        if not rows:
+            break
+        updates = []
+        for rowid, msg in rows:
+            try:
+                updates.append((bytes.fromhex(msg), rowid))
+            except ValueError:
+                pass
+        conn.executemany("UPDATE can_data SET msg = ? WHERE rowid = ?", updates)
+        last_rowid = rows[-1][0]
+
+
+# Migrations are applied in order, the list index plus one is the
+# schema version after the migration. Never reorder or remove entries.
+MIGRATIONS = [
+    add_session_time_indexes,
+    convert_can_payloads_to_blob,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def migrate(db_path):
+    """
+    Upgrade a database in place to the current schema version. Empty
+    databases are left unchanged, their schema is created elsewhere.
+
+    :param db_path: sqlite db filename
+    :return: number of migrations applied
+    """
+    # autocommit mode, transactions are managed explicitly
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        if "sessions" not in get_tables(conn):
+            return 0
+        version = get_schema_version(conn)
+        if version > SCHEMA_VERSION:
+            raise RuntimeError("Database schema version %d is newer than supported version %d" %
+                               (version, SCHEMA_VERSION))
+        for v in range(version, SCHEMA_VERSION):
+            conn.execute("BEGIN")
+            try:
+                MIGRATIONS[v](conn)
+                conn.execute("PRAGMA user_version = %d" % (v + 1))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return SCHEMA_VERSION - version
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: %s <sqlite db filename> ..." % sys.argv[0])
+        sys.exit(1)
+
+    for f in sys.argv[1:]:
+        applied = migrate(f)
+        print("%s: applied %d migrations, schema version %d" % (f, applied, SCHEMA_VERSION))
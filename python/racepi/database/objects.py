@@ -16,7 +16,7 @@
 
 # TODO finish ORM code
 
-from sqlalchemy import Column, ForeignKey, Integer, String, Binary, BLOB, TEXT, DATETIME, REAL, VARCHAR
+from sqlalchemy import Column, ForeignKey, Index, Integer, String, Binary, BLOB, TEXT, DATETIME, REAL, VARCHAR
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
@@ -39,6 +39,7 @@ class SessionInfo(Base):
 
 class IMUData(Base):
     __tablename__ = "imu_data"
+    __table_args__ = (Index('ix_imu_data_session_time', 'session_id', 'timestamp'),)
     session_id = Column(TEXT, ForeignKey("sessions.id"), nullable=False)
     timestamp = Column(REAL, nullable=False, primary_key=True)
     r = Column(REAL)
@@ -54,6 +55,7 @@ class IMUData(Base):
 
 class GPSData(Base):
     __tablename__ = "gps_data"
+    __table_args__ = (Index('ix_gps_data_session_time', 'session_id', 'timestamp'),)
     session_id = Column(TEXT, ForeignKey("sessions.id"), nullable=False)
     timestamp = Column(REAL, primary_key=True, nullable=False)
     time = Column(VARCHAR)
@@ -69,15 +71,17 @@ class GPSData(Base):
 
 class CANData(Base):
     __tablename__ = "can_data"
+    __table_args__ = (Index('ix_can_data_session_id_time', 'session_id', 'arbitration_id', 'timestamp'),)
     session_id = Column(TEXT, ForeignKey("sessions.id"), nullable=False)
     timestamp = Column(REAL, primary_key=True, nullable=False)
     arbitration_id = Column(Integer, nullable=False)  # base (11bit) or extended (29bit)
     rtr = Column(Integer, nullable=False)  # 0 for data frames, 1 for data requests
-    msg = Column(TEXT, nullable=False)  # data payload, string of 8 hexidecimal bytes
+    msg = Column(BLOB, nullable=False)  # data payload, up to 8 bytes
 
 
 class TireData(Base):
     __tablename__ = "tire_data"
+    __table_args__ = (Index('ix_tire_data_session_time', 'session_id', 'timestamp'),)
     session_id = Column(TEXT, ForeignKey("sessions.id"), nullable=False)
     timestamp = Column(REAL, primary_key=True, nullable=False)
     lf_pressure = Column(REAL)
@@ -23,5 +23,5 @@ class ProcessedCANSample(CANData):
     def value(self, can_frame_value_extractor):
         # convert fields to can frame and extract value
         # arbitration id is not used in conversion
-        f = CanFrame("000", self.msg)
+        f = CanFrame(0, self.msg)
         return can_frame_value_extractor.convert_frame(f)
@@ -0,0 +1,222 @@
+# Copyright 2026 Donour Sizemore
+#
+# This file is part of RacePi
+#
+# RacePi is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 2.
+#
+# RacePi is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RacePi.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Columnar cache of recorded sessions. When a session ends, its GPS and IMU
+data and decoded CAN channels are written as typed columns, together with
+the distance trace, to compressed Arrow files. Analysis tools memory map
+these files instead of querying and decoding the SQLite rows again.
+
+Each session is a directory of tables: gps, imu and can_<channel>. Every
+table has timestamp and distance columns, CAN tables hold the decoded
+value in the result column.
+
+pyarrow is optional. Without it no cache is written and loaders read
+from SQLite.
+"""
+
+import os
+import shutil
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:
+    pa = None
+
+from racepi.can import focus_rs_tps_converter, focus_rs_brake_pressure_converter, \
+    focus_rs_rpm_converter, focus_rs_steering_angle_converter, focus_rs_wheelspeed1_converter, \
+    focus_rs_wheelspeed2_converter, focus_rs_wheelspeed3_converter, focus_rs_wheelspeed4_converter
+from racepi.can.data import payloads_to_array
+from racepi.database.objects import GPSData, IMUData, CANData
+from racepi.sensor.data_utilities import TimeToDistanceConverter
+
+CACHE_VERSION = b'1'
+CACHE_COMPRESSION = 'zstd'
+CACHE_FILE_EXTENSION = '.arrow'
+
+# only gps samples in motion are used for the distance trace
+MIN_MOVING_SPEED = 0.25  # m/s
+
+GPS_COLUMNS = ['timestamp', 'speed', 'track', 'lat', 'lon', 'alt', 'epx', 'epy', 'epv']
+IMU_COLUMNS = ['timestamp', 'r', 'p', 'y', 'x_accel', 'y_accel', 'z_accel', 'x_gyro', 'y_gyro', 'z_gyro']
+
+# channel name: (arbitration id, value converter)
+DEFAULT_CAN_CHANNELS = {
+    'tps': (128, focus_rs_tps_converter),
+    'b_pres': (531, focus_rs_brake_pressure_converter),
+    'rpm': (144, focus_rs_rpm_converter),
+    'steering': (16, focus_rs_steering_angle_converter),
+    'wheelspeed1': (400, focus_rs_wheelspeed1_converter),
+    'wheelspeed2': (400, focus_rs_wheelspeed2_converter),
+    'wheelspeed3': (400, focus_rs_wheelspeed3_converter),
+    'wheelspeed4': (400, focus_rs_wheelspeed4_converter),
+}
+
+
+def get_cache_dir(db_path):
+    """
+    :param db_path: path of the session database
+    :return: directory of the database's session cache
+    """
+    return db_path + ".cache"
+
+
+def __query_columns(db_session, table, columns, session_id):
+    """
+    :return: dictionary of column name to float array, ordered by time
+    """
+    rows = db_session.query(*[getattr(table, c) for c in columns]).\
+        filter(table.session_id == session_id).order_by(table.timestamp).all()
+    # missing values are stored as nan
+    values = np.array(rows, dtype=np.float64).reshape(-1, len(columns))
+    return {c: values[:, i] for i, c in enumerate(columns)}
+
+
+def __distance_converter(gps):
+    moving = gps['speed'] > MIN_MOVING_SPEED
+    try:
+        return TimeToDistanceConverter(list(zip(gps['timestamp'][moving], gps['speed'][moving])))
+    except ValueError:
+        return None  # not enough motion for a distance trace
+
+
+def read_session_columns(db_session, session_id, can_channels=DEFAULT_CAN_CHANNELS):
+    """
+    Read a session from the database and decode its CAN channels
+
+    :param db_session: SQLAlchemy session of the database
+    :param session_id: id of the session
+    :param can_channels: dictionary of channel name to (arbitration id, value converter)
+    :return: dictionary of table name to dictionary of column name to array
+    """
+    tables = {
+        'gps': __query_columns(db_session, GPSData, GPS_COLUMNS, session_id),
+        'imu': __query_columns(db_session, IMUData, IMU_COLUMNS, session_id),
+    }
+
+    frames = {}
+    for channel, (arbitration_id, converter) in can_channels.items():
+        if arbitration_id not in frames:
+            rows = db_session.query(CANData.timestamp, CANData.msg).\
+                filter(CANData.session_id == session_id).filter(CANData.arbitration_id == arbitration_id).\
+                order_by(CANData.timestamp).all()
+            frames[arbitration_id] = (np.array([r.timestamp for r in rows], dtype=np.float64),
+                                      payloads_to_array([r.msg for r in rows]))
+        timestamps, payloads = frames[arbitration_id]
+        if len(timestamps):
+            tables['can_' + channel] = {'timestamp': timestamps, 'result': converter.convert_frames(payloads)}
+
+    tdc = __distance_converter(tables['gps'])
+    for columns in tables.values():
+        if tdc and len(columns['timestamp']):
+            columns['distance'] = tdc.generate_distance_trace(columns['timestamp'])
+        else:
+            columns['distance'] = np.full(len(columns['timestamp']), np.nan)
+    return tables
+
+
+class SessionCache:
+    """
+    Directory of cached sessions, see the module description
+    """
+
+    def __init__(self, cache_dir, can_channels=DEFAULT_CAN_CHANNELS):
+        """
+        :param cache_dir: directory holding the cached sessions
+        :param can_channels: dictionary of channel name to (arbitration id, value converter)
+        """
+        self.cache_dir = cache_dir
+        self.can_channels = can_channels
+
+    @staticmethod
+    def is_available():
+        """
+        :return: True if pyarrow is installed
+        """
+        return pa is not None
+
+    def get_session_dir(self, session_id):
+        return os.path.join(self.cache_dir, session_id)
+
+    def has_session(self, session_id):
+        return self.is_available() and os.path.isdir(self.get_session_dir(session_id))
+
+    def write_session(self, db_session, session_id):
+        """
+        Write a session from the database to the cache, replacing any
+        cached copy. Tables are written to a temporary directory that is
+        renamed when complete, so readers never see a partial session.
+
+        :param db_session: SQLAlchemy session of the database
+        :param session_id: id of the session
+        :return: False if pyarrow is not installed
+        """
+        if not self.is_available():
+            return False
+        tables = read_session_columns(db_session, session_id, self.can_channels)
+
+        session_dir = self.get_session_dir(session_id)
+        tmp_dir = session_dir + ".tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        options = pa.ipc.IpcWriteOptions(compression=CACHE_COMPRESSION)
+        metadata = {b'session_id': session_id.encode(), b'cache_version': CACHE_VERSION}
+        for name, columns in tables.items():
+            table = pa.table(columns).replace_schema_metadata(metadata)
+            with pa.OSFile(os.path.join(tmp_dir, name + CACHE_FILE_EXTENSION), 'wb') as f:
+                with pa.ipc.new_file(f, table.schema, options=options) as writer:
+                    writer.write_table(table)
+
+        shutil.rmtree(session_dir, ignore_errors=True)
+        os.rename(tmp_dir, session_dir)
+        return True
+
+    def read_table(self, session_id, name):
+        """
+        :param session_id: id of the session
+        :param name: table name, such as gps or can_rpm
+        :return: pyarrow Table, None if the table is not cached
+        """
+        if not self.is_available():
+            return None
+        path = os.path.join(self.get_session_dir(session_id), name + CACHE_FILE_EXTENSION)
+        if not os.path.exists(path):
+            return None
+        with pa.memory_map(path) as source:
+            table = pa.ipc.open_file(source).read_all()
+        if table.schema.metadata.get(b'cache_version') != CACHE_VERSION:
+            return None
+        return table
+
+    def read_session(self, session_id):
+        """
+        :param session_id: id of the session
+        :return: dictionary of table name to pyarrow Table, None if the session is not cached
+        """
+        if not self.has_session(session_id):
+            return None
+        session_dir = self.get_session_dir(session_id)
+        tables = {}
+        for filename in os.listdir(session_dir):
+            name, ext = os.path.splitext(filename)
+            if ext == CACHE_FILE_EXTENSION:
+                table = self.read_table(session_id, name)
+                if table is None:
+                    return None  # written by an incompatible version
+                tables[name] = table
+        return tables
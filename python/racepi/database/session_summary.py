@@ -0,0 +1,81 @@
+# Copyright 2026 Donour Sizemore
+#
+# This file is part of RacePi
+#
+# RacePi is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 2.
+#
+# RacePi is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RacePi.  If not, see <http://www.gnu.org/licenses/>.
+
+from collections import defaultdict
+
+# if we only have this many samples of speed, there isn't enough data to calculate stats
+MIN_GPS_SAMPLES = 2
+
+
+class SessionSummary:
+    """
+    Running statistics for a session, accumulated from the rows written
+    to the database. This is the data stored in the session_info table.
+    """
+
+    def __init__(self):
+        self.sample_counts = defaultdict(int)
+        self.max_speed = None
+        self.start_time = None
+        self.stop_time = None
+
+    def add_rows(self, source, rows):
+        """
+        Update statistics with rows written for a sensor source
+
+        :param source: name of sensor source
+        :param rows: list of row dictionaries, as written to the database
+        """
+        self.sample_counts[source] += len(rows)
+        if source == 'gps' and rows:
+            speed = max(r['speed'] for r in rows)
+            if self.max_speed is None or speed > self.max_speed:
+                self.max_speed = speed
+            first = rows[0]['timestamp']
+            last = rows[-1]['timestamp']
+            if self.start_time is None or first < self.start_time:
+                self.start_time = first
+            if self.stop_time is None or last > self.stop_time:
+                self.stop_time = last
+
+    def merge(self, other):
+        """
+        Add the statistics of another part of the same session
+
+        :param other: SessionSummary of the other part
+        """
+        for source, count in other.sample_counts.items():
+            self.sample_counts[source] += count
+        if other.max_speed is not None and (self.max_speed is None or other.max_speed > self.max_speed):
+            self.max_speed = other.max_speed
+        if other.start_time is not None and (self.start_time is None or other.start_time < self.start_time):
+            self.start_time = other.start_time
+        if other.stop_time is not None and (self.stop_time is None or other.stop_time > self.stop_time):
+            self.stop_time = other.stop_time
+
+    def has_stats(self):
+        """
+        :return: True if there is enough GPS data to describe the session
+        """
+        return self.sample_counts['gps'] > MIN_GPS_SAMPLES
+
+    def get_num_data_samples(self):
+        return sum(self.sample_counts.values())
+
+    def get_duration(self):
+        if self.start_time is None:
+            return None
+        return self.stop_time - self.start_time
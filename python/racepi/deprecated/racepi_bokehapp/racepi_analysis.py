@@ -26,6 +26,8 @@ from bokeh.plotting import figure
 from scipy.signal import savgol_filter
 
 from racepi_can_decoder import *
+from racepi.can.data import payloads_to_array
+from racepi.database.session_cache import SessionCache, get_cache_dir, MIN_MOVING_SPEED
 from racepi.sensor.data_utilities import TimeToDistanceConverter
 
 RACEPI_MAP_SIZE = 600
@@ -35,6 +37,7 @@ class RacePiDBSession:
 
     def __init__(self, db_location):
         self.db = create_engine("sqlite:///" + db_location)
+        self.cache = SessionCache(get_cache_dir(db_location))
         # TODO: sanity check that expected tables exist
 
     def __get_sql_data(self, table, row_filter="1=1"):
@@ -49,8 +52,8 @@ class RacePiDBSession:
         # no gps speed samples are really zero, but we only
         # need the ones that indicate motion
         return pd.read_sql_query(
-            "select timestamp, speed, track, lat, lon FROM %s where speed>0.25 and session_id='%s'" %
-            ("gps_data", session_id), self.db, index_col='timestamp')
+            "select timestamp, speed, track, lat, lon FROM %s where speed>%s and session_id='%s'" %
+            ("gps_data", MIN_MOVING_SPEED, session_id), self.db, index_col='timestamp')
 
     def get_imu_data(self, session_id):
         return pd.read_sql_query(
@@ -62,10 +65,57 @@ class RacePiDBSession:
             ("can_data", session_id, arbitration_id)
         data = pd.read_sql_query(query, self.db, index_col='timestamp')
 
-        data['result'] = [value_converter.convert_frame(CanFrame('999', x)) for x in data.msg.tolist()]
+        data['result'] = value_converter.convert_frames(payloads_to_array(data.msg.tolist()))
         data['distance'] = time_distance_converter.generate_distance_trace(data.index)
         return data
 
+    def get_cached_session(self, session_id):
+        """
+        :return: (gps, imu, dictionary of can channels) data frames from
+            the session cache, None if the session is not cached
+        """
+        tables = self.cache.read_session(session_id)
+        if not tables:
+            return None
+        frames = {name: t.to_pandas().set_index('timestamp') for name, t in tables.items()}
+        gps_data = frames.pop('gps')[['speed', 'track', 'lat', 'lon', 'distance']]
+        gps_data = gps_data[gps_data.speed > MIN_MOVING_SPEED]
+        imu_data = frames.pop('imu')[['x_accel', 'y_accel', 'z_accel', 'distance']]
+        can_channels = {name[len('can_'):]: f for name, f in frames.items() if name.startswith('can_')}
+        return gps_data, imu_data, can_channels
+
+    def get_session(self, session_id):
+        """
+        Load a session with its distance traces, from the session cache
+        if available and otherwise from the database
+
+        :return: (gps, imu, dictionary of can channels) data frames
+        """
+        cached = self.get_cached_session(session_id)
+        if cached:
+            return cached
+
+        gps_data = self.get_gps_data(session_id)
+        imu_data = self.get_imu_data(session_id)
+        tdc = TimeToDistanceConverter(list(zip(gps_data.index, gps_data['speed'])))
+        gps_data['distance'] = tdc.generate_distance_trace(gps_data.index)
+        imu_data['distance'] = tdc.generate_distance_trace(imu_data.index)
+
+        try:
+            can_channels = {
+                 'tps': self.get_and_transform_can_data(session_id, 128, focus_rs_tps_converter, tdc),
+                 'b_pres': self.get_and_transform_can_data(session_id, 531, focus_rs_brake_pressure_converter, tdc),
+                 'rpm': self.get_and_transform_can_data(session_id, 144, focus_rs_rpm_converter, tdc),
+                 'wheelspeed1': self.get_and_transform_can_data(session_id, 400, focus_rs_wheelspeed1_converter, tdc),
+                 'wheelspeed2': self.get_and_transform_can_data(session_id, 400, focus_rs_wheelspeed2_converter, tdc),
+                 'wheelspeed3': self.get_and_transform_can_data(session_id, 400, focus_rs_wheelspeed3_converter, tdc),
+                 'wheelspeed4': self.get_and_transform_can_data(session_id, 400, focus_rs_wheelspeed4_converter, tdc)
+            }
+        except ValueError as e:
+            print("Error loading can channels: " + str(e))
+            can_channels = {}
+        return gps_data, imu_data, can_channels
+
 
 class RunView:
 
@@ -98,25 +148,7 @@ class RacePiAnalysis:
         :param v: view
         """
         session_id = session_info[0]
-        gps_data = self.db.get_gps_data(session_id)
-        imu_data = self.db.get_imu_data(session_id)
-        tdc = TimeToDistanceConverter(list(zip(gps_data.index, gps_data['speed'])))
-        gps_data['distance'] = tdc.generate_distance_trace(gps_data.index)
-        imu_data['distance'] = tdc.generate_distance_trace(imu_data.index)
-
-        try:
-            can_channels = {
-                 'tps': self.db.get_and_transform_can_data(session_id, 128, focus_rs_tps_converter, tdc),
-                 'b_pres': self.db.get_and_transform_can_data(session_id, 531, focus_rs_brake_pressure_converter, tdc),
-                 'rpm': self.db.get_and_transform_can_data(session_id, 144, focus_rs_rpm_converter, tdc),
-                 'wheelspeed1': self.db.get_and_transform_can_data(session_id, 400, focus_rs_wheelspeed1_converter, tdc),
-                 'wheelspeed2': self.db.get_and_transform_can_data(session_id, 400, focus_rs_wheelspeed2_converter, tdc),
-                 'wheelspeed3': self.db.get_and_transform_can_data(session_id, 400, focus_rs_wheelspeed3_converter, tdc),
-                 'wheelspeed4': self.db.get_and_transform_can_data(session_id, 400, focus_rs_wheelspeed4_converter, tdc)
-            }
-        except ValueError as e:
-            print("Error loading can channels: " + str(e))
-            can_channels = {}
+        gps_data, imu_data, can_channels = self.db.get_session(session_id)
 
         # find first time vehicle moved
         t0 = gps_data.index[0]
@@ -17,15 +17,18 @@
 from functools import lru_cache
 
 from .plotly_helpers import get_scatterplot
-from flask import Flask, jsonify, request, Response, abort
+from flask import Flask, jsonify, request, Response, abort, stream_with_context
 from plotly import graph_objs as pgo
 from plotly import tools
 import pandas as pd
 from racepi_can_decoder import *
+from racepi.can.data import payloads_to_array
+from racepi.database.csv_export import EXPORT_CHANNELS, iter_csv_lines, iter_chunks, iter_gzip
 from racepi_database_handler import *
 from sqlalchemy.orm import sessionmaker
 
 app = Flask(__name__)
+app.session_cache = None
 try:
     from flask_compress import Compress
     Compress(app)
@@ -46,12 +49,23 @@ def get_orm_session():
 def get_and_transform_can_data(session_id, arbitration_id, value_converter):
     s = get_orm_session()
 
-    data = [{'timestamp': x.timestamp,
-            'value': value_converter.convert_frame(CanFrame("999", x.msg))}
-            for x in
-            s.query(CANData).filter(CANData.session_id == session_id).filter(CANData.arbitration_id == arbitration_id)
-            ]
-    return data
+    rows = s.query(CANData.timestamp, CANData.msg).\
+        filter(CANData.session_id == session_id).filter(CANData.arbitration_id == arbitration_id).all()
+    values = value_converter.convert_frames(payloads_to_array([x.msg for x in rows]))
+    return [{'timestamp': x.timestamp, 'value': v} for x, v in zip(rows, values.tolist())]
+
+
+def get_cached_session(session_id):
+    """
+    :return: dictionary of table name to data frame indexed by time,
+        None if the session is not in the session cache
+    """
+    if not app.session_cache:
+        return None
+    tables = app.session_cache.read_session(session_id)
+    if not tables:
+        return None
+    return {name: t.to_pandas().set_index('timestamp') for name, t in tables.items()}
 
 
 @app.route('/data/sessions')
@@ -212,19 +226,30 @@ def get_singlerun_timeseries():
     else:
         smoothing_window = 10
 
-    can_channels = {
-        'TPS (%)': get_and_transform_can_data(session_id, 128, focus_rs_tps_converter),
-        'Brake Pressure (kPa)': get_and_transform_can_data(session_id, 531, focus_rs_brake_pressure_converter),
-        'RPM': get_and_transform_can_data(session_id, 144, focus_rs_rpm_converter)
-    }
-    gps_data = pd.read_sql_query("select timestamp, speed, track, lat, lon FROM %s where session_id='%s'" % ("gps_data", session_id), app.db, index_col='timestamp')
-    imu_data = pd.read_sql_query("select timestamp, x_accel, y_accel, z_accel FROM %s where session_id='%s'" % ("imu_data", session_id), app.db, index_col='timestamp')
-    can_samples = pd.read_sql_query("select timestamp, msg FROM %s where session_id='%s' and arbitration_id=16" % ("can_data", session_id), app.db, index_col='timestamp')
-
-    can_samples['Steering'] = [
-        (focus_rs_steering_angle_converter.convert_frame(CanFrame('010', x)) * 3000 *
-         ((-1)* focus_rs_steering_angle_converter.convert_frame(CanFrame('010', x))))
-        for x in can_samples.msg.tolist()]
+    cached = get_cached_session(session_id)
+    if cached:
+        empty = pd.DataFrame({'result': []})
+        can_channels = {
+            'TPS (%)': cached.get('can_tps', empty),
+            'Brake Pressure (kPa)': cached.get('can_b_pres', empty),
+            'RPM': cached.get('can_rpm', empty)
+        }
+        gps_data = cached['gps']
+        imu_data = cached['imu']
+        can_samples = cached.get('can_steering', empty)
+        steering = can_samples.result.values
+    else:
+        can_channels = {
+            'TPS (%)': get_and_transform_can_data(session_id, 128, focus_rs_tps_converter),
+            'Brake Pressure (kPa)': get_and_transform_can_data(session_id, 531, focus_rs_brake_pressure_converter),
+            'RPM': get_and_transform_can_data(session_id, 144, focus_rs_rpm_converter)
+        }
+        gps_data = pd.read_sql_query("select timestamp, speed, track, lat, lon FROM %s where session_id='%s'" % ("gps_data", session_id), app.db, index_col='timestamp')
+        imu_data = pd.read_sql_query("select timestamp, x_accel, y_accel, z_accel FROM %s where session_id='%s'" % ("imu_data", session_id), app.db, index_col='timestamp')
+        can_samples = pd.read_sql_query("select timestamp, msg FROM %s where session_id='%s' and arbitration_id=16" % ("can_data", session_id), app.db, index_col='timestamp')
+        steering = focus_rs_steering_angle_converter.convert_frames(payloads_to_array(can_samples.msg.tolist()))
+
+    can_samples['Steering'] = steering * 3000 * ((-1) * steering)
 
     fig = tools.make_subplots(rows=6, cols=1)
     fig.append_trace(get_scatterplot(gps_data.speed, smoothing_window, "Speed (m/s)"), 1, 1)
@@ -261,43 +286,33 @@ def get_plots_speed():
 
 @app.route('/export/csv')
 def get_run_csv():
+    """
+    Stream recorded data as csv, in time order. Optional arguments:
+    session_id, start and end timestamps, a comma separated list of
+    channels (gps, imu, can) and gzip=1 for a compressed file.
+    """
     session_id = request.args.get("session_id")
-    get_csv_cmd="""
-select * from
-(select
-    session_id,timestamp,'GPS' as type,time,speed,track,lat,lon,epx,epy,epv
-    NULL as arbitration_id,NULL as msg,
-    NULL AS r,NULL AS p,NULL AS y,NULL AS x_accel,NULL AS y_accel,NULL AS z_accel,NULL AS x_gyro,NULL AS y_gyro,NULL AS z_gyro
-    from gps_data
-union
-select
-    session_id,timestamp,'CAN' as type, NULL as time, NULL as speed,NULL as track,NULL as lat,NULL as lon,NULL as epx,NULL as epy,NULL as epv,
-    arbitration_id, msg,
-    NULL AS r,NULL AS p,NULL AS y,NULL AS x_accel,NULL AS y_accel,NULL AS z_accel,NULL AS x_gyro,NULL AS y_gyro,NULL AS z_gyro
-    from can_data
-union
-select
-    session_id,timestamp,'IMU' as type, NULL as time, NULL as speed,NULL as track,NULL as lat,NULL as lon,NULL as epx,NULL as epy,NULL as epv,
-    NULL as arbitration_id, NULL as msg,
-    r,p,y,x_accel,y_accel,z_accel,x_gyro,y_gyro,z_gyro
-    from imu_data )
-
-
-where session_id = '%s'
-    """ % session_id
-    with app.db.connect() as c:
-        q = c.execute(get_csv_cmd)
-        results = ["#" + ','.join(q.keys())]
-        for row in q:
-            data = [str(x) if x else '' for x in row]
-            results.append(','.join(data))
-
-        # only column header available
-        if len(results) <= 1:
-            raise ValueError("Invalid session")
-
-        result = '\n'.join(results)
-        return Response(result, mimetype='text/csv')
+    start = request.args.get("start", type=float)
+    end = request.args.get("end", type=float)
+    channels = request.args.get("channels")
+    channels = channels.split(',') if channels else None
+    if channels and not set(channels) <= set(EXPORT_CHANNELS):
+        abort(400)
+    if session_id and not get_orm_session().query(Session).filter(Session.id == session_id).count():
+        abort(404)
+
+    def generate():
+        with app.db.connect() as c:
+            yield from iter_chunks(iter_csv_lines(c, session_id, start, end, channels))
+
+    filename = "racepi_%s.csv" % (session_id or "all")
+    if request.args.get("gzip"):
+        response = Response(stream_with_context(iter_gzip(generate())), mimetype='application/gzip')
+        filename += ".gz"
+    else:
+        response = Response(stream_with_context(generate()), mimetype='text/csv')
+    response.headers['Content-Disposition'] = 'attachment; filename="%s"' % filename
+    return response
 
 
 @app.route('/plot/bokeh_test/<session_id>')
@@ -0,0 +1,111 @@
+# Copyright 2026 Donour Sizemore
+#
+# This file is part of RacePi
+#
+# RacePi is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 2.
+#
+# RacePi is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RacePi.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Precompiled CAN signal decoding for the DL1 feed. Messages are compiled
+once from a cantools database, keeping only the signals that are needed,
+so that decoding a frame is a dict lookup and a few shifts and masks.
+"""
+
+from racepi.can.data import CAN_EFF_MASK
+
+
+class CompiledSignal:
+    """
+    Integer signal decoder, equivalent to cantools decoding with scaling
+    and without choices
+    """
+    __slots__ = ['name', 'little_endian', 'shift', 'mask', 'sign_bit', 'scale', 'offset']
+
+    def __init__(self, signal, message_length):
+        """
+        :param signal: cantools signal
+        :param message_length: length of message in bytes
+        """
+        if signal.is_float:
+            raise ValueError("Float signals are not supported: " + signal.name)
+        self.name = signal.name
+        self.little_endian = signal.byte_order == 'little_endian'
+        if self.little_endian:
+            self.shift = signal.start
+        else:
+            # big endian start bit is the msb, numbered lsb first within each byte
+            msb = (signal.start // 8) * 8 + (7 - signal.start % 8)
+            self.shift = message_length * 8 - (msb + signal.length)
+        self.mask = (1 << signal.length) - 1
+        self.sign_bit = 1 << (signal.length - 1) if signal.is_signed else 0
+        self.scale = signal.scale
+        self.offset = signal.offset
+
+    def decode(self, little, big):
+        """
+        :param little: message payload as little endian integer
+        :param big: message payload as big endian integer
+        :return: scaled signal value
+        """
+        raw = ((little if self.little_endian else big) >> self.shift) & self.mask
+        if raw & self.sign_bit:
+            raw -= self.sign_bit << 1
+        return raw * self.scale + self.offset
+
+
+class CompiledMessage:
+    """
+    Decoder for the wanted signals of a single message
+    """
+    __slots__ = ['name', 'length', 'signals']
+
+    def __init__(self, message, signal_names):
+        """
+        :param message: cantools message
+        :param signal_names: names of signals to decode
+        """
+        self.name = message.name
+        self.length = message.length
+        self.signals = [CompiledSignal(s, message.length) for s in message.signals if s.name in signal_names]
+
+    def decode(self, payload):
+        """
+        :param payload: message payload bytes
+        :return: dictionary of signal values
+        :raises: ValueError if the payload is shorter than the message
+        """
+        if len(payload) < self.length:
+            raise ValueError("Wrong data size: %d instead of %d bytes" % (len(payload), self.length))
+        data = payload[:self.length]
+        little = int.from_bytes(data, 'little')
+        big = int.from_bytes(data, 'big')
+        return {s.name: s.decode(little, big) for s in self.signals}
+
+
+def compile_decoders(candb, signal_names):
+    """
+    Build a decoder table for the messages containing any of the specified
+    signals. Messages are keyed by arbitration id without flag bits, since
+    some DBC files mark ids as extended that are sent as base frames.
+
+    Ids missing from the table, including messages in the database without
+    wanted signals, are rejected with a single dict lookup.
+
+    :param candb: cantools database
+    :param signal_names: names of signals to decode
+    :return: dictionary of arbitration id to CompiledMessage
+    """
+    signal_names = set(signal_names)
+    decoders = {}
+    for m in candb.messages:
+        if signal_names.intersection(s.name for s in m.signals):
+            decoders[m.frame_id & CAN_EFF_MASK] = CompiledMessage(m, signal_names)
+    return decoders
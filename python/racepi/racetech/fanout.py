@@ -0,0 +1,207 @@
+# Copyright 2026 Donour Sizemore
+#
+# This file is part of RacePi
+#
+# RacePi is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 2.
+#
+# RacePi is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RacePi.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Non-blocking fan-out of DL1 data to connected clients. Every client has
+its own bounded send buffer, so a stalled receiver only loses its own
+oldest data instead of blocking the sensor loop and the other clients.
+Clients may also have a rate policy, see racepi.racetech.rate_policy.
+"""
+
+import selectors
+import time
+from collections import deque
+from threading import Lock
+
+DEFAULT_MAX_BUFFERED_BYTES = 16 * 1024
+
+
+class FanoutClient:
+    """
+    Connected client with a bounded buffer of pending chunks. Chunks are
+    complete groups of DL1 messages and are dropped whole, oldest first,
+    so the client never receives a partial message.
+    """
+
+    def __init__(self, sock, address, max_buffered_bytes=DEFAULT_MAX_BUFFERED_BYTES, policy=None):
+        """
+        :param sock: connected socket
+        :param address: address of client, for display
+        :param max_buffered_bytes: size of the send buffer
+        :param policy: optional ChannelRatePolicy downsampling data for this client
+        """
+        self.sock = sock
+        self.address = address
+        self.max_buffered_bytes = max_buffered_bytes
+        self.policy = policy
+        self.connected_time = time.time()
+        self.pending = deque()  # (enqueue time, chunk)
+        self.offset = 0  # bytes of the first pending chunk already sent
+        self.buffered_bytes = 0
+
+        self.bytes_sent = 0
+        self.chunks_sent = 0
+        self.bytes_dropped = 0
+        self.chunks_dropped = 0
+
+    def enqueue(self, chunk, now):
+        self.pending.append((now, chunk))
+        self.buffered_bytes += len(chunk)
+        # a partially sent chunk must be completed to keep the stream aligned
+        while self.buffered_bytes > self.max_buffered_bytes and len(self.pending) > 1:
+            i = 1 if self.offset else 0
+            _, dropped = self.pending[i]
+            del self.pending[i]
+            self.buffered_bytes -= len(dropped)
+            self.bytes_dropped += len(dropped)
+            self.chunks_dropped += 1
+
+    def send_pending(self):
+        """
+        Send as much pending data as the socket accepts without blocking
+
+        :raises: OSError if the connection failed
+        """
+        while self.pending:
+            _, chunk = self.pending[0]
+            try:
+                sent = self.sock.send(memoryview(chunk)[self.offset:])
+            except (BlockingIOError, InterruptedError):
+                return
+            self.bytes_sent += sent
+            self.buffered_bytes -= sent
+            self.offset += sent
+            if self.offset < len(chunk):
+                return
+            self.pending.popleft()
+            self.offset = 0
+            self.chunks_sent += 1
+
+    def get_metrics(self, now):
+        """
+        :return: dictionary of throughput and lag statistics
+        """
+        elapsed = max(now - self.connected_time, 1e-9)
+        metrics = {
+            'address': self.address,
+            'bytes_sent': self.bytes_sent,
+            'chunks_sent': self.chunks_sent,
+            'bytes_dropped': self.bytes_dropped,
+            'chunks_dropped': self.chunks_dropped,
+            'buffered_bytes': self.buffered_bytes,
+            'throughput': self.bytes_sent / elapsed,  # bytes per second
+            'lag': now - self.pending[0][0] if self.pending else 0.0,  # age of oldest unsent data
+        }
+        if self.policy:
+            metrics['rate_scale'] = self.policy.scale
+            metrics['samples_skipped'] = self.policy.samples_skipped
+        return metrics
+
+    def select(self, chunk, segments):
+        """
+        :return: the part of a chunk this client should be sent
+        """
+        if not self.policy or not segments:
+            return chunk
+        self.policy.adapt(self.buffered_bytes, self.max_buffered_bytes, self.chunks_dropped)
+        return self.policy.select(chunk, segments)
+
+
+class DL1Fanout:
+    """
+    Selector driven writer to a set of non-blocking client sockets.
+    Clients may be added from another thread, such as a listener.
+    """
+
+    def __init__(self, max_buffered_bytes=DEFAULT_MAX_BUFFERED_BYTES, policy_factory=None):
+        """
+        :param max_buffered_bytes: size of each client's send buffer
+        :param policy_factory: optional function creating a rate policy for each new client
+        """
+        self.max_buffered_bytes = max_buffered_bytes
+        self.policy_factory = policy_factory
+        self.__selector = selectors.DefaultSelector()
+        self.__clients = []
+        self.__lock = Lock()
+
+    def add_client(self, sock, address=None):
+        sock.setblocking(False)
+        policy = self.policy_factory() if self.policy_factory else None
+        client = FanoutClient(sock, address, self.max_buffered_bytes, policy)
+        with self.__lock:
+            self.__clients.append(client)
+            self.__selector.register(sock, selectors.EVENT_WRITE, client)
+        return client
+
+    def __remove_client(self, client):
+        self.__clients.remove(client)
+        self.__selector.unregister(client.sock)
+        client.sock.close()
+        print("Disconnected: %s" % str(client.address))
+
+    def get_client_count(self):
+        return len(self.__clients)
+
+    def get_metrics(self):
+        """
+        :return: list of metrics dictionaries, one per client
+        """
+        now = time.time()
+        with self.__lock:
+            return [c.get_metrics(now) for c in self.__clients]
+
+    def broadcast(self, data, segments=None):
+        """
+        Queue data for all clients and send what can be sent immediately
+
+        :param data: bytes-like chunk of complete messages, copied once
+        :param segments: optional list of (channel, time, start, end) of
+            tagged data, used by client rate policies
+        """
+        with self.__lock:
+            if not self.__clients:
+                return
+            chunk = bytes(data)
+            now = time.time()
+            for client in self.__clients:
+                client_chunk = client.select(chunk, segments)
+                if client_chunk:
+                    client.enqueue(client_chunk, now)
+        self.service()
+
+    def service(self, timeout=0):
+        """
+        Send pending data to writable clients. Clients with closed or
+        failed connections are removed.
+
+        :param timeout: maximum time to wait for a writable client, in seconds
+        """
+        with self.__lock:
+            if not self.__clients:
+                return
+            for key, _ in self.__selector.select(timeout):
+                client = key.data
+                if not client.pending:
+                    continue
+                try:
+                    client.send_pending()
+                except OSError:
+                    self.__remove_client(client)
+
+    def close(self):
+        with self.__lock:
+            for client in list(self.__clients):
+                self.__remove_client(client)
+            self.__selector.close()
@@ -18,6 +18,8 @@
 import struct
 import math
 
+import numpy as np
+
 XYACCEL_MESSAGE_ID = 8
 TIMESTAMP_MESSAGE_ID = 9
 GPS_POS_MESSAGE_ID = 10
@@ -45,18 +47,148 @@ STEERING_ANGLE_FMT = ">4B"  # header, type of data byte, 2 bytes value
 EXT_PRESSURE_FMT = ">BBbBB"  # header, location, scale_factor(signed), 2 bytes value
 Z_ACCEL_FMT = ">3B"  # header, data
 
+XYACCEL_STRUCT = struct.Struct(XYACCEL_FMT)
+TIMESTAMP_STRUCT = struct.Struct(TIMESTAMP_FMT)
+GPS_POS_STRUCT = struct.Struct(GPS_POS_FMT)
+GPS_SPEED_STRUCT = struct.Struct(GPS_SPEED_FMT)
+RPM_STRUCT = struct.Struct(RPM_FMT)
+ANALOG_STRUCT = struct.Struct(ANALOG_FMT)
+STEERING_ANGLE_STRUCT = struct.Struct(STEERING_ANGLE_FMT)
+EXT_PRESSURE_STRUCT = struct.Struct(EXT_PRESSURE_FMT)
+Z_ACCEL_STRUCT = struct.Struct(Z_ACCEL_FMT)
+
 DL1_PERIOD_CONSTANT = 6e6
 MAX_BRAKE_PRESSURE = 200.0
 
+DEFAULT_MESSAGE_BUFFER_SIZE = 4096
+
 
 def get_message_checksum(msg):
-    cs = 0
-    for d in msg:
-        cs += d & 0xFF
-    return bytes([cs & 0xFF])
+    return bytes([sum(msg) & 0xFF])
 
 
-def get_timestamp_message_bytes(time_millis):
+class DL1MessageBuffer:
+    """
+    Reusable buffer of encoded DL1 messages. Messages are packed directly
+    into a preallocated bytearray, each followed by its checksum, so that
+    a flush sends a single contiguous block without building intermediate
+    byte strings.
+
+    The length of the buffer is the number of messages it contains.
+
+    Messages may be tagged by data channel in segments, so that clients
+    can be sent a subset of the buffered data. Messages added before the
+    first segment are untagged.
+    """
+
+    def __init__(self, size=DEFAULT_MESSAGE_BUFFER_SIZE):
+        self.__data = bytearray(size)
+        self.__end = 0
+        self.__count = 0
+        self.__segments = []  # (channel, time, start)
+
+    def __len__(self):
+        return self.__count
+
+    def __reserve(self, size):
+        required = self.__end + size
+        if required > len(self.__data):
+            self.__data.extend(bytes(max(required, 2 * len(self.__data)) - len(self.__data)))
+
+    def pack(self, message_struct, fields):
+        """
+        Encode a message and its checksum into the buffer
+
+        :param message_struct: struct.Struct of the message
+        :param fields: tuple of message fields, as returned by the *_fields functions
+        """
+        size = message_struct.size
+        self.__reserve(size + 1)
+        start = self.__end
+        message_struct.pack_into(self.__data, start, *fields)
+        self.__data[start + size] = sum(self.__data[start:start + size]) & 0xFF
+        self.__end = start + size + 1
+        self.__count += 1
+
+    def append(self, msg):
+        """
+        Add an encoded message, without checksum, to the buffer
+        """
+        size = len(msg)
+        self.__reserve(size + 1)
+        start = self.__end
+        self.__data[start:start + size] = msg
+        self.__data[start + size] = sum(msg) & 0xFF
+        self.__end = start + size + 1
+        self.__count += 1
+
+    def extend_encoded(self, data, count):
+        """
+        Add a block of messages that already include checksums
+
+        :param data: encoded messages
+        :param count: number of messages in data
+        """
+        size = len(data)
+        self.__reserve(size)
+        self.__data[self.__end:self.__end + size] = data
+        self.__end += size
+        self.__count += count
+
+    def extend_records(self, data, messages_per_record, channel, times):
+        """
+        Add a block of fixed size records of encoded messages, starting a
+        new segment for each record
+
+        :param data: encoded messages, including checksums
+        :param messages_per_record: number of messages in each record
+        :param channel: data channel of the records
+        :param times: sample time of each record
+        """
+        if not times:
+            return
+        record_size = len(data) // len(times)
+        start = self.__end
+        self.__segments.extend((channel, t, start + i * record_size) for i, t in enumerate(times))
+        self.extend_encoded(data, messages_per_record * len(times))
+
+    def begin_segment(self, channel, t):
+        """
+        Tag messages added after this call, until the next segment
+
+        :param channel: data channel name
+        :param t: sample time, in seconds
+        """
+        self.__segments.append((channel, t, self.__end))
+
+    def get_segments(self):
+        """
+        :return: list of (channel, time, start, end) covering the buffered data
+        """
+        segments = []
+        if not self.__segments or self.__segments[0][2] > 0:
+            segments.append((None, None, 0))
+        segments.extend(self.__segments)
+        ends = [s[2] for s in segments[1:]] + [self.__end]
+        return [(c, t, start, end) for (c, t, start), end in zip(segments, ends) if end > start]
+
+    def getbuffer(self):
+        """
+        :return: memoryview of buffered messages. It must be released
+            before any more messages are added.
+        """
+        return memoryview(self.__data)[:self.__end]
+
+    def getvalue(self):
+        return bytes(self.__data[:self.__end])
+
+    def clear(self):
+        self.__end = 0
+        self.__count = 0
+        self.__segments = []
+
+
+def get_timestamp_message_fields(time_millis):
     """
     :param time_millis: time since service start, in milliseconds
     :return:
@@ -66,7 +198,11 @@ def get_timestamp_message_bytes(time_millis):
     t1 = (t >> 16) & 0xFF
     t2 = (t >> 8) & 0xFF
     t3 = t & 0xFF
-    return struct.pack(TIMESTAMP_FMT, TIMESTAMP_MESSAGE_ID, t1, t2, t3)
+    return TIMESTAMP_MESSAGE_ID, t1, t2, t3
+
+
+def get_timestamp_message_bytes(time_millis):
+    return TIMESTAMP_STRUCT.pack(*get_timestamp_message_fields(time_millis))
 
 
 def __get_accel_bytes(accel_value):
@@ -88,35 +224,51 @@ def __get_accel_bytes(accel_value):
     return b1, b2
 
 
-def get_xy_accel_message_bytes(x_accel, y_accel):
+def get_xy_accel_message_fields(x_accel, y_accel):
     x1, x2 = __get_accel_bytes(x_accel)
     y1, y2 = __get_accel_bytes(y_accel)
-    return struct.pack(XYACCEL_FMT, XYACCEL_MESSAGE_ID, x1, x2, y1, y2)
+    return XYACCEL_MESSAGE_ID, x1, x2, y1, y2
 
 
-def get_z_accel_message_bytes(z_accel):
+def get_xy_accel_message_bytes(x_accel, y_accel):
+    return XYACCEL_STRUCT.pack(*get_xy_accel_message_fields(x_accel, y_accel))
+
+
+def get_z_accel_message_fields(z_accel):
     b1, b2 = __get_accel_bytes(z_accel)
-    return struct.pack(Z_ACCEL_FMT, Z_ACCEL_MESSAGE_ID, b1, b2)
+    return Z_ACCEL_MESSAGE_ID, b1, b2
 
 
-def get_gps_pos_message_bytes(gps_lat_xe7, gps_long_xe7, gps_err_xe3):
+def get_z_accel_message_bytes(z_accel):
+    return Z_ACCEL_STRUCT.pack(*get_z_accel_message_fields(z_accel))
+
+
+def get_gps_pos_message_fields(gps_lat_xe7, gps_long_xe7, gps_err_xe3):
     """
     :param gps_lat_xe7: latitude value, scaled by 1e7
     :param gps_long_xe7: longitude value, scale by 1e7
     :return:
     """
-    return struct.pack(GPS_POS_FMT, GPS_POS_MESSAGE_ID,  int(gps_long_xe7), int(gps_lat_xe7), int(gps_err_xe3))
+    return GPS_POS_MESSAGE_ID, int(gps_long_xe7), int(gps_lat_xe7), int(gps_err_xe3)
 
 
-def get_gps_speed_message_bytes(gps_speed_x100, gps_speed_acc_x100):
+def get_gps_pos_message_bytes(gps_lat_xe7, gps_long_xe7, gps_err_xe3):
+    return GPS_POS_STRUCT.pack(*get_gps_pos_message_fields(gps_lat_xe7, gps_long_xe7, gps_err_xe3))
+
+
+def get_gps_speed_message_fields(gps_speed_x100, gps_speed_acc_x100):
     """
     :param gps_speed_x100: speed (m/s), scaled by 100
     :return:
     """
-    return struct.pack(GPS_SPEED_FMT, GPS_SPEED_MESSAGE_ID, int(gps_speed_x100), int(gps_speed_acc_x100) & 0xffffff)
+    return GPS_SPEED_MESSAGE_ID, int(gps_speed_x100), int(gps_speed_acc_x100) & 0xffffff
 
 
-def get_rpm_message_bytes(rpm):
+def get_gps_speed_message_bytes(gps_speed_x100, gps_speed_acc_x100):
+    return GPS_SPEED_STRUCT.pack(*get_gps_speed_message_fields(gps_speed_x100, gps_speed_acc_x100))
+
+
+def get_rpm_message_fields(rpm):
     """
     :param rpm:
     :return:
@@ -129,21 +281,33 @@ def get_rpm_message_bytes(rpm):
     b1 = (val >> 16) & 0xFF
     b2 = (val >> 8) & 0xFF
     b3 = val & 0xFF
-    return struct.pack(RPM_FMT, RPM_MESSAGE_ID, b1, b2, b3)
+    return RPM_MESSAGE_ID, b1, b2, b3
 
 
-def get_analog_message_bytes(voltage, message_id):
+def get_rpm_message_bytes(rpm):
+    return RPM_STRUCT.pack(*get_rpm_message_fields(rpm))
+
+
+def get_analog_message_fields(voltage, message_id):
     val = int(voltage * 1000.0)
     b1 = (val >> 8) & 0xFF
     b2 = val & 0xFF
-    return struct.pack(ANALOG_FMT, message_id, b1, b2)
+    return message_id, b1, b2
+
+
+def get_analog_message_bytes(voltage, message_id):
+    return ANALOG_STRUCT.pack(*get_analog_message_fields(voltage, message_id))
+
+
+def get_tps_message_fields(voltage):
+    return get_analog_message_fields(voltage, TPS_MESSAGE_ID)
 
 
 def get_tps_message_bytes(voltage):
-    return get_analog_message_bytes(voltage, TPS_MESSAGE_ID)
+    return ANALOG_STRUCT.pack(*get_tps_message_fields(voltage))
 
 
-def get_steering_angle_message_bytes(angle):
+def get_steering_angle_message_fields(angle):
     """    
     :param angle: in degrees
     :return: 
@@ -157,10 +321,14 @@ def get_steering_angle_message_bytes(angle):
         val = int(angle*10)
         b2 = val & 0xFF
         b3 = (val >> 8) & 0xFF
-    return struct.pack(STEERING_ANGLE_FMT, STEERING_ANGLE_ID, 0x3, b2, b3)
+    return STEERING_ANGLE_ID, 0x3, b2, b3
 
 
-def get_ext_pressure_message_bytes(pressure_bar):
+def get_steering_angle_message_bytes(angle):
+    return STEERING_ANGLE_STRUCT.pack(*get_steering_angle_message_fields(angle))
+
+
+def get_ext_pressure_message_fields(pressure_bar):
 
     # This code will sends the pressure EXT_PRESSURE, but it isn't used
     if pressure_bar < 1e-20:
@@ -171,14 +339,67 @@ def get_ext_pressure_message_bytes(pressure_bar):
         b2 = scale_factor
         b3 = val & 0xFF
         b4 = (val >> 8) & 0xFF
-    return struct.pack(EXT_PRESSURE_FMT, EXT_PRESSURE_MESSAGE_ID, 0x1, b2, b3, b4)
+    return EXT_PRESSURE_MESSAGE_ID, 0x1, b2, b3, b4
 
 
-def get_brake_pressure_message_bytes(pressure_bar):
+def get_ext_pressure_message_bytes(pressure_bar):
+    return EXT_PRESSURE_STRUCT.pack(*get_ext_pressure_message_fields(pressure_bar))
+
+
+def get_brake_pressure_message_fields(pressure_bar):
     # Solostorm reads brake pressure as voltage
     voltage = pressure_bar/MAX_BRAKE_PRESSURE * 5.0  # scale to 5v
     voltage = max(voltage, 5.0)
-    volt_bytes = get_analog_message_bytes(voltage, BRAKE_MESSAGE_ID)
+    return get_analog_message_fields(voltage, BRAKE_MESSAGE_ID)
+
+
+def get_brake_pressure_message_bytes(pressure_bar):
+    return ANALOG_STRUCT.pack(*get_brake_pressure_message_fields(pressure_bar))
 
-    return volt_bytes
 
+def __get_accel_byte_arrays(accel_values):
+    # vectorized __get_accel_bytes, int() truncation is replicated with trunc
+    positive = accel_values > 0.0
+    tmp_accel = np.abs(accel_values)
+    b1 = np.where(positive, 0x80, 0) | (np.trunc(tmp_accel).astype(np.int64) & 0x7F)
+    b2 = np.trunc((tmp_accel - b1) * 0x100).astype(np.int64) & 0xFF
+    return b1, b2
+
+
+# timestamp, xy accel and z accel messages, each followed by a checksum
+IMU_BATCH_MESSAGES = 3
+IMU_BATCH_RECORD_SIZE = TIMESTAMP_STRUCT.size + XYACCEL_STRUCT.size + Z_ACCEL_STRUCT.size + IMU_BATCH_MESSAGES
+
+
+def get_imu_batch_message_bytes(time_millis, x_accel, y_accel, z_accel):
+    """
+    Encode timestamp and acceleration messages for a batch of IMU samples,
+    equivalent to encoding each sample with get_timestamp_message_bytes,
+    get_xy_accel_message_bytes and get_z_accel_message_bytes.
+
+    :param time_millis: array of sample times, in milliseconds
+    :param x_accel: array of x acceleration, in G
+    :param y_accel: array of y acceleration, in G
+    :param z_accel: array of z acceleration, in G
+    :return: encoded messages with checksums, IMU_BATCH_MESSAGES per sample
+    """
+    t = np.trunc(np.asarray(time_millis, dtype=np.float64)).astype(np.int64)
+    x1, x2 = __get_accel_byte_arrays(np.asarray(x_accel, dtype=np.float64))
+    y1, y2 = __get_accel_byte_arrays(np.asarray(y_accel, dtype=np.float64))
+    z1, z2 = __get_accel_byte_arrays(np.asarray(z_accel, dtype=np.float64))
+
+    columns = [
+        [TIMESTAMP_MESSAGE_ID, (t >> 16) & 0xFF, (t >> 8) & 0xFF, t & 0xFF],
+        [XYACCEL_MESSAGE_ID, x1, x2, y1, y2],
+        [Z_ACCEL_MESSAGE_ID, z1, z2],
+    ]
+    records = np.empty((len(t), IMU_BATCH_RECORD_SIZE), dtype=np.uint8)
+    i = 0
+    for message in columns:
+        start = i
+        for c in message:
+            records[:, i] = c
+            i += 1
+        records[:, i] = records[:, start:i].sum(axis=1, dtype=np.int64) & 0xFF
+        i += 1
+    return records.tobytes()
@@ -0,0 +1,103 @@
+# Copyright 2026 Donour Sizemore
+#
+# This file is part of RacePi
+#
+# RacePi is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 2.
+#
+# RacePi is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RacePi.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Per-client downsampling of the DL1 feed. Each client has a maximum rate
+for every data channel, scaled down when the client's link cannot keep
+up with the data sent to it and restored as it catches up.
+"""
+
+# Maximum rate of each channel, in Hz. None sends every sample.
+DEFAULT_CHANNEL_RATES = {
+    'gps': None,
+    'imu': 25.0,
+    'rpm': 20.0,
+    'tps': 20.0,
+    'steering': 20.0,
+    'brake': 20.0,
+    'can_accel': 20.0,
+}
+
+# Rate intervals are multiplied by the scale, which grows while the client's
+# send buffer is backed up or dropping data and decays while it is empty
+BACKLOG_THRESHOLD = 0.5  # fraction of the client buffer
+SCALE_INCREASE = 1.5
+SCALE_DECAY = 0.9
+MAX_RATE_SCALE = 8.0
+
+
+class ChannelRatePolicy:
+    """
+    Adaptive rate limits of a single client
+    """
+
+    def __init__(self, channel_rates=None):
+        """
+        :param channel_rates: dictionary of channel name to maximum rate, in Hz.
+            Channels not listed are sent at full rate.
+        """
+        if channel_rates is None:
+            channel_rates = DEFAULT_CHANNEL_RATES
+        self.intervals = {c: 1.0 / r for c, r in channel_rates.items() if r}
+        self.scale = 1.0
+        self.last_sent = {}
+        self.samples_skipped = 0
+        self.__last_dropped = 0
+
+    def allow(self, channel, t):
+        """
+        :param channel: channel name, None for untagged data
+        :param t: sample time, in seconds
+        :return: True if a sample of the channel should be sent at time t
+        """
+        interval = self.intervals.get(channel)
+        if not interval:
+            return True
+        last = self.last_sent.get(channel)
+        # time going backwards means a new replay or clock change, restart
+        if last is not None and 0 <= t - last < interval * self.scale:
+            self.samples_skipped += 1
+            return False
+        self.last_sent[channel] = t
+        return True
+
+    def adapt(self, buffered_bytes, max_buffered_bytes, chunks_dropped):
+        """
+        Update the rate scale from the state of the client's send buffer
+
+        :param buffered_bytes: bytes waiting to be sent to the client
+        :param max_buffered_bytes: size of the client's send buffer
+        :param chunks_dropped: total chunks dropped for the client
+        """
+        dropped = chunks_dropped > self.__last_dropped
+        self.__last_dropped = chunks_dropped
+        if dropped or buffered_bytes > max_buffered_bytes * BACKLOG_THRESHOLD:
+            self.scale = min(self.scale * SCALE_INCREASE, MAX_RATE_SCALE)
+        elif buffered_bytes == 0:
+            self.scale = max(self.scale * SCALE_DECAY, 1.0)
+
+    def select(self, data, segments):
+        """
+        Select the segments of a chunk this client should receive
+
+        :param data: bytes-like chunk of messages
+        :param segments: list of (channel, time, start, end) of chunk segments
+        :return: bytes of the selected segments
+        """
+        selected = [(start, end) for channel, t, start, end in segments if self.allow(channel, t)]
+        if len(selected) == len(segments):
+            return data
+        view = memoryview(data)
+        return b"".join(view[start:end] for start, end in selected)
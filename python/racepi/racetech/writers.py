@@ -20,7 +20,12 @@ import socket
 from collections import defaultdict
 from threading import Event, Thread
 import cantools
+import numpy as np
 
+from racepi.can.data import CanSample
+from racepi.racetech.can_decoder import compile_decoders
+from racepi.racetech.fanout import DL1Fanout
+from racepi.racetech.rate_policy import ChannelRatePolicy, DEFAULT_CHANNEL_RATES
 from racepi.sensor.data_utilities import safe_speed_to_float
 from racepi.racetech.messages import *
 
@@ -33,77 +38,109 @@ MAX_BRAKE_PRESSURE = float(1e-6)  # TODO determine proper unit
 # will clip these values if their magnitude is greater than a threshold.
 CLIP_STEERING_ANGLE = 720.0  # degrees
 
-# Some sensors are rate limited
+# CAN messages are rate limited before decoding, clients may be limited further
 MIN_SAMPLE_INTERVAL = 0.05  # 20 hz
-last_sample_time = defaultdict(int)
+
+# CAN signals sent to DL1 data clients. Other signals in the DBC are not decoded.
+DL1_CAN_SIGNALS = ["EngineSpeed", "AcceleratorPosition", "SteeringAngle",
+                   "LateralAccel", "LongAccel", "BrakePedal"]
 
 
 class RaceTechnologyDL1FeedWriter:
 
-    def __init__(self, dbc_filename):
+    def __init__(self, dbc_filename, channel_rates=DEFAULT_CHANNEL_RATES):
+        """
+        :param dbc_filename: CAN database used to decode CAN samples, optional
+        :param channel_rates: maximum rate of each data channel sent to
+            each client, in Hz, see ChannelRatePolicy
+        """
         self.__socket_listener_done = Event()
-        self.__active_connections = []
-        self.pending_messages = []
+        self.__fanout = DL1Fanout(policy_factory=lambda: ChannelRatePolicy(channel_rates))
+        self.pending_messages = DL1MessageBuffer()
+        self.__last_can_time = defaultdict(float)
 
         # open and bind RFCOMM listener
         self.__socket_listener_thread = \
             Thread(target=RaceTechnologyDL1FeedWriter.__bind_rfcomm_socket,
-                   args=(self.__socket_listener_done, self.__active_connections))
+                   args=(self.__socket_listener_done, self.__fanout))
         self.__socket_listener_thread.setDaemon(True)
         self.__socket_listener_thread.start()
 
         self.__earliest_time_seen = time.time()
         if dbc_filename:
-            self.__candb = cantools.database.load_file(dbc_filename)
+            candb = cantools.database.load_file(dbc_filename)
+            self.__can_messages = self.__compile_can_messages(compile_decoders(candb, DL1_CAN_SIGNALS))
         else:
-            self.__candb = None
+            self.__can_messages = {}
+
+    def __compile_can_messages(self, decoders):
+        """
+        Map each decoded message to the DL1 channels and send functions for its signals
+
+        :param decoders: dictionary of arbitration id to CompiledMessage
+        :return: dictionary of arbitration id to (decoder, [(signal name, channel, send function)])
+        """
+        senders = {
+            "EngineSpeed":         ('rpm', lambda v: self.send_rpm(v["EngineSpeed"])),
+            "SteeringAngle":       ('steering', lambda v: self.send_steering_angle(v["SteeringAngle"])),
+            "AcceleratorPosition": ('tps', lambda v: self.send_tps(v["AcceleratorPosition"])),
+            "LateralAccel":        ('can_accel', lambda v: self.send_xyz_accel(v["LateralAccel"], v.get("LongAccel"), 0)),
+            "BrakePedal":          ('brake', lambda v: self.send_brake_pressure(v["BrakePedal"])),
+        }
+        messages = {}
+        for arb_id, decoder in decoders.items():
+            messages[arb_id] = (decoder, [(s.name,) + senders[s.name] for s in decoder.signals if s.name in senders])
+        return messages
 
     def close(self):
         self.__socket_listener_done.set()
 
     def number_of_clients(self):
-        return len(self.__active_connections)
+        return self.__fanout.get_client_count()
+
+    def get_client_metrics(self):
+        """
+        :return: list of throughput and lag metrics, one per client
+        """
+        return self.__fanout.get_metrics()
 
     @staticmethod
-    def __bind_rfcomm_socket(done_event, clients):
+    def __bind_rfcomm_socket(done_event, fanout):
 
         mac = '0:0:0:0:0:0'
         port = 1
         backlog = 1
-        s = socket.socket(socket.AF_BLUETOOTH, socket.SOCK_STREAM, socket.BTPROTO_RFCOMM)
-        s.bind((mac, port))
-        s.listen(backlog)
+        try:
+            s = socket.socket(socket.AF_BLUETOOTH, socket.SOCK_STREAM, socket.BTPROTO_RFCOMM)
+            s.bind((mac, port))
+            s.listen(backlog)
+        except (AttributeError, OSError) as e:
+            # no bluetooth support, the feed runs without clients
+            print("DL1 RFCOMM listener unavailable: %s" % e)
+            return
         while not done_event.is_set():
             client, addr = s.accept()
             print("Registering: %s" % str(addr))
-            clients.append(client)
+            fanout.add_client(client, addr)
 
-        for c in clients:
-            c.close()
+        fanout.close()
         s.close()
 
-    def __queue_mesg(self, msg):
-        self.pending_messages.append(msg)
+    def __queue_message(self, message_struct, fields):
+        self.pending_messages.pack(message_struct, fields)
 
     def flush_queued_messages(self):
         if not self.pending_messages:
+            # continue sending data buffered for slow clients
+            self.__fanout.service()
             return
 
-        # join each message with its checksum, then
-        # join all data together into a bulk message
-        msg = b"".join(
-            [b"".join([x, get_message_checksum(x)]) for x in self.pending_messages])
-        
-        self.pending_messages = []
-
-        # write to all open RFCOMM connections
-        for client in self.__active_connections:
-            try:
-                client.send(msg)
-            except ConnectionResetError:
-                # connection terminated
-                self.__active_connections.remove(client)
-                client.close()
+        # messages are already encoded with checksums, the fan-out
+        # copies the buffer once for all open RFCOMM connections
+        msg = self.pending_messages.getbuffer()
+        self.__fanout.broadcast(msg, self.pending_messages.get_segments())
+        msg.release()
+        self.pending_messages.clear()
 
     def send_timestamp(self, timestamp_seconds):
         if not timestamp_seconds:
@@ -111,8 +148,7 @@ class RaceTechnologyDL1FeedWriter:
 
         time_delta = timestamp_seconds - self.__earliest_time_seen
         # supposed to be millis, isn't really
-        msg = get_timestamp_message_bytes(time_delta * 100.0)
-        self.__queue_mesg(msg)
+        self.__queue_message(TIMESTAMP_STRUCT, get_timestamp_message_fields(time_delta * 100.0))
 
     def send_gps_speed(self, speed, accuracy):
         if not speed:
@@ -121,8 +157,7 @@ class RaceTechnologyDL1FeedWriter:
         if not accuracy:
             accuracy = 0.0
 
-        msg = get_gps_speed_message_bytes(speed*100.0, accuracy)
-        self.__queue_mesg(msg)
+        self.__queue_message(GPS_SPEED_STRUCT, get_gps_speed_message_fields(speed*100.0, accuracy))
 
     def send_gps_pos(self, lat, lon, err):        
 
@@ -142,34 +177,27 @@ class RaceTechnologyDL1FeedWriter:
         except ValueError as e:
             err_val = 0.0       
 
-        msg = get_gps_pos_message_bytes(lat_val * float(1e7), lon_val * float(1e7), err_val*1000.0)
-        self.__queue_mesg(msg)
+        self.__queue_message(GPS_POS_STRUCT,
+                             get_gps_pos_message_fields(lat_val * float(1e7), lon_val * float(1e7), err_val*1000.0))
 
     def send_xyz_accel(self, x_accel, y_accel, z_accel):
-        msg = get_xy_accel_message_bytes(x_accel, y_accel)
-        self.__queue_mesg(msg)
-        msg = get_z_accel_message_bytes(z_accel)
-        self.__queue_mesg(msg)
+        self.__queue_message(XYACCEL_STRUCT, get_xy_accel_message_fields(x_accel, y_accel))
+        self.__queue_message(Z_ACCEL_STRUCT, get_z_accel_message_fields(z_accel))
 
     def send_rpm(self, rpm):
-        msg = get_rpm_message_bytes(rpm)
-        self.__queue_mesg(msg)
+        self.__queue_message(RPM_STRUCT, get_rpm_message_fields(rpm))
 
     def send_tps(self, tps_percentage):
-        msg = get_tps_message_bytes(tps_percentage/100.0*DL1_ANALOG_MAX_VOLTAGE)
-        self.__queue_mesg(msg)
+        self.__queue_message(ANALOG_STRUCT, get_tps_message_fields(tps_percentage/100.0*DL1_ANALOG_MAX_VOLTAGE))
 
     def send_brake_pressure(self, brake_pressure):
-        msg = get_ext_pressure_message_bytes(brake_pressure)
-        self.__queue_mesg(msg)
-        msg = get_brake_pressure_message_bytes(brake_pressure)
-        self.__queue_mesg(msg)
+        self.__queue_message(EXT_PRESSURE_STRUCT, get_ext_pressure_message_fields(brake_pressure))
+        self.__queue_message(ANALOG_STRUCT, get_brake_pressure_message_fields(brake_pressure))
 
     def send_steering_angle(self, angle):
         # send value only if it is within the allowable range
         if -CLIP_STEERING_ANGLE < angle < CLIP_STEERING_ANGLE:
-            msg = get_steering_angle_message_bytes(angle)
-            self.__queue_mesg(msg)
+            self.__queue_message(STEERING_ANGLE_STRUCT, get_steering_angle_message_fields(angle))
 
     def write_gps_sample(self, timestamp, data):
         """
@@ -179,6 +207,7 @@ class RaceTechnologyDL1FeedWriter:
         :param data: 
         :return: 
         """
+        self.pending_messages.begin_segment('gps', timestamp)
         self.send_timestamp(timestamp)
 
         # mode indicate the type of fix, 2 = 2D, 3 = 3D
@@ -205,66 +234,72 @@ class RaceTechnologyDL1FeedWriter:
         if not accel:
             return
 
+        self.pending_messages.begin_segment('imu', timestamp)
         self.send_timestamp(timestamp)
         self.send_xyz_accel(accel[0], accel[1], accel[2])
         #TODO write gyro data
 
+    def write_imu_samples(self, samples):
+        """
+        Write a batch of IMU samples to Racetech data clients. This is
+        equivalent to calling write_imu_sample for each sample, with
+        the messages for all samples encoded at once.
+
+        :param samples: list of (timestamp, data) tuples
+        """
+        samples = [(t, d['accel']) for t, d in samples if d.get('accel')]
+        if not samples:
+            return
+        if not all(t for t, _ in samples):
+            # timestamps are skipped for missing times, use the per sample path
+            for t, accel in samples:
+                self.write_imu_sample(t, {'accel': accel})
+            return
+
+        times = np.array([t for t, _ in samples], dtype=np.float64)
+        accel = np.array([a[:3] for _, a in samples], dtype=np.float64)
+        # supposed to be millis, isn't really, see send_timestamp
+        encoded = get_imu_batch_message_bytes((times - self.__earliest_time_seen) * 100.0,
+                                              accel[:, 0], accel[:, 1], accel[:, 2])
+        self.pending_messages.extend_records(encoded, IMU_BATCH_MESSAGES, 'imu', [t for t, _ in samples])
+
     def write_can_sample(self, timestamp, data):
         """
         Write an unprocessed can sample to Racetech data clients
 
         :param timestamp: timestamp of the can message
-        :param data: unprocesses can data as byte array
+        :param data: unprocessed can data as CanSample or legacy hex string
         :raises: ValueError if can message is unprocessable
         """
 
-        if len(data) < 5:
+        try:
+            sample = CanSample.coerce(data)
+        except ValueError:
             return  # skip
 
-        arb_id = data[:3]
-        payload = data[3:]
-        if (timestamp - last_sample_time[arb_id]) < MIN_SAMPLE_INTERVAL:
+        arb_id = sample.arbitration_id
+        message = self.__can_messages.get(arb_id)
+        if not message:
+            return  # skip, not a DL1 channel
+        if 0 <= (timestamp - self.__last_can_time[arb_id]) < MIN_SAMPLE_INTERVAL:
             return  # skip, rate limit
         else:
-            last_sample_time[arb_id] = timestamp
-
-        if self.__candb:
-            try:
-                can_signals = self.__candb.decode_message(int(arb_id, 16),
-                                                          bytearray.fromhex(payload))
-                engine_speed   = can_signals.get("EngineSpeed")
-                accel_position = can_signals.get("AcceleratorPosition")
-                steering_angle = can_signals.get("SteeringAngle")
-                lateral_accel  = can_signals.get("LateralAccel")
-                long_accel     = can_signals.get("LongAccel")
-                brake_pedal    = can_signals.get("BrakePedal")
-
-                if engine_speed:
-                    self.send_timestamp(timestamp)
-                    self.send_rpm(engine_speed)
-
-                if steering_angle:
-                    self.send_timestamp(timestamp)
-                    self.send_steering_angle(steering_angle)
-
-                if accel_position:
-                    self.send_timestamp(timestamp)
-                    self.send_tps(accel_position)
-
-                if lateral_accel:
-                    self.send_timestamp(timestamp)
-                    self.send_xyz_accel(lateral_accel, long_accel, 0)
-
-                if brake_pedal:
-                    self.send_timestamp(timestamp)
-                    self.send_brake_pressure(brake_pedal)
-
-            except KeyError as ke:
-                if LOG_DECODING_FAILURES:
-                    print (ke)
-            except Exception as e:
-                if LOG_DECODING_FAILURES:
-                    print (e)
+            self.__last_can_time[arb_id] = timestamp
+
+        decoder, senders = message
+        try:
+            values = decoder.decode(sample.payload)
+        except ValueError as e:
+            if LOG_DECODING_FAILURES:
+                print(e)
+            return
+
+        for name, channel, send in senders:
+            # zero values are not sent
+            if values[name]:
+                self.pending_messages.begin_segment(channel, timestamp)
+                self.send_timestamp(timestamp)
+                send(values)
 
 
 
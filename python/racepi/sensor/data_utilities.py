@@ -13,8 +13,11 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with RacePi.  If not, see <http://www.gnu.org/licenses/>.
-import itertools
+import heapq
 from math import cos, pi, fabs
+from operator import itemgetter, le
+
+import numpy as np
 
 
 def uptime_helper():
@@ -24,20 +27,73 @@ def uptime_helper():
         return uptime_seconds
 
 
+def __reorder_window(samples, window):
+    """
+    Restore time order of a stream whose samples are at most window
+    seconds out of order, holding only the samples inside the window
+    """
+    pending = []
+    count = 0  # keeps equal times in arrival order
+    for sample in samples:
+        heapq.heappush(pending, (sample[0], count, sample))
+        count += 1
+        while pending[0][0] <= sample[0] - window:
+            yield heapq.heappop(pending)[2]
+    while pending:
+        yield heapq.heappop(pending)[2]
+
+
+def __time_ordered(samples, window):
+    """
+    :return: iterator of samples in time order
+    """
+    if isinstance(samples, list):
+        # sources are normally ordered already, a linear check is enough
+        times = [s[0] for s in samples]
+        if all(map(le, times, times[1:])):
+            return iter(samples)
+        return iter(sorted(samples, key=itemgetter(0)))
+    if window:
+        return __reorder_window(samples, window)
+    return iter(samples)
+
+
+def __tag_source(key, samples):
+    for val in samples:
+        yield (key,) + val
+
+
+def iter_ordered_log(data, window=0.0):
+    """
+    Lazily merge multiple time ordered sources into a single stream.
+    This takes a data object of the type
+    { source: [ (timestamp, (values,...)), ... ], ... } and yields
+    (source, timestamp, (values,...)) in time order. Samples with equal
+    times are yielded in source order.
+
+    Lists that are not in time order are sorted first. Other iterables,
+    such as database cursors, are streamed and must be in time order,
+    or out of order by at most window seconds.
+
+    :param data: dictionary of source name to samples
+    :param window: maximum time by which streamed samples are out of order
+    :return: generator of (source, timestamp, (values,...))
+    """
+    streams = [__tag_source(key, __time_ordered(samples, window)) for key, samples in data.items()]
+    return heapq.merge(*streams, key=itemgetter(1))
+
+
 def merge_and_generate_ordered_log(data):
     """
     This utility function takes a data object of the type
     { source: [ (timestamp, (values,...)), ... ], ... } and returns
     a new list of (source, timestamp, (values,...)) for outputting
-    as a multi-source stream.
+    as a multi-source stream. See iter_ordered_log to stream the result.
 
     :param data:
     :return:
     """
-    vals_with_keys = [[(key,) + val for val in data[key]] for key in data.keys()]
-    flat_data = list(itertools.chain.from_iterable(vals_with_keys))
-    flat_data.sort(key=lambda x: x[1])  # sort by time
-    return flat_data
+    return list(iter_ordered_log(data))
 
 
 def safe_speed_to_float(v):
@@ -77,69 +133,75 @@ def oversteer_coefficient(steering_angle, wheelbase, velocity, yaw_rate):
     return requested_yaw - yaw_rate
 
 
+# speed integration methods for TimeToDistanceConverter
+INTEGRATE_RECTANGLE = 'rectangle'  # each interval at the speed of its last sample
+INTEGRATE_TRAPEZOID = 'trapezoid'  # each interval at the mean speed of its samples
+
+MIN_INTERPOLATION_INTERVAL = 1e-4  # seconds
+
+
 class TimeToDistanceConverter:
     """
     This is a utility class for converting samples timestamps to distance deltas
     withing a recording
     """
 
-    def __init__(self, speed_data):
+    def __init__(self, speed_data, method=INTEGRATE_RECTANGLE):
+        """
+        :param speed_data: time ordered sequence of (time, speed), or an (N, 2) array
+        :param method: speed integration method, INTEGRATE_RECTANGLE or INTEGRATE_TRAPEZOID
+        """
 
         # calculate distance trace
 
-        if not speed_data or len(speed_data) < 2:
+        if speed_data is None or len(speed_data) < 2:
             raise ValueError("Insufficient data provided")
 
-        self.distance_samples = []
-
-        t_last = speed_data[0][0]
-        total_distance = 0.0
-
-        for sample in speed_data[1:]:
-
-            t = sample[0]
-            v = sample[1]
-            t_delta = t-t_last
-            t_last = t
-
-            # TODO: interpolate v from multiple samples
-            d_delta = t_delta * v
-            total_distance = total_distance + d_delta
-            self.distance_samples.append((t, total_distance, t_delta, d_delta))
+        data = np.asarray(speed_data, dtype=float)
+        t = data[:, 0]
+        v = data[:, 1]
+        if method == INTEGRATE_RECTANGLE:
+            v = v[1:]
+        elif method == INTEGRATE_TRAPEZOID:
+            v = (v[1:] + v[:-1]) * 0.5
+        else:
+            raise ValueError("Unknown integration method: " + str(method))
+
+        # (time, total distance, time delta, distance delta) of each sample after the first
+        time_deltas = np.diff(t)
+        distance_deltas = time_deltas * v
+        self.distance_samples = np.column_stack(
+            (t[1:], np.cumsum(distance_deltas), time_deltas, distance_deltas))
 
     def generate_distance_trace(self, time_trace):
+        """
+        Interpolate the distance travelled at each time of a trace. Times
+        outside the speed data are extrapolated from the nearest interval.
 
-        if not self.distance_samples:
-            raise RuntimeError("No distance data available")
-
-        result = []
-        dist_iter = iter(self.distance_samples)
-        last_dist = next(dist_iter)
-        next_dist = next(dist_iter)
-        for sample in time_trace:
-            # find next distance sample if necessary
-            try:
-                # this try catch is REALLY stupid, but python iterators can't
-                # detect the end
-                while next_dist[0] < sample:
-                    last_dist = next_dist
-                    next_dist = next(dist_iter)
-            except:
-                pass
-            # linear interpolation of last distance sample
-            # before and after the target sample
-            if next_dist[2] > 1e-4:
-                interpolated_distance = \
-                    (sample-last_dist[0])/next_dist[2] * next_dist[3] + last_dist[1]
-            else:
-                interpolated_distance = 0.0
-
-            result.append(interpolated_distance)
-
-        if len(time_trace) != len(result):
-            print("Warning: distance samples dropped")
-
-        return result
-
+        :param time_trace: sequence of times, normally in increasing order
+        :return: array of distances
+        """
 
+        if not len(self.distance_samples):
+            raise RuntimeError("No distance data available")
 
+        t, distance, time_deltas, distance_deltas = self.distance_samples.T
+        samples = np.asarray(time_trace, dtype=float)
+        n = len(t)
+
+        # index of the first distance sample at or after each time, as
+        # found by a forward scan, so it never decreases along the trace
+        following = np.searchsorted(t[1:], samples, side='left') + 1
+        if len(following):
+            following = np.maximum.accumulate(following)
+        # past the end, both bounds are the last sample
+        end = following >= n
+        following = np.minimum(following, n - 1)
+        preceding = np.where(end, n - 1, following - 1)
+
+        # linear interpolation of last distance sample
+        # before and after the target sample
+        dt = time_deltas[following]
+        valid = dt > MIN_INTERPOLATION_INTERVAL
+        fraction = np.divide(samples - t[preceding], dt, out=np.zeros_like(dt), where=valid)
+        return np.where(valid, fraction * distance_deltas[following] + distance[preceding], 0.0)
@@ -0,0 +1,266 @@
+# Copyright 2026 Donour Sizemore
+#
+# This file is part of RacePi
+#
+# RacePi is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 2.
+#
+# RacePi is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RacePi.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Single process ingestion of socket based sensors. GPS (gpsd) and SocketCAN
+readers run as coroutines on one asyncio event loop in a thread of the
+logger process, so they need no handler processes, pipes or pickling.
+
+Sources are exposed to the SensorLogger as handlers with the same interface
+as SensorHandler. Blocking drivers, such as RTIMU and pyserial, should keep
+using the process based handlers.
+"""
+
+import asyncio
+import json
+import socket
+import time
+from collections import deque
+from threading import Thread, Lock
+
+GPSD_HOST = "127.0.0.1"
+GPSD_PORT = 2947
+GPSD_WATCH = b'?WATCH={"enable":true,"json":true}\n'
+GPSD_RECONNECT_DELAY = 2.0  # seconds
+
+# TPV fields, missing values are reported with gps3's 'n/a' marker
+GPS_TPV_FIELDS = ['device', 'mode', 'time', 'ept', 'lat', 'lon', 'alt', 'epx', 'epy', 'epv',
+                  'track', 'speed', 'climb', 'eps', 'epc']
+GPS_MISSING_VALUE = 'n/a'
+
+DEFAULT_MAX_QUEUED_SAMPLES = 100000
+LOOP_SHUTDOWN_TIMEOUT = 2.0  # seconds
+
+
+class AsyncSensorHandler:
+    """
+    Sensor source run as a coroutine on an AsyncIngestLoop.
+
+    Samples are queued in memory and read by the logger with get_all_data().
+    A socket pair wakes the logger when samples are queued while none are
+    pending, so get_wait_handle() can be used like a handler pipe.
+    """
+
+    def __init__(self, ingest_loop, read_func, max_queued_samples=DEFAULT_MAX_QUEUED_SAMPLES):
+        """
+        :param ingest_loop: AsyncIngestLoop running the source
+        :param read_func: coroutine function taking this handler, run until cancelled
+        :param max_queued_samples: samples held before the oldest are dropped
+        """
+        self.ingest_loop = ingest_loop
+        self.read_func = read_func
+        self.samples = deque(maxlen=max_queued_samples)
+        self.dropped_samples = 0
+        self.__wake_pending = False
+        self.__wake_lock = Lock()  # shared by the loop thread and the logger
+        self.__wake_in, self.__wake_out = socket.socketpair()
+        self.__wake_in.setblocking(False)
+        self.__wake_out.setblocking(False)
+        self.__future = None
+
+    def start(self):
+        self.__future = self.ingest_loop.run(self.read_func(self))
+
+    def stop(self):
+        if self.__future:
+            self.ingest_loop.cancel(self.__future)
+            self.__future = None
+        self.__wake_in.close()
+        self.__wake_out.close()
+
+    def send_sample(self, timestamp, value):
+        """
+        Queue a single sample for the logger. This is called from the
+        event loop thread.
+
+        :param timestamp: sample time
+        :param value: sample data
+        """
+        with self.__wake_lock:
+            if len(self.samples) == self.samples.maxlen:
+                self.dropped_samples += 1
+            self.samples.append((timestamp, value))
+            if not self.__wake_pending:
+                self.__wake_pending = True
+                try:
+                    self.__wake_out.send(b'\0')
+                except (BlockingIOError, OSError):
+                    pass  # the logger is already woken or shut down
+
+    def get_wait_handle(self):
+        """
+        :return: socket that becomes readable when new data is available,
+            for use with multiprocessing.connection.wait
+        """
+        return self.__wake_in
+
+    def get_dropped_sample_count(self):
+        return self.dropped_samples
+
+    def get_all_data(self):
+        """
+        Read all queued data from the source
+        :return: list of sensor data tuples, each tuple is (time, value)
+        """
+        # the wake state and the queue are cleared together, so that a
+        # sample queued meanwhile always sends a new wake
+        with self.__wake_lock:
+            self.__wake_pending = False
+            try:
+                while self.__wake_in.recv(4096):
+                    pass
+            except (BlockingIOError, OSError):
+                pass
+            data = list(self.samples)
+            self.samples.clear()
+        return data
+
+
+class AsyncIngestLoop:
+    """
+    asyncio event loop running in a daemon thread. The loop starts with
+    the first started source and stops when every source has stopped.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.__thread = None
+        self.__running = 0
+        self.__lock = Lock()
+
+    def add_source(self, read_func, max_queued_samples=DEFAULT_MAX_QUEUED_SAMPLES):
+        """
+        :param read_func: coroutine function taking the handler, run until cancelled
+        :param max_queued_samples: samples held before the oldest are dropped
+        :return: AsyncSensorHandler for the source
+        """
+        return AsyncSensorHandler(self, read_func, max_queued_samples)
+
+    def add_gps(self, host=GPSD_HOST, port=GPSD_PORT):
+        """
+        :return: handler reading TPV reports from gpsd
+        """
+        return self.add_source(lambda h: read_gpsd(h, host, port))
+
+    def add_socketcan(self, device_name=None, can_filters=None):
+        """
+        :param device_name: name of socketcan device, the SocketCanSensorHandler default if None
+        :param can_filters: list of allowed ids, id ranges or DBC messages, None receives every frame
+        :return: handler reading frames from a SocketCAN device
+        """
+        # imported here, the module requires SocketCAN support
+        from racepi.sensor.handler.socketcan import open_can_socket, DEFAULT_CAN_DEVICE
+        cansocket = open_can_socket(device_name or DEFAULT_CAN_DEVICE, can_filters)
+        return self.add_source(lambda h: read_socketcan(h, cansocket))
+
+    def run(self, coro):
+        """
+        Schedule a coroutine, starting the loop thread if necessary
+
+        :return: concurrent.futures.Future of the coroutine
+        """
+        with self.__lock:
+            if not self.__thread:
+                self.__thread = Thread(target=self.loop.run_forever)
+                self.__thread.daemon = True
+                self.__thread.start()
+            self.__running += 1
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def cancel(self, future):
+        future.cancel()
+        with self.__lock:
+            self.__running -= 1
+            if self.__running > 0 or not self.__thread:
+                return
+            thread, self.__thread = self.__thread, None
+        asyncio.run_coroutine_threadsafe(self.__shutdown(), self.loop)
+        thread.join(LOOP_SHUTDOWN_TIMEOUT)
+
+    async def __shutdown(self):
+        # let the cancelled sources finish their cleanup before stopping
+        tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await asyncio.sleep(0)  # closing transports need one more iteration
+        self.loop.stop()
+
+
+def parse_gpsd_report(line):
+    """
+    :param line: JSON report from gpsd
+    :return: TPV dictionary with all fields, or None for other reports
+    """
+    try:
+        report = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(report, dict) or report.get('class') != 'TPV':
+        return None
+    return {k: report.get(k, GPS_MISSING_VALUE) for k in GPS_TPV_FIELDS}
+
+
+async def read_gpsd(handler, host=GPSD_HOST, port=GPSD_PORT):
+    """
+    Read TPV reports from gpsd, reconnecting after connection failures
+    """
+    print("Starting GPS reader")
+    while True:
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+        except OSError as e:
+            print("GPS connection failed: %s" % e)
+            await asyncio.sleep(GPSD_RECONNECT_DELAY)
+            continue
+        try:
+            writer.write(GPSD_WATCH)
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break  # gpsd closed the connection
+                sample = parse_gpsd_report(line)
+                if sample:
+                    handler.send_sample(time.time(), sample)
+        except OSError as e:
+            print("GPS read failed: %s" % e)
+        finally:
+            writer.close()
+        await asyncio.sleep(GPSD_RECONNECT_DELAY)
+
+
+async def read_socketcan(handler, cansocket):
+    """
+    Read frames from a bound SocketCAN socket
+    """
+    from racepi.sensor.handler.socketcan import CanFrameReceiver
+
+    if not cansocket:
+        return
+    receiver = CanFrameReceiver(cansocket)
+    loop = asyncio.get_running_loop()
+    readable = asyncio.Event()
+    loop.add_reader(cansocket.fileno(), readable.set)
+    print("Starting Socket-CAN reader")
+    try:
+        while True:
+            await readable.wait()
+            readable.clear()
+            for t, sample in receiver.read_available():
+                handler.send_sample(t, sample)
+    finally:
+        loop.remove_reader(cansocket.fileno())
+        cansocket.close()
+        print("Shutting down SocketCAN reader")
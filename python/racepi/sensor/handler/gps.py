@@ -20,6 +20,7 @@ import gps3.gps3 as gps3
 import time
 
 from racepi.sensor.handler.sensor_handler import SensorHandler
+from racepi.sensor.handler.shared_memory_ring import GpsRecordCodec
 
 GPS_REQUIRED_FIELDS = ['time', 'lat', 'lon', 'speed', 'track', 'epx', 'epy', 'epv', 'alt']
 GPS_READ_TIMEOUT = 2.0
@@ -27,8 +28,9 @@ GPS_READ_TIMEOUT = 2.0
 
 class GpsSensorHandler(SensorHandler):
 
-    def __init__(self):
-        SensorHandler.__init__(self, self.__record_from_gps)
+    def __init__(self, shared_memory=False):
+        SensorHandler.__init__(self, self.__record_from_gps,
+                               GpsRecordCodec() if shared_memory else None)
 
     def __record_from_gps(self):
         # TODO auto retry and reinit on hotplug
@@ -45,15 +47,18 @@ class GpsSensorHandler(SensorHandler):
         gps_socket.connect()
         gps_socket.watch()
         while not self.doneEvent.is_set():
-            newdata = gps_socket.next(timeout=GPS_READ_TIMEOUT)
+            newdata = gps_socket.next(timeout=self.get_batch_timeout(GPS_READ_TIMEOUT))
             now = time.time()
             if newdata:
                 data_stream.unpack(newdata)
                 sample = data_stream.TPV
                 t = sample.get('time')
                 if t is not None and set(GPS_REQUIRED_FIELDS).issubset(set(sample.keys())):
-                    self.pipe_out.send((now, sample))
+                    self.send_sample(now, sample)
+            else:
+                self.flush_samples_if_due()
 
+        self.flush_samples()
         print("GPS reader shutdown")
 
 
@@ -118,7 +118,7 @@ class LightSpeedTPMSSensorHandler(SensorHandler):
             raise ValueError("Illegal argument, no queue specified")
 
         os.system("taskset -p 0xfe %d" % os.getpid())        
-        import os.nice(20)
+        os.nice(20)
         
         print("Starting LightSpeed TPMS reader")
         while not self.doneEvent.is_set():
@@ -133,7 +133,7 @@ class LightSpeedTPMSSensorHandler(SensorHandler):
                 d = self.sock.recv(TPMS_MESG_LEN)
                 now = time.time()
                 data = LightSpeedTPMSMessageParser.unpack_messages(d)
-                self.pipe_out.send((now, data))
+                self.send_sample(now, data)
             except bt.btcommon.BluetoothError:
                 print("tpms: disconnected")
                 self.sock = None
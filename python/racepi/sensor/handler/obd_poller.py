@@ -0,0 +1,201 @@
+# Copyright 2026 Donour Sizemore
+#
+# This file is part of RacePi
+#
+# RacePi is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 2.
+#
+# RacePi is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RacePi.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Scheduled polling of OBD-II mode 01 parameters through an ELM compatible
+device. Up to six PIDs are requested per message, choosing the parameters
+that are due by their target rate, highest priority then most overdue first.
+"""
+
+import time
+from collections import defaultdict
+
+OBD_MODE_CURRENT_DATA = 0x01
+OBD_RESPONSE_OFFSET = 0x40
+MAX_PIDS_PER_REQUEST = 6  # ELM327 limit for CAN protocols
+
+PRIORITY_LOW = 0
+PRIORITY_NORMAL = 1
+PRIORITY_HIGH = 2
+
+
+class ObdParameter:
+    """
+    Mode 01 parameter id with its decoder and polling schedule
+    """
+
+    def __init__(self, name, pid, length, decode, rate, priority=PRIORITY_NORMAL):
+        """
+        :param name: name of the decoded value
+        :param pid: J1979 parameter id
+        :param length: number of data bytes in the response
+        :param decode: function converting the data bytes to a value
+        :param rate: target polling rate, in Hz
+        :param priority: polling priority when more parameters are due than fit in a request
+        """
+        self.name = name
+        self.pid = pid
+        self.length = length
+        self.decode = decode
+        self.rate = rate
+        self.priority = priority
+
+
+# J1979 standard parameters, rates favour the channels used while driving
+STANDARD_PARAMETERS = [
+    ObdParameter('rpm', 0x0C, 2, lambda d: (d[0] * 256 + d[1]) / 4.0, 20.0, PRIORITY_HIGH),
+    ObdParameter('tps', 0x11, 1, lambda d: d[0] * 100.0 / 255.0, 20.0, PRIORITY_HIGH),
+    ObdParameter('speed', 0x0D, 1, lambda d: float(d[0]), 10.0),  # km/h
+    ObdParameter('map', 0x0B, 1, lambda d: float(d[0]), 10.0),  # kPa
+    ObdParameter('load', 0x04, 1, lambda d: d[0] * 100.0 / 255.0, 5.0),
+    ObdParameter('timing_advance', 0x0E, 1, lambda d: d[0] / 2.0 - 64.0, 5.0),
+    ObdParameter('intake_temp', 0x0F, 1, lambda d: d[0] - 40.0, 1.0, PRIORITY_LOW),
+    ObdParameter('coolant_temp', 0x05, 1, lambda d: d[0] - 40.0, 0.5, PRIORITY_LOW),
+]
+
+
+def parse_elm_response(lines):
+    """
+    Join the frames of ELM responses, shown without headers. Multi frame
+    ISO-TP responses are a line with the message length followed by
+    numbered lines of data, such as '00A', '0:410C1AF81120', '1:0D32...'.
+
+    :param lines: response lines
+    :return: list of messages as bytes, one per responding ECU
+    """
+    messages = []
+    pending = None  # (length, data) of a multi frame message
+    for line in lines:
+        line = line.replace(' ', '')
+        try:
+            if ':' in line:
+                if pending:
+                    pending[1].extend(bytes.fromhex(line.split(':', 1)[1]))
+                    if len(pending[1]) >= pending[0]:
+                        messages.append(bytes(pending[1][:pending[0]]))
+                        pending = None
+            elif len(line) == 3:
+                pending = (int(line, 16), bytearray())
+            else:
+                messages.append(bytes.fromhex(line))
+        except ValueError:
+            pending = None  # status text, such as NO DATA, or a garbled frame
+    return messages
+
+
+def decode_mode01_response(message, parameters):
+    """
+    :param message: response message bytes
+    :param parameters: dictionary of pid to ObdParameter
+    :return: dictionary of parameter name to value
+    """
+    values = {}
+    if not message or message[0] != OBD_MODE_CURRENT_DATA + OBD_RESPONSE_OFFSET:
+        return values
+    i = 1
+    while i < len(message):
+        p = parameters.get(message[i])
+        if not p or i + 1 + p.length > len(message):
+            break  # unknown pid, the remaining data cannot be split
+        values[p.name] = p.decode(message[i + 1:i + 1 + p.length])
+        i += 1 + p.length
+    return values
+
+
+class ObdPoller:
+    """
+    Earliest deadline first polling of parameters at their target rates
+    """
+
+    def __init__(self, stn, parameters=STANDARD_PARAMETERS, max_pids=MAX_PIDS_PER_REQUEST):
+        """
+        :param stn: STNHandler configured without headers
+        :param parameters: list of ObdParameter to poll
+        :param max_pids: maximum number of parameters per request
+        """
+        self.stn = stn
+        self.parameters = {p.pid: p for p in parameters}
+        self.max_pids = max_pids
+        self.next_due = {p.pid: 0.0 for p in parameters}
+        self.value_counts = defaultdict(int)
+        self.requests = 0
+        self.failed_requests = 0
+        self.start_time = time.monotonic()
+
+    def get_due_parameters(self, now):
+        """
+        :param now: monotonic time
+        :return: parameters to request, highest priority then most overdue first
+        """
+        due = [p for p in self.parameters.values() if self.next_due[p.pid] <= now]
+        due.sort(key=lambda p: (-p.priority, self.next_due[p.pid]))
+        return due[:self.max_pids]
+
+    def get_next_due_time(self):
+        return min(self.next_due.values()) if self.next_due else None
+
+    def build_request(self, parameters):
+        return "%02X" % OBD_MODE_CURRENT_DATA + "".join("%02X" % p.pid for p in parameters)
+
+    def poll(self, now=None):
+        """
+        Request the parameters that are due
+
+        :param now: monotonic time
+        :return: dictionary of decoded values, empty if none were due or the request failed
+        """
+        if now is None:
+            now = time.monotonic()
+        parameters = self.get_due_parameters(now)
+        if not parameters:
+            return {}
+        for p in parameters:
+            interval = 1.0 / p.rate
+            next_due = self.next_due[p.pid] + interval
+            # missed deadlines are not caught up, the rate is a maximum
+            self.next_due[p.pid] = next_due if next_due > now else now + interval
+
+        self.requests += 1
+        try:
+            lines = self.stn.send_request(self.build_request(parameters))
+        except IOError:
+            self.failed_requests += 1
+            return {}
+        values = {}
+        for message in parse_elm_response(lines):
+            values.update(decode_mode01_response(message, self.parameters))
+        if not values:
+            self.failed_requests += 1
+        for name in values:
+            self.value_counts[name] += 1
+        return values
+
+    def wait_time(self, now=None):
+        """
+        :return: time until the next parameter is due, in seconds
+        """
+        if now is None:
+            now = time.monotonic()
+        next_due = self.get_next_due_time()
+        return max(next_due - now, 0.0) if next_due is not None else None
+
+    def get_achieved_rates(self, now=None):
+        """
+        :return: dictionary of parameter name to rate of decoded values, in Hz
+        """
+        if now is None:
+            now = time.monotonic()
+        elapsed = max(now - self.start_time, 1e-9)
+        return {p.name: self.value_counts[p.name] / elapsed for p in self.parameters.values()}
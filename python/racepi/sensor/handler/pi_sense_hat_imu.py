@@ -18,6 +18,7 @@ import os
 import time
 
 from racepi.sensor.handler.sensor_handler import SensorHandler
+from racepi.sensor.handler.shared_memory_ring import ImuRecordCodec
 
 try:
     import RTIMU
@@ -29,8 +30,9 @@ SETTINGS_FILE = "/etc/RTIMULib.ini"
 
 class RpiImuSensorHandler(SensorHandler):
 
-    def __init__(self):
-        SensorHandler.__init__(self, self.__record_from_imu)
+    def __init__(self, shared_memory=False):
+        SensorHandler.__init__(self, self.__record_from_imu,
+                               ImuRecordCodec() if shared_memory else None)
 
     def __record_from_imu(self):
         """
@@ -70,6 +72,9 @@ class RpiImuSensorHandler(SensorHandler):
         while not self.doneEvent.is_set():
             if imu.IMURead():
                 data = imu.getIMUData()
-                self.pipe_out.send((time.time(), data))
+                self.send_sample(time.time(), data)
                 time.sleep(poll_interval_ms * 0.95 / 1000.0)
+            else:
+                self.flush_samples_if_due()
+        self.flush_samples()
 
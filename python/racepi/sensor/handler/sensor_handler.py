@@ -14,18 +14,45 @@
 # You should have received a copy of the GNU General Public License
 # along with RacePi.  If not, see <http://www.gnu.org/licenses/>.
 
+import time
 from multiprocessing import Pipe, Event, Process
 
+from racepi.sensor.handler.shared_memory_ring import SharedMemoryRing, DEFAULT_RING_CAPACITY
+
+DEFAULT_BATCH_LATENCY = 0.005  # seconds
+
 
 class SensorHandler:
     """
     Base handler class for using producer-consumer sensor reading, using
     multiproccess
+
+    Samples are passed to the logger process through a pipe by default. If
+    a record codec is specified, samples are instead written to a shared
+    memory ring of fixed size records.
+
+    The pipe transport can optionally batch samples in the handler process,
+    sending lists of samples that are flushed by count or by a maximum
+    latency deadline.
+
+    The pipe is also the wait handle of the logger process. With the shared
+    memory transport, a wake token is sent through the pipe when a sample
+    is written to an empty ring, so the logger is not woken for every sample.
     """
-    def __init__(self, read_func):
+    def __init__(self, read_func, record_codec=None, ring_capacity=DEFAULT_RING_CAPACITY):
+        """
+        :param read_func: function run in the handler process
+        :param record_codec: optional codec selecting the shared memory transport
+        :param ring_capacity: number of samples held by the shared memory ring
+        """
         self.doneEvent = Event()
         self.pipe_out, self.pipe_in = Pipe()
+        self.ring = SharedMemoryRing(record_codec, ring_capacity) if record_codec else None
         self.process = Process(target=read_func)
+        self.batch_size = 1
+        self.batch_latency = DEFAULT_BATCH_LATENCY
+        self.__batch = []
+        self.__batch_deadline = 0.0
 
     def start(self):
         """
@@ -42,14 +69,101 @@ class SensorHandler:
         self.doneEvent.set()
         self.process.join(3)
         self.process.terminate()
+        if self.ring:
+            self.ring.close()
+
+    def set_batching(self, batch_size, batch_latency=DEFAULT_BATCH_LATENCY):
+        """
+        Batch samples sent through the pipe transport. This must be
+        called before the handler is started. The shared memory transport
+        does not need batching and ignores these settings.
+
+        :param batch_size: maximum number of samples per batch, 1 disables batching
+        :param batch_latency: maximum time a sample is held before sending, in seconds
+        """
+        if batch_size < 1:
+            raise ValueError("Batch size must be at least 1")
+        self.batch_size = batch_size
+        self.batch_latency = batch_latency
+
+    def send_sample(self, timestamp, value):
+        """
+        Send a single sample to the logger process. This is called
+        from the handler process.
+
+        :param timestamp: sample time
+        :param value: sample data
+        """
+        if self.ring:
+            was_empty = self.ring.is_empty()
+            if self.ring.put(timestamp, value) and was_empty:
+                self.pipe_out.send(None)  # wake token
+        elif self.batch_size <= 1:
+            self.pipe_out.send((timestamp, value))
+        else:
+            now = time.monotonic()
+            if not self.__batch:
+                self.__batch_deadline = now + self.batch_latency
+            self.__batch.append((timestamp, value))
+            if len(self.__batch) >= self.batch_size or now >= self.__batch_deadline:
+                self.flush_samples()
+
+    def flush_samples(self):
+        """
+        Send all batched samples to the logger process
+        """
+        if self.__batch:
+            self.pipe_out.send(self.__batch)
+            self.__batch = []
+
+    def flush_samples_if_due(self):
+        """
+        Send batched samples if the oldest has reached the latency
+        deadline. Handler loops call this when no new data is available.
+        """
+        if self.__batch and time.monotonic() >= self.__batch_deadline:
+            self.flush_samples()
+
+    def get_batch_timeout(self, default=None):
+        """
+        :param default: timeout to use when batching is disabled
+        :return: maximum time a handler may block waiting for new data
+        """
+        if self.batch_size > 1 and not self.ring:
+            return self.batch_latency if default is None else min(default, self.batch_latency)
+        return default
+
+    def get_wait_handle(self):
+        """
+        :return: connection that becomes readable when new data is available,
+            for use with multiprocessing.connection.wait
+        """
+        return self.pipe_in
+
+    def get_dropped_sample_count(self):
+        """
+        :return: number of samples dropped by the transport
+        """
+        return self.ring.get_dropped_count() if self.ring else 0
 
     def get_all_data(self):
         """
         Read all queued data from sensor handler
         :return: list of sensor data tuples, each tuple is (time, value)
         """
+        if self.ring:
+            # discard wake tokens before draining, so that a token sent
+            # after this point always refers to unread data
+            while self.pipe_in.poll():
+                self.pipe_in.recv()
+            return self.ring.get_all()
+
         data = []
         while self.pipe_in.poll():
-            data.append(self.pipe_in.recv())
+            sample = self.pipe_in.recv()
+            if type(sample) is list:
+                data.extend(sample)  # batch of samples
+            else:
+                data.append(sample)
         return data
 
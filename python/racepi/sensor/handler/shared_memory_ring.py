@@ -0,0 +1,219 @@
+# Copyright 2026 Donour Sizemore
+#
+# This file is part of RacePi
+#
+# RacePi is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 2.
+#
+# RacePi is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RacePi.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Shared memory transport for sensor handlers. Samples are written by
+the handler process into a single-producer, single-consumer ring of
+fixed size binary records and drained in bulk by the logger process,
+avoiding a pickle and a pipe write for every sample.
+"""
+
+import math
+import struct
+from multiprocessing import shared_memory
+
+from racepi.can.data import CanSample
+
+DEFAULT_RING_CAPACITY = 8192
+
+# The ring header holds three counters. The producer only writes the
+# head and dropped counts, the consumer only writes the tail, so no
+# locking is required between the two processes.
+RING_COUNTER = struct.Struct("=Q")
+RING_HEAD_OFFSET = 0
+RING_TAIL_OFFSET = 8
+RING_DROPPED_OFFSET = 16
+RING_HEADER_SIZE = 24
+
+GPS_TIME_LEN = 24
+GPS_MISSING_VALUE = 'n/a'
+
+
+class CanRecordCodec:
+    """
+    CAN frames stored as arbitration id, flags, data length and payload
+    """
+    record = struct.Struct("=dIIB8s")  # timestamp, arbitration id, flags, dlc, payload
+
+    @staticmethod
+    def encode(timestamp, value):
+        sample = CanSample.coerce(value)
+        return timestamp, sample.arbitration_id, sample.flags, sample.dlc, sample.payload
+
+    @staticmethod
+    def decode(fields):
+        t, arb_id, flags, dlc, payload = fields
+        return t, CanSample(arb_id, payload[:dlc], dlc, flags)
+
+
+class ImuRecordCodec:
+    """
+    IMU samples stored as fusion pose, acceleration and rotation rates
+    """
+    record = struct.Struct("=10d")  # timestamp, r, p, y, accel xyz, gyro xyz
+
+    @staticmethod
+    def encode(timestamp, value):
+        return (timestamp,) + tuple(value['fusionPose']) + \
+            tuple(value['accel']) + tuple(value['gyro'])
+
+    @staticmethod
+    def decode(fields):
+        return fields[0], {
+            'fusionPose': fields[1:4],
+            'accel': fields[4:7],
+            'gyro': fields[7:10],
+        }
+
+
+class GpsRecordCodec:
+    """
+    gpsd TPV reports stored as the fields used by the logger. Missing
+    values are stored as NaN and restored as gpsd's 'n/a' marker.
+    """
+    record = struct.Struct("=d%dsb9d" % GPS_TIME_LEN)  # timestamp, time, mode, values
+    fields = ['lat', 'lon', 'alt', 'speed', 'track', 'epx', 'epy', 'epv', 'eps']
+
+    @staticmethod
+    def __to_float(v):
+        try:
+            return float(v)
+        except (TypeError, ValueError):
+            return math.nan
+
+    @staticmethod
+    def encode(timestamp, value):
+        gps_time = str(value.get('time', '')).encode()
+        if len(gps_time) > GPS_TIME_LEN:
+            raise ValueError("Invalid gps time: " + str(value.get('time')))
+        mode = value.get('mode')
+        return (timestamp, gps_time, mode if isinstance(mode, int) else 0) + \
+            tuple(GpsRecordCodec.__to_float(value.get(f)) for f in GpsRecordCodec.fields)
+
+    @staticmethod
+    def decode(fields):
+        sample = {
+            'time': fields[1].rstrip(b'\0').decode(),
+            'mode': fields[2],
+        }
+        for k, v in zip(GpsRecordCodec.fields, fields[3:]):
+            sample[k] = GPS_MISSING_VALUE if math.isnan(v) else v
+        return fields[0], sample
+
+
+class SharedMemoryRing:
+    """
+    Lock-free single-producer, single-consumer ring buffer of fixed
+    size records in shared memory. When the ring is full, new samples
+    are dropped and counted rather than blocking the producer.
+    """
+
+    def __init__(self, codec, capacity=DEFAULT_RING_CAPACITY):
+        """
+        :param codec: record codec for the sensor type
+        :param capacity: number of records in the ring
+        """
+        if capacity <= 0:
+            raise ValueError("Ring capacity must be positive")
+        self.codec = codec
+        self.capacity = capacity
+        self.record_size = codec.record.size
+        self.shm = shared_memory.SharedMemory(
+            create=True, size=RING_HEADER_SIZE + capacity * self.record_size)
+        self.buf = self.shm.buf
+        self.buf[:RING_HEADER_SIZE] = bytes(RING_HEADER_SIZE)
+
+    def __get_counter(self, offset):
+        return RING_COUNTER.unpack_from(self.buf, offset)[0]
+
+    def __set_counter(self, offset, value):
+        RING_COUNTER.pack_into(self.buf, offset, value)
+
+    def put(self, timestamp, value):
+        """
+        Write a single sample into the ring. This must only be called
+        from the producer process.
+
+        :return: False if the sample was dropped
+        """
+        head = self.__get_counter(RING_HEAD_OFFSET)
+        tail = self.__get_counter(RING_TAIL_OFFSET)
+        try:
+            if head - tail >= self.capacity:
+                raise OverflowError("ring full")
+            fields = self.codec.encode(timestamp, value)
+            offset = RING_HEADER_SIZE + (head % self.capacity) * self.record_size
+            self.codec.record.pack_into(self.buf, offset, *fields)
+        except (OverflowError, ValueError, TypeError, KeyError, struct.error):
+            self.__set_counter(RING_DROPPED_OFFSET,
+                               self.__get_counter(RING_DROPPED_OFFSET) + 1)
+            return False
+
+        # publish the record only after it is completely written
+        self.__set_counter(RING_HEAD_OFFSET, head + 1)
+        return True
+
+    def get_all(self):
+        """
+        Drain all available records from the ring. This must only be
+        called from the consumer process.
+
+        :return: list of (timestamp, value) samples in write order
+        """
+        head = self.__get_counter(RING_HEAD_OFFSET)
+        tail = self.__get_counter(RING_TAIL_OFFSET)
+        count = head - tail
+        if count <= 0:
+            return []
+
+        start = tail % self.capacity
+        first = min(count, self.capacity - start)
+        segments = [(start, first)]
+        if count > first:
+            segments.append((0, count - first))
+
+        data = []
+        decode = self.codec.decode
+        for index, length in segments:
+            offset = RING_HEADER_SIZE + index * self.record_size
+            view = self.buf[offset:offset + length * self.record_size]
+            data.extend(decode(f) for f in self.codec.record.iter_unpack(view))
+            view.release()
+
+        self.__set_counter(RING_TAIL_OFFSET, head)
+        return data
+
+    def is_empty(self):
+        """
+        :return: True if the consumer has read every published record
+        """
+        return self.__get_counter(RING_HEAD_OFFSET) == self.__get_counter(RING_TAIL_OFFSET)
+
+    def get_dropped_count(self):
+        """
+        :return: number of samples dropped due to overrun or invalid data
+        """
+        return self.__get_counter(RING_DROPPED_OFFSET)
+
+    def close(self):
+        """
+        Release and remove the shared memory segment
+        """
+        self.buf = None
+        self.shm.close()
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
@@ -15,6 +15,7 @@
 # You should have received a copy of the GNU General Public License
 # along with RacePi.  If not, see <http://www.gnu.org/licenses/>.
 
+from racepi.can.data import CanSample
 from racepi.sensor.handler.sensor_handler import SensorHandler
 import time
 
@@ -24,7 +25,8 @@ class SimulatedCanSensorHandler(SensorHandler):
     def __init__(self, msg_defs):
         """
         :param msg_defs: list of messages to generate,
-            each should be a tuple of (msg_data, time_between_messages_millis)
+            each should be a tuple of (msg_data, time_between_messages_millis),
+            where msg_data is a CanSample or legacy hex string
         """
         SensorHandler.__init__(self, self.__generate_data)
         self.msg_defs = msg_defs
@@ -43,10 +45,12 @@ class SimulatedCanSensorHandler(SensorHandler):
             now = time.time()*1000
             for m in self.msg_defs:
                 if (last_msg_times[m] + m[1]) < now:
-                    self.pipe_out.send((now, m[0]))
+                    self.send_sample(now, CanSample.coerce(m[0]))
                     last_msg_times[m] = now
+            self.flush_samples_if_due()
             time.sleep(0.001)
 
+        self.flush_samples()
         print("Shutting down CAN reader")
 
 
@@ -15,13 +15,17 @@
 # You should have received a copy of the GNU General Public License
 # along with RacePi.  If not, see <http://www.gnu.org/licenses/>.
 
+import select
 import socket
 import time
 import struct
 import sys
 import os
 
+from racepi.can.data import CanSample, CAN_EFF_FLAG, CAN_EFF_MASK, CAN_SFF_MASK
+from racepi.can.filters import build_can_filters
 from racepi.sensor.handler.sensor_handler import SensorHandler
+from racepi.sensor.handler.shared_memory_ring import CanRecordCodec
 
 if not hasattr(socket, "PF_CAN"):
     raise RuntimeError("No SocketCAN support found: please use Python3.3+")
@@ -29,44 +33,165 @@ if not hasattr(socket, "PF_CAN"):
 DEFAULT_CAN_DEVICE = "slcan0"
 
 # Basic data frame format: https://en.wikipedia.org/wiki/CAN_bus#Data_frame
-CAN_MESSAGE_FMT = "<IB3x8B"
+CAN_MESSAGE_FMT = "<IB3x8s"
+CAN_MESSAGE = struct.Struct(CAN_MESSAGE_FMT)
+CAN_FLAGS_MASK = ~CAN_EFF_MASK & 0xFFFFFFFF
+
+# kernel receive timestamps, the constant is missing from some Python builds
+SO_TIMESTAMP = getattr(socket, "SO_TIMESTAMP", 29)
+TIMEVAL = struct.Struct("@ll")
+
+DEFAULT_RX_BATCH_FRAMES = 256
+CAN_READ_TIMEOUT = 1.0  # seconds
+
+
+def set_can_id_filters(cansocket, can_filters):
+    """
+    Set kernel RX filters to receive only specified IDs. This may be
+    called while the socket is being read.
+
+    :param cansocket: raw CAN socket
+    :param can_filters: list of ids, id ranges or DBC messages, see
+        build_can_filters. None or empty receives every frame.
+    """
+    filters = build_can_filters(can_filters)
+    filter_data = []
+    for can_id, can_mask in filters:
+        filter_data.append(can_id)
+        filter_data.append(can_mask)
+        print("setting filter: %08x/%08x" % (can_id, can_mask))
+    cansocket.setsockopt(socket.SOL_CAN_RAW, socket.CAN_RAW_FILTER,
+                         struct.pack("={}I".format(len(filter_data)), *filter_data))
+
+
+def open_can_socket(device_name, can_filters):
+    """
+    :param device_name: name of socketcan device (e.g. slcan0)
+    :param can_filters: list of allowed ids, id ranges or DBC messages
+    :return: bound raw CAN socket or None if the device is not available
+    """
+    cansocket = socket.socket(socket.PF_CAN, socket.SOCK_RAW, socket.CAN_RAW)
+    set_can_id_filters(cansocket, can_filters)
+    try:
+        cansocket.bind((device_name,))
+    except OSError as e:
+        print(str(e) + ":" + device_name, file=sys.stderr)
+        cansocket.close()
+        return None
+    return cansocket
+
+
+def decode_can_fields(can_id, dlc, payload):
+    """
+    :return: CanSample from the fields of an unpacked can_frame
+    """
+    flags = can_id & CAN_FLAGS_MASK
+    arb_id = can_id & (CAN_EFF_MASK if flags & CAN_EFF_FLAG else CAN_SFF_MASK)
+    dlc = min(dlc, 8)
+    return CanSample(arb_id, payload[:dlc], dlc, flags)
+
+
+def get_rx_timestamp(ancdata):
+    """
+    :param ancdata: ancillary data of a received message
+    :return: kernel receive time, or the current time if the message has none
+    """
+    for level, kind, data in ancdata:
+        if level == socket.SOL_SOCKET and kind == SO_TIMESTAMP and len(data) >= TIMEVAL.size:
+            sec, usec = TIMEVAL.unpack_from(data)
+            return sec + usec * 1e-6
+    return time.time()
+
+
+class CanFrameReceiver:
+    """
+    Bulk reader of a raw CAN socket. Queued frames are read with
+    non-blocking recvmsg_into calls into a preallocated buffer until the
+    socket is empty, then unpacked in a single pass. Frames are stamped
+    with their kernel receive time instead of the time they were read.
+    """
+
+    def __init__(self, cansocket, max_frames=DEFAULT_RX_BATCH_FRAMES):
+        """
+        :param cansocket: bound raw CAN socket, made non-blocking
+        :param max_frames: maximum number of frames read per call
+        """
+        self.cansocket = cansocket
+        self.max_frames = max_frames
+        self.buffer = bytearray(max_frames * CAN_MESSAGE.size)
+        view = memoryview(self.buffer)
+        size = CAN_MESSAGE.size
+        self.slots = [[view[i * size:(i + 1) * size]] for i in range(max_frames)]
+        self.times = [0.0] * max_frames
+        self.ancbufsize = socket.CMSG_SPACE(TIMEVAL.size)
+
+        cansocket.setsockopt(socket.SOL_SOCKET, SO_TIMESTAMP, 1)
+        cansocket.setblocking(False)
+        self.poller = select.poll()
+        self.poller.register(cansocket, select.POLLIN)
+
+    def read_available(self):
+        """
+        Read queued frames without blocking
+
+        :return: list of (timestamp, CanSample), at most max_frames
+        """
+        count = 0
+        recvmsg_into = self.cansocket.recvmsg_into
+        while count < self.max_frames:
+            try:
+                nbytes, ancdata, _, _ = recvmsg_into(self.slots[count], self.ancbufsize)
+            except (BlockingIOError, InterruptedError):
+                break
+            if nbytes != CAN_MESSAGE.size:
+                continue  # incomplete frame
+            self.times[count] = get_rx_timestamp(ancdata)
+            count += 1
+
+        if not count:
+            return []
+        frames = CAN_MESSAGE.iter_unpack(memoryview(self.buffer)[:count * CAN_MESSAGE.size])
+        return [(t, decode_can_fields(*f)) for t, f in zip(self.times, frames)]
+
+    def receive(self, timeout=None):
+        """
+        Wait for frames to arrive and read all that are queued
+
+        :param timeout: maximum time to wait, in seconds, None waits forever
+        :return: list of (timestamp, CanSample), empty on timeout
+        """
+        if not self.poller.poll(None if timeout is None else timeout * 1000):
+            return []
+        return self.read_available()
 
 
 class SocketCanSensorHandler(SensorHandler):
 
-    def __init__(self, device_name=DEFAULT_CAN_DEVICE, can_filters=[]):
+    def __init__(self, device_name=DEFAULT_CAN_DEVICE, can_filters=None, shared_memory=False):
         """
         :param device_name: name of socketcan device (e.g. slcan0)
-        :param can_filters: list of allowed arbitration IDs, as integer
+        :param can_filters: list of allowed ids, id ranges or DBC messages,
+            see build_can_filters. None receives every frame.
+        :param shared_memory: use the shared memory ring transport
         """
 
         # TODO this should retry in the case that the device comes online
         # while running
 
-        SensorHandler.__init__(self, self.__record_from_can)
+        SensorHandler.__init__(self, self.__record_from_can,
+                               CanRecordCodec() if shared_memory else None)
         self.dev_name = device_name
-        self.cansocket = socket.socket(socket.PF_CAN, socket.SOCK_RAW, socket.CAN_RAW)
-        self._set_can_id_filters(can_filters)
-        try:
-            self.cansocket.bind((self.dev_name,))
-        except OSError as e:
-            print(str(e) + ":" + self.dev_name, file=sys.stderr)
-            self.cansocket = None
-
-    def _set_can_id_filters(self, can_filters):
+        self.cansocket = open_can_socket(device_name, can_filters)
+
+    def set_can_filters(self, can_filters):
         """
-        Set RX filters to receive only specified IDs
+        Replace the kernel RX filters. The socket is shared with the
+        reader process, so this takes effect while recording.
 
-        :param can_filters: list of arbitration IDs to receive
+        :param can_filters: list of allowed ids, id ranges or DBC messages
         """
-        filter_fmt = "={}I".format(2 * len(can_filters))
-        filter_data = []
-        for f in can_filters:
-            filter_data.append(f)
-            filter_data.append(0xFFF)
-            print("setting filter: %s" % str(f))
-        self.cansocket.setsockopt(socket.SOL_CAN_RAW, socket.CAN_RAW_FILTER,
-                                  struct.pack(filter_fmt, *filter_data))
+        if self.cansocket:
+            set_can_id_filters(self.cansocket, can_filters)
 
     def __record_from_can(self):
 
@@ -76,24 +201,19 @@ class SocketCanSensorHandler(SensorHandler):
         os.system("taskset -p 0xfe %d" % os.getpid())
         os.nice(30)
         
-        message_size = struct.calcsize(CAN_MESSAGE_FMT)
+        receiver = CanFrameReceiver(self.cansocket) if self.cansocket else None
+        # wake up periodically to send partially filled batches
+        timeout = self.get_batch_timeout(CAN_READ_TIMEOUT)
 
         print("Starting Socket-CAN reader")
-        while not self.doneEvent.is_set() and self.cansocket:
-            data = self.cansocket.recv(message_size)
-            now = time.time()
-            if data:
-
-                # this unpacking is not strictly necessary, but is a nice
-                # convention and adopted by most socketcan handlers
-                data = struct.unpack(CAN_MESSAGE_FMT, data)
-
-                # check for empty data
-                if data and len(data) > 1:
-                    # pack the message back into a string
-                    result = "%03x" % data[0] + \
-                             "".join([("%02x" % v) for v in data[2:]])
-                    self.pipe_out.send((now, result))
-
+        while not self.doneEvent.is_set() and receiver:
+            frames = receiver.receive(timeout)
+            if not frames:
+                self.flush_samples_if_due()
+                continue
+            for t, sample in frames:
+                self.send_sample(t, sample)
+
+        self.flush_samples()
         print("Shutting down SocketCAN reader")
 
@@ -25,41 +25,160 @@ with WiFi bridged devices such as the OBDLink MX.
 
 import serial
 import time
+from collections import deque
+
+from racepi.can.data import CAN_EFF_FLAG, CAN_EFF_MASK, CAN_SFF_MASK
 
 BAUD_RATE = "576000"
 DEV_NAME = "/dev/obdlink"
 FORCE_PROTOCOL = 6
 ST_PROTOCOL = 33
-RESET_WAIT_TIME_SECONDS = 6.0
+RESET_WAIT_TIME_SECONDS = 6.0  # maximum, the device usually reports ready sooner
+COMMAND_TIMEOUT = 1.0  # seconds
+SERIAL_READ_TIMEOUT = 0.1  # seconds, bounds the wait for the first byte of a read
+PROMPT = b'>'
+SERIAL_BITS_PER_BYTE = 10  # start, 8 data and stop bits
 
 GREEN = '\033[92m'
 ENDC = '\033[0m'
 BOLD = '\033[1m'
 
 
+class STNLineReader:
+    """
+    Buffered reader of the device's carriage return terminated output.
+    Everything waiting in the serial driver is read at once and complete
+    lines are returned together, so monitor mode output at full baud rate
+    does not overrun the adapter.
+    """
+
+    def __init__(self, port):
+        """
+        :param port: serial port with a read timeout
+        """
+        self.port = port
+        self.buffer = bytearray()
+
+    def clear(self):
+        """
+        Discard partially read output
+        """
+        self.buffer.clear()
+
+    def __read_complete_lines(self):
+        """
+        :return: (list of complete lines, number of bytes read after them)
+        """
+        data = self.port.read(self.port.in_waiting or 1)
+        if not data:
+            return [], 0
+        self.buffer += data
+        end = self.buffer.rfind(b'\r')
+        if end < 0:
+            return [], 0
+        lines = self.buffer[:end].split(b'\r')
+        del self.buffer[:end + 1]
+        return lines, len(self.buffer)
+
+    @staticmethod
+    def __decode(line):
+        # a prompt precedes the output following a command
+        return line.lstrip(PROMPT).decode(errors='replace')
+
+    def read_lines(self):
+        """
+        Read available output, waiting up to the port timeout if there is none
+
+        :return: list of complete, non-empty lines without prompts
+        """
+        lines, _ = self.__read_complete_lines()
+        return [l for l in (self.__decode(l) for l in lines) if l]
+
+    def read_timed_lines(self, byte_time):
+        """
+        Read available output like read_lines, with the arrival time of
+        each line estimated from its position in the read. The last byte
+        read is taken to have arrived at the time of the read and every
+        byte before it one byte time earlier. Output that waited in the
+        serial driver is timestamped as if it had arrived back to back, the
+        latest times possible at the baud rate, so estimates never precede
+        the previous read.
+
+        :param byte_time: transmission time of one byte, in seconds
+        :return: list of (time, line) of complete, non-empty lines without prompts
+        """
+        lines, trailing = self.__read_complete_lines()
+        if not lines:
+            return []
+        now = time.time()
+        # bytes received after the terminator of each line
+        after = trailing + sum(len(l) + 1 for l in lines)
+        timed = []
+        for l in lines:
+            after -= len(l) + 1
+            line = self.__decode(l)
+            if line:
+                timed.append((now - after * byte_time, line))
+        return timed
+
+    def read_response(self, timeout):
+        """
+        Read the response to a command, which ends with the prompt
+
+        :param timeout: maximum time to wait for the prompt, in seconds
+        :return: list of non-empty response lines
+        :raises: IOError if the prompt does not arrive in time
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            end = self.buffer.find(PROMPT)
+            if end >= 0:
+                lines = self.buffer[:end].split(b'\r')
+                del self.buffer[:end + 1]
+                return [l.decode(errors='replace') for l in lines if l]
+            if time.monotonic() >= deadline:
+                raise IOError("Timeout waiting for STN11xx prompt")
+            self.buffer += self.port.read(self.port.in_waiting or 1)
+
+
 class STNHandler:
+    """
+    Command interface to the device. Commands are sent as soon as the
+    device prompts for input and responses are read up to the next
+    prompt, so commands complete as fast as the device and bus allow.
 
-    def __init__(self, dev=DEV_NAME, baud=BAUD_RATE, headers=True):
+    The device aborts a command if more input arrives while it is being
+    processed, so commands are never written ahead of the prompt.
+    """
+
+    def __init__(self, dev=DEV_NAME, baud=BAUD_RATE, headers=True, port=None):
+        """
+        :param dev: serial device name
+        :param baud: serial baud rate
+        :param headers: show message headers in responses
+        :param port: open serial port to use instead of dev
+        """
 
         # TODO autodetect and set baudrate
         # TODO auto retry and reinit on hotplug
         print("Initializing STN11xx device on port %s" % dev)
         self.headers = headers
-        self.port = serial.Serial(dev, baud)
+        self.port = port if port else serial.Serial(dev, baud, timeout=SERIAL_READ_TIMEOUT)
+        self.byte_time = SERIAL_BITS_PER_BYTE / float(baud)
+        self.reader = STNLineReader(self.port)
+        self.lines = deque()
+        self.monitor_extended = None
 
         # reset device and wait for startup
-        self.__send_command('atz')
-        time.sleep(RESET_WAIT_TIME_SECONDS)
-        self.port.read()  # empty buffer
-
-        self.get_sample("ATE0")        # command echo
-        self.__run_config_cmd("ATL0")  # line breaks
-        self.__run_config_cmd("ATS0")  # whitespace
-        self.__run_config_cmd("ATAL")  # long messages
-        if self.headers:
-            self.__run_config_cmd("ATH1")  # headers
-        else:
-            self.__run_config_cmd("ATH0")  # headers
+        self.__reset()
+
+        self.run_config_commands([
+            "ATE0",  # command echo
+            "ATL0",  # line breaks
+            "ATS0",  # whitespace
+            "ATAL",  # long messages
+            "ATH1" if self.headers else "ATH0",  # headers
+        ])
 
         self.elm_version = self.get_sample('ati')
         self.stn_version = self.get_sample('sti')
@@ -75,31 +194,61 @@ class STNHandler:
         print("Found device: %s" % self.stn_version)
         
         # set manual protocol selection
-        self.__run_config_cmd("stp " + str(ST_PROTOCOL))
-        self.__run_config_cmd("atsp " + str(FORCE_PROTOCOL))
-        
+        self.run_config_commands(["stp " + str(ST_PROTOCOL),
+                                  "atsp " + str(FORCE_PROTOCOL)])
+
+    def __reset(self):
+        """
+        Reset the device, returning as soon as it reports its identity
+
+        :raises: IOError if the device does not become ready
+        """
+        deadline = time.monotonic() + RESET_WAIT_TIME_SECONDS
+        while time.monotonic() < deadline:
+            # a device in monitor mode may take the first characters as an
+            # interrupt, so repeat the reset until the banner arrives
+            self.__send_command('atz')
+            try:
+                lines = self.reader.read_response(max(deadline - time.monotonic(), 0))
+            except IOError:
+                break
+            if any('ELM327' in l for l in lines):
+                return
+        raise IOError("STN11xx device not ready after reset")
+
     def set_monitor_ids(self, ids):
         """
         Reset CAN monitors to only allow data from the list
         of CAN IDs specified in ids
         """
-
-        # TODO: these can_ids will need to be converted to strings
-        # to work; passing in ints will fail
-
-        self.__run_config_cmd("stfcp")
-        self.__run_config_cmd("stfcb")
-        self.__run_config_cmd("stfab FFF,FFF")
+        cmds = ["stfcp", "stfcb", "stfab FFF,FFF"]
+        formats = set()
         if ids:
             for can_id in ids:
-                self.__run_config_cmd("stfap %03x,FFF" % can_id)
-
-    def __run_config_cmd(self, cmd):
-        r = self.get_sample(cmd)
-        print("STN11XX: %s\t=> %s" %
-              (GREEN+cmd+ENDC, BOLD+r+ENDC))
-        if 'ok' not in r.lower():
-            raise IOError("Failed to run cmd: "+cmd)
+                extended = bool(can_id & CAN_EFF_FLAG or can_id > CAN_SFF_MASK)
+                formats.add(extended)
+                if extended:
+                    cmds.append("stfap %08x,%08x" % (can_id & CAN_EFF_MASK, CAN_EFF_MASK))
+                else:
+                    cmds.append("stfap %03x,%03x" % (can_id, CAN_SFF_MASK))
+        self.run_config_commands(cmds)
+        # frame format of the monitored ids, None if both may be received
+        self.monitor_extended = formats.pop() if len(formats) == 1 else None
+
+    def run_config_commands(self, cmds):
+        """
+        Run configuration commands back to back
+
+        :param cmds: list of commands, each must respond OK
+        :raises: IOError if a command fails
+        """
+        for cmd in cmds:
+            lines = self.send_request(cmd)
+            r = " ".join(lines)
+            print("STN11XX: %s\t=> %s" %
+                  (GREEN+cmd+ENDC, BOLD+r+ENDC))
+            if 'ok' not in r.lower():
+                raise IOError("Failed to run cmd: "+cmd)
     
     def get_is_connected(self):
         """
@@ -118,21 +267,32 @@ class STNHandler:
             return False
         return True
 
+    def send_request(self, cmd, timeout=COMMAND_TIMEOUT):
+        """
+        Send a command and read its complete response
+
+        :param cmd: ELM, ST or OBD command
+        :param timeout: maximum time to wait for the response, in seconds
+        :return: list of response lines
+        :raises: IOError if the device does not respond in time
+        """
+        self.__send_command(cmd)
+        return self.reader.read_response(timeout)
+
     def get_sample(self, cmd):
         """
         Send a single ELM AT command and return the one line result
         """
-        self.__send_command(cmd)
-        time.sleep(0.2)  # *sigh* i hate hardware, but i hate python hardware libraries more
-        return self.__get_result()
+        lines = self.send_request(cmd)
+        return lines[0] if lines else ''
         
     def __send_command(self, cmd):
         if self.port:
             self.port.flushOutput()
             self.port.flushInput()
-            for c in cmd:
-                self.port.write(c.encode())
-            self.port.write("\r".encode())
+            self.reader.clear()
+            self.lines.clear()
+            self.port.write(cmd.encode() + b"\r")
 
     def start_monitor(self):
         """
@@ -144,7 +304,13 @@ class STNHandler:
         """
         Disable device monitor mode
         """
-        self.get_sample('ati')
+        # any input interrupts monitoring, the device then prompts
+        self.port.write(b"\r")
+        try:
+            self.reader.read_response(COMMAND_TIMEOUT)
+        except IOError:
+            print("STN11XX: no prompt after stopping monitor")
+        self.lines.clear()
 
     def get_pid(self, mode, pid):
         """
@@ -153,9 +319,11 @@ class STNHandler:
         :param pid:  J1979 parameter id as string
         :return: result
         """
-        self.__send_command(mode+pid)
         # TODO, headers should be checked and stripped here
-        return self.__get_result()
+        lines = self.send_request(mode+pid)
+        if not lines or "no data" in lines[0].lower():
+            return None
+        return lines[0]
 
     def readline(self):
         """
@@ -165,20 +333,45 @@ class STNHandler:
         """
         return self.__get_result()
 
-    def __get_result(self):         
+    def read_lines(self):
+        """
+        Read all complete lines of output available from the device,
+        waiting briefly if there are none. This is the efficient way to
+        read monitor mode output.
+        :return: list of lines, empty if no output arrived
+        """
+        if not self.port:
+            return []
+        if self.lines:
+            lines = list(self.lines)
+            self.lines.clear()
+            return lines
+        return self.reader.read_lines()
+
+    def read_timed_lines(self):
+        """
+        Read all complete lines of output available from the device, like
+        read_lines, with the arrival time of each line estimated from the
+        baud rate, see STNLineReader.read_timed_lines
+        :return: list of (time, line), empty if no output arrived
+        """
+        if not self.port:
+            return []
+        if self.lines:
+            now = time.time()
+            lines = [(now, l) for l in self.lines]
+            self.lines.clear()
+            return lines
+        return self.reader.read_timed_lines(self.byte_time)
+
+    def __get_result(self):
         if self.port:
-            buf = ''
-            while True:
-                c = self.port.read(1).decode()
-                if c == "\r" and len(buf) > 0:
-                    break
-                else:
-                    # if something is in buffer, add everything
-                    if buf != '' or c != ">":
-                        buf = buf + c
+            while not self.lines:
+                self.lines.extend(self.reader.read_lines())
+            buf = self.lines.popleft()
 
             if "no data" in buf.lower():
-                return None                            
+                return None
             return buf
         else:
             return None
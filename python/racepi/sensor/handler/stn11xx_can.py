@@ -19,19 +19,21 @@ SensorHandler for CAN bus data. The handler records all messages
 for a list of specified arbitration IDs. Messages are returned as
 received, not decoded.
 """
-import time
 import os
 
 from serial.serialutil import SerialException
 
+from racepi.can.data import CanSample
 from racepi.sensor.handler.sensor_handler import SensorHandler
+from racepi.sensor.handler.shared_memory_ring import CanRecordCodec
 from racepi.sensor.handler.stn11xx import STNHandler
 
 
 class STN11XXCanSensorHandler(SensorHandler):
 
-    def __init__(self, can_ids=None):
-        SensorHandler.__init__(self, self.__record_from_canbus)
+    def __init__(self, can_ids=None, shared_memory=False):
+        SensorHandler.__init__(self, self.__record_from_canbus,
+                               CanRecordCodec() if shared_memory else None)
         try:
             self.stn = STNHandler()
             self.stn.set_monitor_ids(can_ids)
@@ -39,6 +41,24 @@ class STN11XXCanSensorHandler(SensorHandler):
             print("Failed to initialize CAN device")
             self.stn = None
 
+    def send_lines(self, lines):
+        """
+        Send monitor output lines as samples. With headers enabled, lines
+        hold the id, 3 hex digits for 11bit and 8 for 29bit frames, followed
+        by the payload. When only one frame format is monitored, lines are
+        parsed in that format, else it is taken from the line length.
+
+        :param lines: list of (time, line)
+        """
+        extended = self.stn.monitor_extended if self.stn else None
+        for t, data in lines:
+            if "CAN ERROR" in data or "BUFFER FULL" in data:
+                continue
+            try:
+                self.send_sample(t, CanSample.from_hex(data, extended))
+            except ValueError:
+                pass  # skip partial or garbled lines
+
     def __record_from_canbus(self):
 
         if not self.pipe_out:
@@ -52,12 +72,15 @@ class STN11XXCanSensorHandler(SensorHandler):
             self.stn.start_monitor()
 
             while not self.doneEvent.is_set():
-                data = self.stn.readline()
-                if "CAN ERROR" not in data:
-                    now = time.time()
-                    self.pipe_out.send((now, data))
-                
+                # frames of one read get distinct times from their position in it
+                lines = self.stn.read_timed_lines()
+                if not lines:
+                    self.flush_samples_if_due()
+                    continue
+                self.send_lines(lines)
+
             # stop monitors
+            self.flush_samples()
             self.stn.stop_monitor()
         print("Shutting down CAN reader")
 
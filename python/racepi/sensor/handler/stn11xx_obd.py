@@ -13,18 +13,31 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with RacePi.  If not, see <http://www.gnu.org/licenses/>.
+"""
+SensorHandler for OBD-II data. Mode 01 parameters are polled at their
+target rates, several per request, and each sample is a dictionary of
+the values decoded from one response.
+"""
 import time
 import os
 
+from racepi.sensor.handler.obd_poller import ObdPoller, STANDARD_PARAMETERS
 from racepi.sensor.handler.sensor_handler import SensorHandler
 from racepi.sensor.handler.stn11xx import STNHandler
 
+RATE_REPORT_INTERVAL = 30.0  # seconds
+
 
 class STN11XXOBD2SensorHandler(SensorHandler):
 
-    def __init__(self, tty):
+    def __init__(self, tty, parameters=STANDARD_PARAMETERS):
+        """
+        :param tty: serial device of the STN11xx
+        :param parameters: list of ObdParameter to poll
+        """
         SensorHandler.__init__(self, self.__poll_obd2_pids)
         self.stn = STNHandler(dev=tty, headers=False)
+        self.poller = ObdPoller(self.stn, parameters)
 
     def get_tps(self):
         rv = self.stn.get_pid("01", "11")
@@ -37,9 +50,13 @@ class STN11XXOBD2SensorHandler(SensorHandler):
         tps_val = int(int(rv[-2:], 16) * 100 / 255)
         return tps_val
 
+    def __report_rates(self):
+        rates = self.poller.get_achieved_rates()
+        print("OBD2 rates (Hz): " + ", ".join("%s %.1f" % (n, r) for n, r in sorted(rates.items())))
+
     def __poll_obd2_pids(self):
         """
-        Get data from OBD2 pids. Currently this only supports Throttle Position
+        Poll OBD2 pids until stopped
         :return:
         """
         if not self.pipe_out:
@@ -49,15 +66,20 @@ class STN11XXOBD2SensorHandler(SensorHandler):
         os.nice(30)
 
         print("Starting OBD2 reader")
+        next_report = time.monotonic() + RATE_REPORT_INTERVAL
         while not self.doneEvent.is_set():
-
-            tps = self.get_tps()
-            if not tps:
-                time.sleep(0.05)
+            values = self.poller.poll()
+            if values:
+                self.send_sample(time.time(), values)
             else:
-                now = time.time()
-                self.pipe_out.send((now, tps))
+                # nothing was due or the request failed
+                self.doneEvent.wait(min(self.poller.wait_time() or 0.05, 0.05))
+
+            if time.monotonic() >= next_report:
+                self.__report_rates()
+                next_report += RATE_REPORT_INTERVAL
 
+        self.flush_samples()
         print("Shutting down OBD2 reader")
 
 
@@ -14,17 +14,60 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with RacePi.  If not, see <http://www.gnu.org/licenses/>.
-from collections import defaultdict
+from bisect import bisect_left
+
+# expired samples are removed from the front of a source buffer only
+# once they make up this many entries and at least half of the buffer
+COMPACT_THRESHOLD = 1024
+
+
+class SourceBuffer:
+    """
+    Time ordered samples from a single sensor source. Expired samples
+    are skipped by moving a start offset, found by bisecting a parallel
+    list of timestamps, and are periodically compacted away.
+    """
+    def __init__(self):
+        self.samples = []
+        self.times = []
+        self.start = 0
+
+    def __len__(self):
+        return len(self.samples) - self.start
+
+    def extend(self, values):
+        self.samples.extend(values)
+        self.times.extend(v[0] for v in values)
+
+    def expire(self, expire_time):
+        self.start = bisect_left(self.times, expire_time, self.start)
+        if self.start >= COMPACT_THRESHOLD and self.start * 2 >= len(self.samples):
+            self.compact()
+
+    def compact(self):
+        if self.start:
+            del self.samples[:self.start]
+            del self.times[:self.start]
+            self.start = 0
+
+    def get_samples(self):
+        self.compact()
+        return self.samples
 
 
 class DataBuffer:
     """
     Simple collection of buffers for sensor data
+
+    Samples for each source are expected in time order, which is how
+    sensor handlers produce them.
     """
     def __init__(self):
-        self.data = defaultdict(list)
+        self.data = {}
 
     def add_sample(self, source_name, values):
+        if source_name not in self.data:
+            self.data[source_name] = SourceBuffer()
         self.data[source_name].extend(values)
 
     def expire_old_samples(self, expire_time):
@@ -32,12 +75,11 @@ class DataBuffer:
         Expire (remove) all samples older than specified time
         :param expire_time: expiration age timestamp
         """
-        for k in self.data:
-            while self.data[k] and self.data[k][0][0] < expire_time:
-                self.data[k].pop(0)
+        for b in self.data.values():
+            b.expire(expire_time)
 
     def get_available_sources(self):
-        return self.data.keys()
+        return list(self.data.keys())
 
     def get_sensor_data(self, sensor_source):
         """
@@ -49,8 +91,21 @@ class DataBuffer:
         if sensor_source not in self.data:
             raise ValueError("Invalid source specified")
 
-        return self.data[sensor_source]
+        return self.data[sensor_source].get_samples()
+
+    def detach(self):
+        """
+        Move all buffered samples into a new DataBuffer, leaving this
+        buffer empty
+        :return: DataBuffer holding the previously buffered samples
+        """
+        b = DataBuffer()
+        b.data = self.data
+        self.data = {}
+        return b
+
+    def get_sample_count(self):
+        return sum(len(b) for b in self.data.values())
 
     def clear(self):
         self.data.clear()
-
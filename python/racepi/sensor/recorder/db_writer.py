@@ -0,0 +1,324 @@
+# Copyright 2026 Donour Sizemore
+#
+# This file is part of RacePi
+#
+# RacePi is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 2.
+#
+# RacePi is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RacePi.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Background database persistence for the sensor logger. Database writes
+run in a worker thread fed by a queue, so that slow storage cannot stall
+the main loop, the display or the live DL1 feed.
+
+Jobs that take long, caching ended sessions and loading flight recorder
+logs, run in a second, low priority worker with its own connection, so
+that they cannot hold up the data of a new session.
+"""
+
+import os
+import time
+from queue import Queue, Empty
+from threading import Lock, Thread
+
+from sqlalchemy.exc import OperationalError
+
+from racepi.database.db_handler import DbHandler
+from racepi.database.session_summary import SessionSummary
+from racepi.sensor.recorder.flight_recorder import ingest_flight_log
+
+DEFAULT_MAX_PENDING_BATCHES = 100
+DEFAULT_SHUTDOWN_TIMEOUT = 10.0  # seconds
+BACKGROUND_NICE_INCREMENT = 10
+# jobs failing because the other worker holds the database lock are retried
+MAX_LOCKED_RETRIES = 5
+LOCKED_RETRY_DELAY = 0.5  # seconds
+
+JOB_NEW_SESSION = 1
+JOB_LOG_DATA = 2
+JOB_FINALIZE_SESSION = 3
+JOB_INGEST_LOG = 4
+JOB_CONTINUE_SESSION = 5
+
+
+class DatabaseWriter:
+    """
+    Worker thread owning all access to a DbHandler.
+
+    Data batches are bounded: when the worker falls too far behind, new
+    batches are dropped and counted instead of blocking the caller.
+    Session creation is never dropped, so queued data always refers to
+    an existing session.
+
+    Session statistics are accumulated as data is written. Once all data
+    of an ended session is written, its summary is handed to the
+    background worker, which writes it and, if a cache is configured, the
+    columnar copy of the session. Background jobs do not count against
+    the pending batch limit.
+
+    A job that fails because the other worker holds the database lock
+    past the busy timeout is retried instead of dropped.
+    """
+
+    def __init__(self, db_handler, max_pending_batches=DEFAULT_MAX_PENDING_BATCHES, session_cache=None):
+        """
+        :param db_handler: connected DbHandler
+        :param max_pending_batches: maximum number of queued data batches
+        :param session_cache: optional SessionCache written when sessions end
+        """
+        self.db_handler = db_handler
+        self.max_pending_batches = max_pending_batches
+        self.session_cache = session_cache
+        self.dropped_batches = 0
+        self.dropped_samples = 0
+        self.written_samples = 0
+        self.failed_jobs = 0
+        self.__stats_lock = Lock()  # the counters above are updated by both workers
+        self.__summaries = {}
+        self.__ingested_summaries = {}  # used by the background worker only
+        self.__queue = Queue()
+        self.__thread = Thread(target=self.__run)
+        self.__thread.daemon = True
+        self.__background_queue = Queue()
+        self.__background_thread = Thread(target=self.__run_background)
+        self.__background_thread.daemon = True
+
+    def start(self):
+        self.__thread.start()
+        self.__background_thread.start()
+
+    def stop(self, timeout=DEFAULT_SHUTDOWN_TIMEOUT):
+        """
+        Write all queued jobs and stop the worker threads. If a worker does
+        not finish in time, the queued jobs that can be dropped or redone
+        later are removed, so that ended sessions are still finalized, and
+        the worker is given another timeout.
+
+        :param timeout: maximum time to wait for pending writes, in seconds
+        """
+        if self.__thread.is_alive():
+            self.__queue.put(None)
+            self.__thread.join(timeout)
+            if self.__thread.is_alive():
+                dropped = self.__remove_jobs(self.__queue, JOB_LOG_DATA)
+                with self.__stats_lock:
+                    self.dropped_batches += len(dropped)
+                    self.dropped_samples += sum(job[1].get_sample_count() for job in dropped)
+                print("Database writer shutdown timeout, %d batches dropped" % len(dropped))
+                self.__thread.join(timeout)
+                if self.__thread.is_alive():
+                    print("Database writer did not finish pending writes")
+        if self.__background_thread.is_alive():
+            self.__background_queue.put(None)
+            self.__background_thread.join(timeout)
+            if self.__background_thread.is_alive():
+                # the logs stay on disk and are loaded by ingestflightlogs.py
+                skipped = self.__remove_jobs(self.__background_queue, JOB_INGEST_LOG)
+                print("Database writer shutdown timeout, %d flight logs not loaded" % len(skipped))
+                self.__background_thread.join(timeout)
+                if self.__background_thread.is_alive():
+                    print("Database writer did not finish background jobs")
+
+    @staticmethod
+    def __remove_jobs(queue, job_type):
+        """
+        Remove queued jobs of a type, keeping the other jobs in order
+
+        :return: list of removed jobs
+        """
+        kept = []
+        removed = []
+        while True:
+            try:
+                job = queue.get_nowait()
+            except Empty:
+                break
+            if job and job[0] == job_type:
+                removed.append(job)
+            else:
+                kept.append(job)
+        for job in kept:
+            queue.put(job)
+        return removed
+
+    def get_pending_count(self):
+        return self.__queue.qsize()
+
+    def create_session(self):
+        """
+        Queue creation of a new session
+
+        :return: id of the new session
+        """
+        session_id = self.db_handler.generate_session_id()
+        self.__queue.put((JOB_NEW_SESSION, session_id))
+        return session_id
+
+    def submit(self, data, session_id):
+        """
+        Queue buffered data for writing. The caller must not modify the
+        buffer after submitting it.
+
+        :param data: DataBuffer of recorded data
+        :param session_id: id of the session the data belongs to
+        :return: False if the batch was dropped
+        """
+        if self.__queue.qsize() >= self.max_pending_batches:
+            with self.__stats_lock:
+                self.dropped_batches += 1
+                self.dropped_samples += data.get_sample_count()
+            return False
+        self.__queue.put((JOB_LOG_DATA, data, session_id))
+        return True
+
+    def finalize_session(self, session_id):
+        """
+        Queue writing of the summary and cache for a session that has ended
+
+        :param session_id: id of the ended session
+        """
+        self.__queue.put((JOB_FINALIZE_SESSION, session_id))
+
+    def ingest_log(self, path, recorder=None):
+        """
+        Queue loading of a flight recorder log, see
+        racepi.sensor.recorder.flight_recorder
+
+        :param path: path of the log file, removed once it is loaded
+        :param recorder: optional FlightRecorder of the log, closed by the
+            background worker before loading so the caller does not wait
+            for the final flush. The caller must not use it afterwards.
+        """
+        self.__background_queue.put((JOB_INGEST_LOG, path, recorder, False))
+
+    def continue_session(self, recorder):
+        """
+        Continue the session of a failed flight recorder in the database.
+        The session is created so that data of the same session id can be
+        submitted right away, and the log is loaded in the background.
+
+        :param recorder: FlightRecorder of the session, which the caller
+            must not use afterwards
+        """
+        self.__queue.put((JOB_CONTINUE_SESSION, recorder))
+
+    def __run_job(self, job):
+        if job[0] == JOB_NEW_SESSION:
+            self.db_handler.get_new_session(job[1])
+            self.__summaries[job[1]] = SessionSummary()
+        elif job[0] == JOB_LOG_DATA:
+            _, data, session_id = job
+            rows = self.db_handler.log_data_from_active_session(data, session_id)
+            self.__add_written_samples(data.get_sample_count())
+            summary = self.__summaries.setdefault(session_id, SessionSummary())
+            for source in rows:
+                summary.add_rows(source, rows[source])
+        elif job[0] == JOB_CONTINUE_SESSION:
+            recorder = job[1]
+            self.db_handler.get_new_session(recorder.session_id)
+            self.__summaries[recorder.session_id] = SessionSummary()
+            self.__background_queue.put((JOB_INGEST_LOG, recorder.path, recorder, True))
+        elif job[0] == JOB_FINALIZE_SESSION:
+            # all data of the session is written, the rest is background work
+            self.__background_queue.put((JOB_FINALIZE_SESSION, job[1], self.__summaries.pop(job[1], None)))
+
+    def __run_background_job(self, db_handler, job):
+        if job[0] == JOB_FINALIZE_SESSION:
+            _, session_id, summary = job
+            # kept until the job succeeds, so that a retry merges it again
+            ingested = self.__ingested_summaries.get(session_id)
+            if ingested:
+                # the session was recorded in part by a flight recorder
+                merged = SessionSummary()
+                merged.merge(ingested)
+                if summary:
+                    merged.merge(summary)
+                summary = merged
+            if summary:
+                db_handler.write_session_info(session_id, summary)
+            if self.session_cache:
+                self.session_cache.write_session(db_handler.db_session, session_id)
+            self.__ingested_summaries.pop(session_id, None)
+        elif job[0] == JOB_INGEST_LOG:
+            _, path, recorder, continued = job
+            if recorder:
+                try:
+                    recorder.close()
+                except OSError as e:
+                    # the log is still read up to its last valid block
+                    print("Flight recorder log was not closed: %s" % e)
+            if continued:
+                summary = SessionSummary()
+                reader = ingest_flight_log(path, db_handler, summary=summary)
+                self.__ingested_summaries[reader.session_id] = summary
+            else:
+                reader = ingest_flight_log(path, db_handler, self.session_cache)
+            self.__add_written_samples(reader.sample_count)
+
+    def __add_written_samples(self, count):
+        with self.__stats_lock:
+            self.written_samples += count
+
+    @staticmethod
+    def __is_retryable(job):
+        # a continued session's log adds to data that is already written
+        return not (job[0] == JOB_INGEST_LOG and job[3])
+
+    def __run_with_retry(self, run_job, db_handler, job):
+        """
+        Run a job, retrying it while the database is locked by the other worker
+        """
+        attempt = 0
+        while True:
+            try:
+                run_job(job)
+                return
+            except OperationalError as e:
+                if db_handler.db_session:
+                    db_handler.db_session.rollback()
+                if 'database is locked' not in str(e) or attempt >= MAX_LOCKED_RETRIES or \
+                        not self.__is_retryable(job):
+                    raise
+            attempt += 1
+            print("Database locked, retrying write")
+            time.sleep(LOCKED_RETRY_DELAY)
+
+    def __run_jobs(self, queue, run_job, db_handler):
+        while True:
+            job = queue.get()
+            if job is None:
+                break
+            try:
+                self.__run_with_retry(run_job, db_handler, job)
+            except Exception as e:
+                with self.__stats_lock:
+                    self.failed_jobs += 1
+                print("Database write failed: %s" % e)
+
+    def __run(self):
+        self.__run_jobs(self.__queue, self.__run_job, self.db_handler)
+
+    def __run_background(self):
+        try:
+            # on Linux this only lowers the priority of the calling thread
+            os.setpriority(os.PRIO_PROCESS, 0, os.getpriority(os.PRIO_PROCESS, 0) + BACKGROUND_NICE_INCREMENT)
+        except (AttributeError, OSError):
+            pass  # thread priorities are not available on every platform
+        # the background worker has its own connection, opened when first needed
+        db_handler = DbHandler(self.db_handler.db_path, self.db_handler.busy_timeout)
+
+        def run_job(job):
+            if not db_handler.db_session:
+                db_handler.connect()
+            self.__run_background_job(db_handler, job)
+
+        self.__run_jobs(self.__background_queue, run_job, db_handler)
+        if db_handler.db_session:
+            db_handler.db_session.close()
@@ -0,0 +1,471 @@
+# Copyright 2026 Donour Sizemore
+#
+# This file is part of RacePi
+#
+# RacePi is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 2.
+#
+# RacePi is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RacePi.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Append-only binary session log, written through a memory map while
+recording and loaded into the database after the session ends.
+
+A log is a file header followed by blocks. Each block holds the fixed
+size records of one sensor source, encoded with the shared memory ring
+codecs, behind a header with a marker, the record count and a CRC32 of
+the header and records. Mapped pages are flushed to storage at periodic
+sync points, by a worker thread that also grows the file.
+
+After a power loss, every block with a valid CRC is recovered: damaged
+regions are skipped by scanning for the next block marker, and the
+preallocated space after the last block is ignored.
+"""
+
+import mmap
+import os
+import struct
+import time
+import zlib
+from threading import Condition, Thread
+
+from racepi.database.objects import Session, SessionInfo, GPSData, IMUData, CANData, TireData
+from racepi.database.session_summary import SessionSummary
+from racepi.sensor.handler.shared_memory_ring import CanRecordCodec, GpsRecordCodec, ImuRecordCodec
+from racepi.sensor.recorder.data_buffer import DataBuffer
+
+FLIGHT_LOG_EXTENSION = ".rpfr"
+FLIGHT_LOG_DIR_NAME = "flight_logs"
+FLIGHT_LOG_MAGIC = b'RPFR'
+FLIGHT_LOG_VERSION = 1
+BLOCK_MARKER = b'RPBK'
+
+# magic, version, flags, session id, creation time
+FILE_HEADER = struct.Struct("=4sHH36sd12x")
+# marker, source, reserved, record count, payload length, sequence number, crc32
+BLOCK_HEADER = struct.Struct("=4sBBHIQI")
+BLOCK_CRC = struct.Struct("=I")
+BLOCK_CRC_OFFSET = BLOCK_HEADER.size - BLOCK_CRC.size  # the crc covers the header up to here
+
+MAX_BLOCK_RECORDS = 4096
+DEFAULT_SYNC_INTERVAL = 1.0  # seconds
+DEFAULT_GROW_SIZE = 4 * 1024 * 1024  # bytes of file space reserved at a time
+DEFAULT_INGEST_BATCH_SAMPLES = 10000
+
+SOURCE_CODES = {'gps': 1, 'imu': 2, 'can': 3}
+SOURCE_NAMES = {code: source for source, code in SOURCE_CODES.items()}
+SOURCE_CODECS = {1: GpsRecordCodec, 2: ImuRecordCodec, 3: CanRecordCodec}
+
+fdatasync = getattr(os, 'fdatasync', os.fsync)
+
+
+class FlightRecorder:
+    """
+    Writer of a session log. Records are packed directly into the mapped
+    file, which grows in preallocated steps so that running out of space
+    is reported when growing instead of faulting on a mapped write.
+
+    Flushes to storage and file growth run in a worker thread, so that
+    recording never waits on storage. The worker allocates file space
+    ahead of the writes, and the mapping is only extended into space
+    already allocated. Errors of the worker are raised by the next write.
+    """
+
+    def __init__(self, path, session_id, sync_interval=DEFAULT_SYNC_INTERVAL, grow_size=DEFAULT_GROW_SIZE):
+        """
+        :param path: path of the new log file, which must not exist
+        :param session_id: id of the recorded session
+        :param sync_interval: time between flushes to storage, in seconds
+        :param grow_size: bytes added to the file when it is full
+        """
+        self.path = path
+        self.session_id = session_id
+        self.sync_interval = sync_interval
+        self.grow_size = grow_size
+        self.offset = 0
+        self.sequence = 0
+        self.written_samples = 0
+        self.skipped_samples = 0
+        self.__file = open(path, 'x+b')
+        self.__map = None
+        self.__size = 0  # mapped length
+        self.__next_sync = 0.0
+
+        # state shared with the worker thread
+        self.__condition = Condition()
+        self.__allocated = 0  # file space allocated by the worker
+        self.__allocate_target = 0  # file space requested from the worker
+        self.__sync_requested = 0  # sync points requested
+        self.__sync_done = 0  # sync points flushed
+        self.__closing = False
+        self.__error = None
+        self.__thread = Thread(target=self.__run)
+        self.__thread.daemon = True
+        self.__thread.start()
+
+        try:
+            self.__reserve(FILE_HEADER.size)
+        except OSError:
+            self.__stop()
+            os.remove(path)
+            raise
+        FILE_HEADER.pack_into(self.__map, 0, FLIGHT_LOG_MAGIC, FLIGHT_LOG_VERSION, 0,
+                              session_id.encode(), time.time())
+        self.offset = FILE_HEADER.size
+        self.__request_sync()
+
+    def __run(self):
+        fd = self.__file.fileno()
+        while True:
+            with self.__condition:
+                while not self.__closing and self.__sync_done == self.__sync_requested and \
+                        self.__allocate_target <= self.__allocated:
+                    self.__condition.wait()
+                closing = self.__closing
+                sync = self.__sync_requested
+                allocated = self.__allocated
+                target = self.__allocate_target
+
+            error = None
+            try:
+                if closing:
+                    self.__file.truncate(self.offset)
+                elif target > allocated:
+                    if hasattr(os, 'posix_fallocate'):
+                        os.posix_fallocate(fd, allocated, target - allocated)
+                    else:
+                        os.ftruncate(fd, target)
+                    allocated = target
+                # writes to a shared mapping are in the page cache of the file,
+                # so this is a durable flush of the mapped pages
+                fdatasync(fd)
+            except OSError as e:
+                error = e
+
+            with self.__condition:
+                if error:
+                    self.__error = error
+                    self.__allocate_target = self.__allocated  # stop growing
+                else:
+                    self.__allocated = allocated
+                self.__sync_done = sync
+                self.__condition.notify_all()
+            if closing:
+                self.__file.close()
+                return
+
+    def __raise_error(self):
+        if self.__error:
+            raise self.__error
+
+    def __reserve(self, length):
+        end = self.offset + length
+        with self.__condition:
+            self.__raise_error()
+            # keep the worker allocating ahead of the writes
+            if self.__allocate_target - end < self.grow_size // 2:
+                self.__allocate_target = end + self.grow_size
+                self.__condition.notify()
+            if end <= self.__size:
+                return
+            # the worker only falls behind if writes outpace a grow step
+            while self.__allocated < end and not self.__error:
+                self.__condition.wait()
+            self.__raise_error()
+            size = self.__allocated
+        if self.__map:
+            self.__map.close()
+        self.__map = mmap.mmap(self.__file.fileno(), size)
+        self.__size = size
+
+    def __request_sync(self):
+        with self.__condition:
+            self.__sync_requested += 1
+            self.__condition.notify()
+        self.__next_sync = time.monotonic() + self.sync_interval
+
+    @staticmethod
+    def __get_space(code, count):
+        """
+        :return: bytes needed for the blocks of count samples of a source
+        """
+        blocks = -(-count // MAX_BLOCK_RECORDS)
+        return blocks * BLOCK_HEADER.size + count * SOURCE_CODECS[code].record.size
+
+    def write(self, source, samples):
+        """
+        Append samples of a sensor source. Samples of unsupported sources
+        or that cannot be encoded are skipped and counted.
+
+        :param source: name of sensor source
+        :param samples: list of (time, value) samples
+        :raises: OSError if the log could not be extended or flushed
+        """
+        code = SOURCE_CODES.get(source)
+        if code is None:
+            self.skipped_samples += len(samples)
+            return
+        self.__reserve(self.__get_space(code, len(samples)))
+        self.__write_samples(code, samples)
+
+    def __write_samples(self, code, samples):
+        for i in range(0, len(samples), MAX_BLOCK_RECORDS):
+            self.__write_block(code, samples[i:i + MAX_BLOCK_RECORDS])
+
+    def __write_block(self, code, samples):
+        codec = SOURCE_CODECS[code]
+        record_size = codec.record.size
+
+        m = self.__map
+        pack = codec.record.pack_into
+        encode = codec.encode
+        start = self.offset + BLOCK_HEADER.size
+        offset = start
+        for sample in samples:
+            try:
+                pack(m, offset, *encode(*sample))
+            except (ValueError, TypeError, KeyError, struct.error):
+                self.skipped_samples += 1
+                continue
+            offset += record_size
+        count = (offset - start) // record_size
+        if not count:
+            return
+
+        BLOCK_HEADER.pack_into(m, self.offset, BLOCK_MARKER, code, 0, count, offset - start, self.sequence, 0)
+        view = memoryview(m)
+        crc = zlib.crc32(view[start:offset], zlib.crc32(view[self.offset:self.offset + BLOCK_CRC_OFFSET]))
+        view.release()
+        BLOCK_CRC.pack_into(m, self.offset + BLOCK_CRC_OFFSET, crc)
+
+        self.offset = offset
+        self.sequence += 1
+        self.written_samples += count
+
+    def write_buffer(self, data):
+        """
+        Append all samples of a DataBuffer and start a flush to storage if
+        a sync point is due. The flush completes in the background.
+
+        :param data: DataBuffer of recorded data
+        :raises: OSError if the log could not be extended or flushed, in
+            which case nothing of the buffer was written
+        """
+        sources = [(SOURCE_CODES.get(s), data.get_sensor_data(s)) for s in data.get_available_sources()]
+        # space for the whole buffer is reserved first, so it is written entirely or not at all
+        self.__reserve(sum(self.__get_space(code, len(samples)) for code, samples in sources if code))
+        for code, samples in sources:
+            if code is None:
+                self.skipped_samples += len(samples)
+            else:
+                self.__write_samples(code, samples)
+        if time.monotonic() >= self.__next_sync:
+            self.__request_sync()
+
+    def sync(self):
+        """
+        Flush the blocks written so far to storage and wait for the flush
+
+        :raises: OSError if the flush failed
+        """
+        with self.__condition:
+            self.__sync_requested += 1
+            sync = self.__sync_requested
+            self.__condition.notify()
+            while self.__sync_done < sync:
+                self.__condition.wait()
+            self.__raise_error()
+        self.__next_sync = time.monotonic() + self.sync_interval
+
+    def close(self):
+        """
+        Flush the log, release the space reserved after the last block and
+        stop the worker thread. This waits on storage, callers that must
+        not block can hand the recorder to a DatabaseWriter to be closed.
+
+        :raises: OSError if the final flush failed
+        """
+        if not self.__map:
+            return
+        self.__map.close()
+        self.__map = None
+        self.__stop()
+        self.__raise_error()
+
+    def __stop(self):
+        with self.__condition:
+            self.__closing = True
+            self.__condition.notify()
+        self.__thread.join()
+
+
+class FlightLogReader:
+    """
+    Reader of session logs, including logs that were not closed
+    """
+
+    def __init__(self, path):
+        """
+        :param path: path of the log file
+        :raises: IOError if the file is not a session log
+        """
+        self.path = path
+        with open(path, 'rb') as f:
+            header = f.read(FILE_HEADER.size)
+        if len(header) < FILE_HEADER.size:
+            raise IOError("Truncated flight recorder log: " + path)
+        magic, version, _, session_id, created = FILE_HEADER.unpack(header)
+        if magic != FLIGHT_LOG_MAGIC:
+            raise IOError("Invalid flight recorder log: " + path)
+        if version != FLIGHT_LOG_VERSION:
+            raise IOError("Unsupported flight recorder log version %d: %s" % (version, path))
+        self.session_id = session_id.rstrip(b'\0').decode()
+        self.created = created
+
+        self.valid_length = FILE_HEADER.size  # end of the last valid block
+        self.block_count = 0
+        self.sample_count = 0
+        self.corrupt_bytes = 0  # damaged data skipped between valid blocks
+        self.lost_blocks = 0  # gaps in the block sequence
+
+    @staticmethod
+    def __read_block(m, offset):
+        """
+        :return: (source, samples, end offset) of a valid block at the offset, else None
+        """
+        marker, code, _, count, length, sequence, crc = BLOCK_HEADER.unpack_from(m, offset)
+        codec = SOURCE_CODECS.get(code)
+        if marker != BLOCK_MARKER or not codec or not count or length != count * codec.record.size:
+            return None
+        start = offset + BLOCK_HEADER.size
+        end = start + length
+        if end > len(m):
+            return None
+        payload = m[start:end]
+        if zlib.crc32(payload, zlib.crc32(m[offset:offset + BLOCK_CRC_OFFSET])) != crc:
+            return None
+        samples = [codec.decode(f) for f in codec.record.iter_unpack(payload)]
+        return SOURCE_NAMES[code], sequence, samples, end
+
+    def read_blocks(self):
+        """
+        Read all valid blocks in the log
+
+        :return: generator of (source, list of (time, value) samples), one per block
+        """
+        with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            offset = FILE_HEADER.size
+            expected_sequence = 0
+            while offset + BLOCK_HEADER.size <= len(m):
+                block = self.__read_block(m, offset)
+                if not block:
+                    # resynchronize on the next block marker
+                    offset = m.find(BLOCK_MARKER, offset + 1)
+                    if offset < 0:
+                        break
+                    continue
+
+                source, sequence, samples, end = block
+                self.corrupt_bytes += offset - self.valid_length
+                self.lost_blocks += max(sequence - expected_sequence, 0)
+                expected_sequence = sequence + 1
+                self.valid_length = offset = end
+                self.block_count += 1
+                self.sample_count += len(samples)
+                yield source, samples
+
+
+def get_flight_log_dir(db_path):
+    """
+    :param db_path: path of the session database
+    :return: directory of the flight recorder logs of the database
+    """
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), FLIGHT_LOG_DIR_NAME)
+
+
+def find_flight_logs(directory):
+    """
+    :return: sorted paths of the session logs in a directory
+    """
+    if not os.path.isdir(directory):
+        return []
+    return sorted(os.path.join(directory, f) for f in os.listdir(directory)
+                  if f.endswith(FLIGHT_LOG_EXTENSION))
+
+
+def recover_flight_log(path):
+    """
+    Scan a log, which may not have been closed, and truncate it after the
+    last valid block
+
+    :return: FlightLogReader with the recovery statistics
+    """
+    reader = FlightLogReader(path)
+    for _ in reader.read_blocks():
+        pass
+    if os.path.getsize(path) > reader.valid_length:
+        with open(path, 'r+b') as f:
+            f.truncate(reader.valid_length)
+            os.fsync(f.fileno())
+    return reader
+
+
+def __clear_session_data(db_session, session_id):
+    # data written by an interrupted ingest of the same log
+    for table in (GPSData, IMUData, CANData, TireData, SessionInfo):
+        db_session.query(table).filter(table.session_id == session_id).delete(synchronize_session=False)
+    db_session.commit()
+
+
+def ingest_flight_log(path, db_handler, session_cache=None, keep=False,
+                      batch_samples=DEFAULT_INGEST_BATCH_SAMPLES, summary=None):
+    """
+    Load a session log into the database, replacing any data of the
+    session already loaded. The log is removed once it is loaded.
+
+    :param path: path of the log file
+    :param db_handler: connected DbHandler
+    :param session_cache: optional SessionCache to write the session to
+    :param keep: keep the log file after loading
+    :param batch_samples: samples written to the database per transaction
+    :param summary: optional SessionSummary of a session that continues in the
+        database. The loaded data is added to the existing session and to the
+        summary, and writing the session info and cache is left to the caller.
+    :return: FlightLogReader with the recovery statistics
+    """
+    reader = FlightLogReader(path)
+    session_id = reader.session_id
+    db_session = db_handler.db_session
+    # a continued session keeps the data recorded after the log failed
+    continued = summary is not None
+    if not continued:
+        if db_session.query(Session).filter(Session.id == session_id).count():
+            __clear_session_data(db_session, session_id)
+        else:
+            db_handler.get_new_session(session_id)
+        summary = SessionSummary()
+    data = DataBuffer()
+    for source, samples in reader.read_blocks():
+        data.add_sample(source, samples)
+        if data.get_sample_count() >= batch_samples:
+            rows = db_handler.log_data_from_active_session(data, session_id)
+            for s in rows:
+                summary.add_rows(s, rows[s])
+            data = DataBuffer()
+    rows = db_handler.log_data_from_active_session(data, session_id)
+    for s in rows:
+        summary.add_rows(s, rows[s])
+
+    if not continued:
+        db_handler.write_session_info(session_id, summary)
+        if session_cache:
+            session_cache.write_session(db_session, session_id)
+    if not keep:
+        os.remove(path)
+    return reader
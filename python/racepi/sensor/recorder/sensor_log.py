@@ -26,16 +26,25 @@ import time
 import os
 from enum import Enum
 from collections import defaultdict
+from itertools import groupby
+from multiprocessing.connection import wait
 
-from racepi.sensor.data_utilities import merge_and_generate_ordered_log, safe_speed_to_float
+from racepi.sensor.data_utilities import iter_ordered_log, safe_speed_to_float
 from racepi.racetech.writers import RaceTechnologyDL1FeedWriter
 from racepi.sensor.recorder.pi_sense_hat_display import RacePiStatusDisplay, SenseHat, RacePiHatDisplayMissingError
 from racepi.sensor.recorder.data_buffer import DataBuffer
+from racepi.sensor.recorder.db_writer import DatabaseWriter
+from racepi.sensor.recorder.flight_recorder import FlightRecorder, FLIGHT_LOG_EXTENSION
 
 ACTIVATE_RECORDING_M_PER_S = 9.5
 MOVEMENT_THRESHOLD_M_PER_S = 2.5
 DEFAULT_DATA_BUFFER_TIME_SECONDS = 10.0
 
+# main loop timing, in seconds
+DEFAULT_BATCH_INTERVAL = 0.01  # minimum time between processing passes
+DEFAULT_MAX_LATENCY = 0.05  # maximum time between checks of the handlers
+DEFAULT_DISPLAY_INTERVAL = 0.1
+
 
 class LoggerState(Enum):
     initialized = 1
@@ -59,14 +68,28 @@ class SensorLogger:
     done: logging is no longer possible
     """
 
-    def __init__(self, db_handler, sensor_handlers={}, dbc_filename=None):
+    def __init__(self, db_handler, sensor_handlers={}, dbc_filename=None,
+                 batch_interval=DEFAULT_BATCH_INTERVAL, max_latency=DEFAULT_MAX_LATENCY,
+                 display_interval=DEFAULT_DISPLAY_INTERVAL, session_cache=None, flight_recorder_dir=None):
         """
         Create new logger instance with specified handlers. Input and output
         handlers are required.
 
         :param db_handler: output handler for writing sensor data to a database
         :param sensor_handlers: input data handlers, these should be racepi sensor_handlers
+        :param batch_interval: minimum time between processing passes, data arriving
+            sooner is processed together with later data. Larger values trade
+            feed latency for fewer, larger batches.
+        :param max_latency: maximum time the main loop waits without checking the
+            handlers, bounding the delay of data that did not wake the loop
+        :param display_interval: time between display refreshes
+        :param session_cache: optional SessionCache written when sessions end
+        :param flight_recorder_dir: optional directory for flight recorder logs. Sessions
+            are then recorded to a log and loaded into the database when they end.
         """
+        self.batch_interval = batch_interval
+        self.max_latency = max_latency
+        self.display_interval = display_interval
 
         # pin the main logging thread to the first cpu
         os.system("taskset -p 0x01 %d" % os.getpid())
@@ -88,6 +111,14 @@ class SensorLogger:
             print("No database handler available, recording disabled")
             self.db_handler = None
 
+        # database writes happen in the background to keep the main loop responsive
+        self.db_writer = None
+        if self.db_handler:
+            self.db_writer = DatabaseWriter(self.db_handler, session_cache=session_cache)
+            self.db_writer.start()
+
+        self.flight_recorder_dir = flight_recorder_dir
+        self.flight_recorder = None
         self.session_id = None
         self.racetech_feed_writer = RaceTechnologyDL1FeedWriter(dbc_filename)
         self.state = LoggerState.initialized
@@ -143,14 +174,17 @@ class SensorLogger:
         """
         This function merges multiple data sources in time order
         """
-        flat_data = merge_and_generate_ordered_log(data)
-        for val in flat_data:
-            if val:
-                if val[0] == 'gps':
+        flat_data = iter_ordered_log(data)
+        # consecutive samples from a source are written together, so
+        # runs of imu samples can be encoded as a batch
+        for source, run in groupby((v for v in flat_data if v), key=lambda v: v[0]):
+            if source == 'gps':
+                for val in run:
                     self.racetech_feed_writer.write_gps_sample(val[1], val[2])
-                elif val[0] == 'imu':
-                    self.racetech_feed_writer.write_imu_sample(val[1], val[2])
-                elif val[0] == 'can':
+            elif source == 'imu':
+                self.racetech_feed_writer.write_imu_samples([(val[1], val[2]) for val in run])
+            elif source == 'can':
+                for val in run:
                     try:  # handle crazy or unexpected messages from the can bus
                         self.racetech_feed_writer.write_can_sample(val[1], val[2])
                     except ValueError:
@@ -174,27 +208,18 @@ class SensorLogger:
             self.data.expire_old_samples(time.time())
             return  # recording is not possible
 
-        # TODO, all of these logic should be in a separate thread
-
         # if necessary, transition state
         if self.state == LoggerState.ready:
             if self.activate_conditions(data):
                 # ready -> logging
-                self.session_id = self.db_handler.get_new_session()
+                self.start_session()
                 print("New session: %s" % str(self.session_id))
                 self.state = LoggerState.logging
         elif self.state == LoggerState.logging:
             if self.deactivate_conditions(data):
                 # logging -> ready
                 self.state = LoggerState.ready
-                # populate metadata for recently ended session
-                if self.session_id:
-                    # TODO, this session info population blocks the main thread for too
-                    # long. It needs to be in a separate thread or process to keep remote
-                    # data clients from losing their minds.
-                    #
-                    # self.db_handler.populate_session_info(self.session_id)
-                    self.session_id = None
+                self.end_session()
         else:
             raise RuntimeError("Invalid logger state:" + str(self.state))
 
@@ -204,48 +229,136 @@ class SensorLogger:
             self.data.expire_old_samples(time.time() - DEFAULT_DATA_BUFFER_TIME_SECONDS)
 
         elif self.state == LoggerState.logging:
-            # write all buffered data to the db
-            if self.db_handler:
-                self.db_handler.log_data_from_active_session(self.data, self.session_id)
-            self.data.clear()
+            self.record_buffered_data()
+
+    def start_session(self):
+        """
+        Start recording a new session, to a flight recorder log if enabled
+        """
+        if self.flight_recorder_dir:
+            self.session_id = self.db_writer.db_handler.generate_session_id()
+            path = os.path.join(self.flight_recorder_dir, self.session_id + FLIGHT_LOG_EXTENSION)
+            try:
+                self.flight_recorder = FlightRecorder(path, self.session_id)
+                return
+            except OSError as e:
+                print("Flight recorder unavailable, recording to database: %s" % e)
+                self.flight_recorder_dir = None
+        self.session_id = self.db_writer.create_session()
+
+    def __write_flight_recorder(self, data):
+        """
+        Append data to the flight recorder log. If the recorder fails, the
+        session continues in the database with the same id, and the part
+        already recorded is loaded from the log in the background.
+
+        :param data: DataBuffer of recorded data
+        :return: False if the data was not written and belongs in the database
+        """
+        try:
+            self.flight_recorder.write_buffer(data)
+            return True
+        except OSError as e:
+            print("Flight recorder failed, recording to database: %s" % e)
+            self.flight_recorder_dir = None
+            self.db_writer.continue_session(self.flight_recorder)
+            self.flight_recorder = None
+            return False
+
+    def record_buffered_data(self):
+        """
+        Hand all buffered data to the flight recorder or background writer
+        """
+        data = self.data.detach()
+        if self.flight_recorder and self.__write_flight_recorder(data):
+            return
+        if not self.db_writer.submit(data, self.session_id):
+            print("Database writer overrun, %d samples dropped" % self.db_writer.dropped_samples)
+
+    def end_session(self):
+        """
+        Record the remaining buffered data and queue the session to be
+        finalized, or the flight recorder log to be loaded
+        """
+        data = self.data.detach()
+        if self.flight_recorder and self.__write_flight_recorder(data):
+            # the log is closed and loaded in the background
+            self.db_writer.ingest_log(self.flight_recorder.path, self.flight_recorder)
+            self.flight_recorder = None
+        else:
+            # flush data buffered since the last write to the ending session
+            self.db_writer.submit(data, self.session_id)
+            # populate metadata for recently ended session
+            if self.session_id:
+                self.db_writer.finalize_session(self.session_id)
+        self.session_id = None
+
+    def wait_for_data(self, timeout):
+        """
+        Block until any handler has new data or the timeout expires
+
+        :param timeout: maximum time to wait, in seconds
+        :return: list of ready handler wait handles
+        """
+        handles = [h.get_wait_handle() for h in self.handlers.values()]
+        if not handles:
+            time.sleep(timeout)
+            return []
+        return wait(handles, timeout)
+
+    def refresh_display(self, update_times):
+        if self.display:
+            self.display.refresh_display(time.time() if self.db_handler else 0,
+                                         gps_time=update_times['gps'],
+                                         imu_time=update_times['imu'],
+                                         can_time=update_times['can'],
+                                         tire_time=0,  # update_times['tpms'],
+                                         recording=(self.state == LoggerState.logging))
 
     def start(self):
         """
         Start handlers and begin recording. The function does not
         normally terminate. New sessions are created as needed.
+
+        The main loop sleeps until a handler has new data, then processes
+        everything available. The display is refreshed on its own interval.
         """
         for h in self.handlers.values():
             h.start()
 
         update_times = defaultdict(int)
         self.state = LoggerState.ready
+        last_pass = 0.0
+        next_display = 0.0
 
         try:
             while True:
+                self.wait_for_data(min(self.max_latency, max(next_display - time.monotonic(), 0.0)))
+
+                # coalesce data arriving faster than the batch interval
+                delay = last_pass + self.batch_interval - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                last_pass = time.monotonic()
+
                 # read new data
                 new_data = self.get_new_data()
-                # process data
+                # process data, this also sends queued data to feed clients
                 self.process_new_data(new_data)
 
-                # update display
                 for h in self.handlers:
                     if new_data[h]:
                         update_times[h] = new_data[h][-1][0]
 
-                if self.display:
-                    self.display.refresh_display(time.time() if self.db_handler else 0,
-                                                 gps_time=update_times['gps'],
-                                                 imu_time=update_times['imu'],
-                                                 can_time=update_times['can'],
-                                                 tire_time=0,  # update_times['tpms'],
-                                                 recording=(self.state == LoggerState.logging))
-
-                # there is no reason to ever poll faster than this
-                # 20hz is generally faster than you need refresh remote
-                # receivers
-                time.sleep(0.03)
+                if last_pass >= next_display:
+                    self.refresh_display(update_times)
+                    next_display = last_pass + self.display_interval
 
         finally:
             self.racetech_feed_writer.close()
             for h in self.handlers.values():
                 h.stop()
+            if self.db_writer:
+                if self.session_id:
+                    self.end_session()
+                self.db_writer.stop()
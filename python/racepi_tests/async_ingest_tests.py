@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# Copyright 2026 Donour Sizemore
+#
+# This file is part of RacePi
+#
+# RacePi is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 2
+#
+# RacePi is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RacePi.  If not, see <http://www.gnu.org/licenses/>.
+
+import asyncio
+import json
+import socket
+from multiprocessing.connection import wait
+from threading import Thread
+from unittest import TestCase, main
+
+from racepi.sensor.handler.async_ingest import AsyncIngestLoop, parse_gpsd_report, \
+    GPS_MISSING_VALUE
+
+TEST_COUNT = 10
+WAIT_TIMEOUT = 2.0
+
+TPV_REPORT = {'class': 'TPV', 'mode': 3, 'time': '2026-01-01T00:00:00.000Z',
+              'lat': 30.0, 'lon': -97.0, 'speed': 12.5, 'track': 90.0}
+
+
+def read_all(h, count):
+    data = []
+    while len(data) < count and wait([h.get_wait_handle()], WAIT_TIMEOUT):
+        data.extend(h.get_all_data())
+    return data
+
+
+class AsyncIngestTests(TestCase):
+
+    def setUp(self):
+        self.ingest = AsyncIngestLoop()
+
+    def test_source(self):
+        async def read(h):
+            for i in range(TEST_COUNT):
+                h.send_sample(i, 'data')
+
+        h = self.ingest.add_source(read)
+        self.assertEqual([], wait([h.get_wait_handle()], 0))
+        h.start()
+        try:
+            self.assertEqual([(i, 'data') for i in range(TEST_COUNT)], read_all(h, TEST_COUNT))
+            self.assertEqual([], h.get_all_data())
+        finally:
+            h.stop()
+
+    def test_concurrent_reads(self):
+        count = 100 * TEST_COUNT
+
+        async def read(h):
+            for i in range(count):
+                h.send_sample(i, 'data')
+                if i % 7 == 0:
+                    await asyncio.sleep(0)
+
+        h = self.ingest.add_source(read)
+        h.start()
+        try:
+            # every sample queued while the logger reads must wake it again
+            self.assertEqual(count, len(read_all(h, count)))
+            self.assertEqual([], wait([h.get_wait_handle()], 0))
+        finally:
+            h.stop()
+
+    def test_overrun(self):
+        h = self.ingest.add_source(None, max_queued_samples=2)
+        for i in range(3):
+            h.send_sample(i, 'data')
+        self.assertEqual([(1, 'data'), (2, 'data')], h.get_all_data())
+        self.assertEqual(1, h.get_dropped_sample_count())
+        h.stop()
+
+    def test_gpsd(self):
+        lines = [json.dumps({'class': 'VERSION'}), json.dumps(TPV_REPORT)] * TEST_COUNT
+        server = socket.create_server(("127.0.0.1", 0))
+
+        def serve():
+            conn, _ = server.accept()
+            with conn:
+                conn.recv(1024)  # watch command
+                conn.sendall("".join(l + "\n" for l in lines).encode())
+                conn.recv(1024)  # wait for the reader to disconnect
+
+        server_thread = Thread(target=serve)
+        server_thread.start()
+        h = self.ingest.add_gps(port=server.getsockname()[1])
+        h.start()
+        try:
+            data = read_all(h, TEST_COUNT)
+            self.assertEqual(TEST_COUNT, len(data))
+            for _, sample in data:
+                self.assertEqual(12.5, sample['speed'])
+                self.assertEqual(GPS_MISSING_VALUE, sample['climb'])
+        finally:
+            h.stop()
+            server_thread.join(WAIT_TIMEOUT)
+            server.close()
+
+    def test_parse_gpsd_report(self):
+        self.assertIsNone(parse_gpsd_report(b"not json"))
+        self.assertIsNone(parse_gpsd_report(json.dumps({'class': 'SKY'})))
+        tpv = parse_gpsd_report(json.dumps(TPV_REPORT))
+        self.assertEqual(30.0, tpv['lat'])
+        self.assertEqual(GPS_MISSING_VALUE, tpv['epx'])
+
+
+if __name__ == "__main__":
+    main()
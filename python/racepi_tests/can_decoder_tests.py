@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# Copyright 2026 Donour Sizemore
+#
+# This file is part of RacePi
+#
+# RacePi is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 2
+#
+# RacePi is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RacePi.  If not, see <http://www.gnu.org/licenses/>.
+
+import random
+from unittest import TestCase, main
+
+import cantools
+
+from racepi.racetech.can_decoder import compile_decoders
+
+DBC_FILENAME = "dbc/evora.dbc"
+TEST_COUNT = 200
+
+BIG_ENDIAN_DBC = """VERSION ""
+BO_ 500 Motorola: 8 Vector__XXX
+ SG_ Unsigned12 : 7|12@0+ (1,0) [0|4095] "" Vector__XXX
+ SG_ Signed10 : 27|10@0- (0.5,-3) [0|0] "" Vector__XXX
+ SG_ Byte : 63|8@0+ (1,0) [0|255] "" Vector__XXX
+"""
+
+
+class CompiledDecoderTests(TestCase):
+
+    def assert_matches_cantools(self, candb):
+        decoders = compile_decoders(candb, [s.name for m in candb.messages for s in m.signals])
+        rng = random.Random(1)
+        for m in [m for m in candb.messages if m.signals]:
+            d = decoders[m.frame_id]
+            for _ in range(TEST_COUNT):
+                payload = bytes(rng.getrandbits(8) for _ in range(m.length))
+                expected = candb.decode_message(m.name, payload, decode_choices=False)
+                actual = d.decode(payload)
+                self.assertEqual(set(expected), set(actual))
+                for k in expected:
+                    self.assertAlmostEqual(expected[k], actual[k], msg=k)
+
+    def test_matches_cantools(self):
+        self.assert_matches_cantools(cantools.database.load_file(DBC_FILENAME))
+
+    def test_big_endian_matches_cantools(self):
+        self.assert_matches_cantools(cantools.database.load_string(BIG_ENDIAN_DBC))
+
+    def test_only_wanted_signals(self):
+        decoders = compile_decoders(cantools.database.load_file(DBC_FILENAME), ["EngineSpeed"])
+        self.assertEqual([0x114], list(decoders))
+        self.assertEqual(["EngineSpeed"], [s.name for s in decoders[0x114].signals])
+
+    def test_short_payload(self):
+        decoders = compile_decoders(cantools.database.load_file(DBC_FILENAME), ["EngineSpeed"])
+        with self.assertRaises(ValueError):
+            decoders[0x114].decode(b'\x00\x01')
+
+
+if __name__ == "__main__":
+    main()
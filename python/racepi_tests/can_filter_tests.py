@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# Copyright 2026 Donour Sizemore
+#
+# This file is part of RacePi
+#
+# RacePi is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 2
+#
+# RacePi is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RacePi.  If not, see <http://www.gnu.org/licenses/>.
+
+from unittest import TestCase, main
+
+import cantools
+
+from racepi.can.data import CAN_EFF_FLAG, CAN_RTR_FLAG, CAN_SFF_MASK
+from racepi.can.filters import build_can_filters, filter_accepts, ACCEPT_ALL_FILTERS
+
+DBC_FILENAME = "dbc/evora.dbc"
+
+
+def accepted_ids(filters, ids, flags=0):
+    return [i for i in ids if filter_accepts(filters, i | flags)]
+
+
+class CanFilterTests(TestCase):
+
+    def test_accept_all(self):
+        self.assertEqual(ACCEPT_ALL_FILTERS, build_can_filters(None))
+        self.assertEqual(ACCEPT_ALL_FILTERS, build_can_filters([]))
+        self.assertTrue(filter_accepts(build_can_filters([]), 0x12345 | CAN_EFF_FLAG))
+
+    def test_single_ids(self):
+        filters = build_can_filters([0x085, 0x114, 0x303])
+        self.assertEqual(3, len(filters))
+        self.assertEqual([0x085, 0x114, 0x303], accepted_ids(filters, range(CAN_SFF_MASK + 1)))
+
+    def test_adjacent_ids_merged(self):
+        filters = build_can_filters([0x10, 0x11, 0x12, 0x13])
+        self.assertEqual(1, len(filters))
+        self.assertEqual(list(range(0x10, 0x14)), accepted_ids(filters, range(CAN_SFF_MASK + 1)))
+
+    def test_range(self):
+        filters = build_can_filters([(0x101, 0x1ff), (0x150, 0x210)])
+        self.assertEqual(list(range(0x101, 0x211)), accepted_ids(filters, range(CAN_SFF_MASK + 1)))
+        self.assertLessEqual(len(filters), 10)
+        self.assertRaises(ValueError, build_can_filters, [(0x20, 0x10)])
+
+    def test_full_range(self):
+        filters = build_can_filters([(0, CAN_SFF_MASK)])
+        self.assertEqual(1, len(filters))
+        self.assertFalse(filter_accepts(filters, 0x85 | CAN_EFF_FLAG))
+
+    def test_extended_ids(self):
+        filters = build_can_filters([0x18daf110, 0x85 | CAN_EFF_FLAG])
+        self.assertTrue(filter_accepts(filters, 0x18daf110 | CAN_EFF_FLAG))
+        self.assertTrue(filter_accepts(filters, 0x85 | CAN_EFF_FLAG))
+        # frame format must match
+        self.assertFalse(filter_accepts(filters, 0x85))
+        self.assertFalse(filter_accepts(filters, 0x110))
+        self.assertFalse(filter_accepts(filters, 0x18daf111 | CAN_EFF_FLAG))
+
+    def test_extended_range(self):
+        filters = build_can_filters([(0x18daf100, 0x18daf1ff)])
+        self.assertEqual(1, len(filters))
+        self.assertTrue(filter_accepts(filters, 0x18daf1aa | CAN_EFF_FLAG))
+        self.assertFalse(filter_accepts(filters, 0x18daf200 | CAN_EFF_FLAG))
+
+    def test_rtr_rejected(self):
+        filters = build_can_filters([0x85])
+        self.assertFalse(filter_accepts(filters, 0x85 | CAN_RTR_FLAG))
+
+    def test_dbc_messages(self):
+        candb = cantools.database.load_file(DBC_FILENAME)
+        filters = build_can_filters(candb.messages)
+        for m in candb.messages:
+            frame_flags = CAN_EFF_FLAG if m.is_extended_frame else 0
+            self.assertTrue(filter_accepts(filters, m.frame_id | frame_flags), m.name)
+        # 11 bit frames of messages that the DBC marks as extended
+        steering = candb.get_message_by_name('SteeringAngle')
+        self.assertTrue(steering.is_extended_frame)
+        self.assertTrue(filter_accepts(filters, 0x085))
+        self.assertFalse(filter_accepts(filters, 0x086))
+
+    def test_too_many_filters(self):
+        self.assertRaises(ValueError, build_can_filters, list(range(0, 2048, 2)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# Copyright 2026 Donour Sizemore
+#
+# This file is part of RacePi
+#
+# RacePi is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 2
+#
+# RacePi is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RacePi.  If not, see <http://www.gnu.org/licenses/>.
+
+import random
+from unittest import TestCase, main
+
+import numpy as np
+
+from racepi.can.data import CanFrameValueExtractor, CanFrame, payloads_to_array
+from racepi.can import focus_rs_steering_angle_converter, focus_rs_tps_converter, \
+    focus_rs_wheelspeed4_converter
+
+TEST_COUNT = 1000
+
+
+class ConvertFramesTests(TestCase):
+
+    def setUp(self):
+        rng = random.Random(1)
+        self.payloads = [bytes(rng.getrandbits(8) for _ in range(rng.randint(1, 8)))
+                         for _ in range(TEST_COUNT)]
+        self.frames = payloads_to_array(self.payloads)
+
+    def assert_matches_scalar(self, converter):
+        expected = [converter.convert_frame(CanFrame(0, p)) for p in self.payloads]
+        self.assertTrue(np.allclose(expected, converter.convert_frames(self.frames)))
+
+    def test_payloads_to_array(self):
+        a = payloads_to_array([b'\x01', "0203"])
+        self.assertEqual((2, 8), a.shape)
+        self.assertEqual([1, 0, 0, 0, 0, 0, 0, 0], a[0].tolist())
+        self.assertEqual([2, 3, 0, 0, 0, 0, 0, 0], a[1].tolist())
+        with self.assertRaises(ValueError):
+            payloads_to_array([bytes(9)])
+
+    def test_matches_scalar(self):
+        for converter in [focus_rs_steering_angle_converter, focus_rs_tps_converter,
+                          focus_rs_wheelspeed4_converter, CanFrameValueExtractor(4, 12, a=0.1, c=-1000.0),
+                          CanFrameValueExtractor(0, 1), CanFrameValueExtractor(63, 1),
+                          CanFrameValueExtractor(8, 32, a=2, b=-5)]:
+            self.assert_matches_scalar(converter)
+
+    def test_single_bits(self):
+        for i in range(64):
+            c = CanFrameValueExtractor(i, 1)
+            self.assertEqual(64, c.convert_frames(payloads_to_array([b'\xff' * 8] * 64)).sum())
+
+    def test_custom_transform(self):
+        self.assert_matches_scalar(CanFrameValueExtractor(0, 16, custom_transform=lambda x: x if x < 100 else 0))
+
+    def test_packed_column(self):
+        c = CanFrameValueExtractor(4, 12)
+        packed = self.frames.view('>u8').ravel().astype(np.uint64)
+        self.assertTrue(np.array_equal(c.convert_frames(self.frames), c.convert_frames(packed)))
+
+    def test_short_array(self):
+        c = CanFrameValueExtractor(0, 8)
+        self.assertEqual([1.0, 2.0], c.convert_frames(np.array([[1, 5], [2, 6]], dtype=np.uint8)).tolist())
+
+    def test_invalid_array(self):
+        c = CanFrameValueExtractor(0, 8)
+        with self.assertRaises(ValueError):
+            c.convert_frames(np.zeros((2, 9), dtype=np.uint8))
+        with self.assertRaises(ValueError):
+            c.convert_frames(np.zeros(2, dtype=np.float64))
+
+
+if __name__ == "__main__":
+    main()
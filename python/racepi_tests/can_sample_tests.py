@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# Copyright 2026 Donour Sizemore
+#
+# This file is part of RacePi
+#
+# RacePi is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 2
+#
+# RacePi is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RacePi.  If not, see <http://www.gnu.org/licenses/>.
+
+from unittest import TestCase, main
+
+from racepi.can.data import CanSample, CanFrame, CanFrameValueExtractor, CAN_RTR_FLAG, CAN_EFF_FLAG
+
+
+class CanSampleTests(TestCase):
+
+    def test_from_hex(self):
+        s = CanSample.from_hex("085deadbeef")
+        self.assertEqual(0x85, s.arbitration_id)
+        self.assertEqual(b'\xde\xad\xbe\xef', s.payload)
+        self.assertEqual(4, s.dlc)
+        self.assertEqual(0, s.flags)
+        self.assertEqual("085deadbeef", s.to_hex())
+
+    def test_from_hex_extended(self):
+        s = CanSample.from_hex("18DAF1100211223344")
+        self.assertEqual((0x18daf110, b'\x02\x11\x22\x33\x44', CAN_EFF_FLAG),
+                         (s.arbitration_id, s.payload, s.flags))
+        self.assertEqual(CanSample.create(0x85, b'\x01', CAN_EFF_FLAG), CanSample.from_hex("0000008501", True))
+        self.assertEqual(CanSample.create(0x85, b'\x01\x02'), CanSample.from_hex("0850102", False))
+
+    def test_from_hex_invalid(self):
+        for v in ["", "085", "xyz00", "085" + "00" * 9, "0850", "18daf110", "ffffffff00"]:
+            with self.assertRaises(ValueError):
+                CanSample.from_hex(v)
+
+    def test_to_hex_extended(self):
+        s = CanSample.create(0x18daf110, b'\x01', CAN_EFF_FLAG)
+        self.assertRaises(ValueError, s.to_hex)
+
+    def test_coerce(self):
+        s = CanSample.create(0x85, b'\x01')
+        self.assertIs(s, CanSample.coerce(s))
+        self.assertEqual(s, CanSample.coerce("08501"))
+        with self.assertRaises(ValueError):
+            CanSample.coerce(None)
+
+    def test_create_from_hex_payload(self):
+        self.assertEqual(CanSample.create(0x85, b'\x01\x02'), CanSample.create(0x85, "0102"))
+
+    def test_rtr(self):
+        self.assertTrue(CanSample.create(0x85, b'', CAN_RTR_FLAG).is_rtr())
+        self.assertFalse(CanSample.create(0x85, b'').is_rtr())
+
+    def test_frame_from_binary(self):
+        c = CanFrameValueExtractor(4, 12)
+        self.assertEqual(c.convert_frame(CanFrame('400', '02C00000BAC000')),
+                         c.convert_frame(CanFrame(0x400, bytes.fromhex('02C00000BAC000'))))
+
+
+if __name__ == "__main__":
+    main()
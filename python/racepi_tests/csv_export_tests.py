@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# Copyright 2026 Donour Sizemore
+#
+# This file is part of RacePi
+#
+# RacePi is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 2
+#
+# RacePi is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RacePi.  If not, see <http://www.gnu.org/licenses/>.
+
+import gzip
+from unittest import main
+
+from racepi.database.csv_export import EXPORT_COLUMNS, iter_csv_lines, iter_chunks, iter_gzip
+
+from db_fixtures import DatabaseTestCase, session_buffer
+
+TEST_COUNT = 10
+
+
+class CsvExportTests(DatabaseTestCase):
+
+    def setUp(self):
+        DatabaseTestCase.setUp(self)
+        self.sessions = []
+        for start in (0, 100):
+            session_id = self.h.get_new_session()
+            self.h.log_data_from_active_session(session_buffer(TEST_COUNT, start), session_id)
+            self.sessions.append(session_id)
+        self.connection = self.h.db_session.get_bind().connect()
+
+    def tearDown(self):
+        self.connection.close()
+        DatabaseTestCase.tearDown(self)
+
+    def export(self, **kwargs):
+        lines = list(iter_csv_lines(self.connection, fetch_size=3, **kwargs))
+        self.assertEqual("#" + ','.join(EXPORT_COLUMNS), lines[0])
+        return [dict(zip(EXPORT_COLUMNS, line.split(','))) for line in lines[1:]]
+
+    def test_session(self):
+        rows = self.export(session_id=self.sessions[0])
+        self.assertEqual(3 * TEST_COUNT, len(rows))
+        self.assertEqual({self.sessions[0]}, {r['session_id'] for r in rows})
+        times = [float(r['timestamp']) for r in rows]
+        self.assertEqual(sorted(times), times)
+        self.assertEqual(['GPS', 'CAN', 'IMU'], [r['type'] for r in rows[:3]])
+
+        gps, can, imu = rows[:3]
+        self.assertEqual(('0.0', '35.0', '', ''), (gps['speed'], gps['lat'], gps['epx'], gps['x_accel']))
+        self.assertEqual(('133', 'deadbeef', ''), (can['arbitration_id'], can['msg'], can['speed']))
+        self.assertEqual(('4.0', '9.0', ''), (imu['x_accel'], imu['z_gyro'], imu['msg']))
+
+    def test_all_sessions(self):
+        rows = self.export()
+        self.assertEqual(6 * TEST_COUNT, len(rows))
+        self.assertEqual(self.sessions[1], rows[-1]['session_id'])
+
+    def test_time_window(self):
+        rows = self.export(start=2.0, end=4.0)
+        self.assertEqual([2.0, 2.25, 2.5, 3.0, 3.25, 3.5], [float(r['timestamp']) for r in rows])
+
+    def test_channels(self):
+        rows = self.export(session_id=self.sessions[1], channels=['imu', 'gps'])
+        self.assertEqual({'GPS', 'IMU'}, {r['type'] for r in rows})
+        self.assertEqual(2 * TEST_COUNT, len(rows))
+        self.assertRaises(ValueError, iter_csv_lines, self.connection, channels=['tpms'])
+
+    def test_unknown_session(self):
+        self.assertEqual([], self.export(session_id="missing"))
+
+    def test_chunks(self):
+        lines = ["a" * 10] * 25
+        chunks = list(iter_chunks(lines, chunk_size=100))
+        self.assertEqual(3, len(chunks))
+        self.assertEqual('\n'.join(lines) + '\n', ''.join(chunks))
+        self.assertEqual([], list(iter_chunks([])))
+
+    def test_gzip(self):
+        chunks = list(iter_chunks(iter_csv_lines(self.connection), chunk_size=256))
+        self.assertGreater(len(chunks), 1)
+        compressed = b''.join(iter_gzip(chunks))
+        self.assertEqual(''.join(chunks), gzip.decompress(compressed).decode())
+
+
+if __name__ == "__main__":
+    main()
@@ -16,8 +16,10 @@
 from collections import defaultdict
 from unittest import TestCase, main
 
-from racepi.sensor.data_utilities import TimeToDistanceConverter, \
-    merge_and_generate_ordered_log, oversteer_coefficient
+import numpy as np
+
+from racepi.sensor.data_utilities import TimeToDistanceConverter, INTEGRATE_TRAPEZOID, \
+    merge_and_generate_ordered_log, iter_ordered_log, oversteer_coefficient
 
 
 class TimeToDistanceConverterTest(TestCase):
@@ -54,6 +56,72 @@ class TimeToDistanceConverterTest(TestCase):
         for i in range(len(trace)):
             self.assertAlmostEqual(trace[i], result[i])
 
+    def test_trapezoid(self):
+        c = TimeToDistanceConverter([(0.0, 0.0), (1.0, 2.0), (2.0, 2.0)], INTEGRATE_TRAPEZOID)
+        self.assertEqual([1.0, 3.0], list(c.distance_samples[:, 1]))
+        self.assertRaises(ValueError, TimeToDistanceConverter, [(0.0, 0.0), (1.0, 2.0)], "simpson")
+
+
+def reference_distance_trace(speed_data, time_trace):
+    """
+    Scalar implementation of the rectangle rule distance trace
+    """
+    distance_samples = []
+    t_last = speed_data[0][0]
+    total_distance = 0.0
+    for t, v in speed_data[1:]:
+        t_delta = t - t_last
+        t_last = t
+        total_distance += t_delta * v
+        distance_samples.append((t, total_distance, t_delta, t_delta * v))
+
+    result = []
+    dist_iter = iter(distance_samples)
+    last_dist = next(dist_iter)
+    next_dist = next(dist_iter)
+    for sample in time_trace:
+        try:
+            while next_dist[0] < sample:
+                last_dist = next_dist
+                next_dist = next(dist_iter)
+        except StopIteration:
+            pass
+        if next_dist[2] > 1e-4:
+            result.append((sample - last_dist[0]) / next_dist[2] * next_dist[3] + last_dist[1])
+        else:
+            result.append(0.0)
+    return distance_samples, result
+
+
+class TimeToDistanceEquivalenceTest(TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(1)
+        times = np.cumsum(rng.uniform(0.05, 0.15, 500))
+        times[100] = times[99]  # repeated sample
+        self.speed_data = list(zip(times, rng.uniform(0.0, 50.0, 500)))
+        self.rng = rng
+
+    def assertEquivalent(self, time_trace):
+        expected_samples, expected = reference_distance_trace(self.speed_data, time_trace)
+        c = TimeToDistanceConverter(self.speed_data)
+        np.testing.assert_allclose(np.array(expected_samples), c.distance_samples)
+        np.testing.assert_allclose(expected, c.generate_distance_trace(time_trace), rtol=1e-9, atol=1e-9)
+
+    def test_sorted_trace(self):
+        start, end = self.speed_data[0][0], self.speed_data[-1][0]
+        self.assertEquivalent(np.sort(self.rng.uniform(start - 1.0, end + 1.0, 2000)))
+
+    def test_sample_times(self):
+        self.assertEquivalent([t for t, _ in self.speed_data])
+
+    def test_unsorted_trace(self):
+        start, end = self.speed_data[0][0], self.speed_data[-1][0]
+        self.assertEquivalent(self.rng.uniform(start, end, 200))
+
+    def test_empty_trace(self):
+        self.assertEquivalent([])
+
 
 class OtherTests(TestCase):
 
@@ -87,6 +155,24 @@ class OtherTests(TestCase):
         self.assertEqual(res[4][1], 20)
         self.assertEqual(res[5][1], 30)
 
+    def test_iter_ordered_log_sources(self):
+        data = {"a": [(1, "a1"), (3, "a3")], "b": [(1, "b1"), (2, "b2")]}
+        res = list(iter_ordered_log(data))
+        self.assertEqual([("a", 1, "a1"), ("b", 1, "b1"), ("b", 2, "b2"), ("a", 3, "a3")], res)
+
+    def test_iter_ordered_log_lazy(self):
+        def source():
+            yield (1, "x")
+            raise AssertionError("read too far")
+
+        res = iter_ordered_log({"k": source()})
+        self.assertEqual(("k", 1, "x"), next(res))
+
+    def test_iter_ordered_log_window(self):
+        times = [1.0, 1.2, 1.1, 2.0, 1.9, 3.0]
+        res = iter_ordered_log({"k": iter([(t, None) for t in times]), "k2": [(1.5, None)]}, window=0.5)
+        self.assertEqual(sorted(times + [1.5]), [v[1] for v in res])
+
     def test_oversteer_coefficient_zero_velocity(self):
         self.assertAlmostEqual(-1.0, oversteer_coefficient(1, 1, 0.0, 1), 6)
         self.assertAlmostEqual(-2.0, oversteer_coefficient(2, 2, 0.0, 2), 6)
@@ -16,7 +16,7 @@
 # along with RacePi.  If not, see <http://www.gnu.org/licenses/>.
 
 from unittest import TestCase
-from racepi.sensor.recorder.data_buffer import DataBuffer
+from racepi.sensor.recorder.data_buffer import DataBuffer, COMPACT_THRESHOLD
 
 TEST_COUNT = 10
 
@@ -68,3 +68,16 @@ class DataBufferTests(TestCase):
         self.assertEqual(0, len(self.twenty_samples.get_sensor_data('one')))
         self.assertEqual(0, len(self.twenty_samples.get_sensor_data('two')))
         self.assertRaises(ValueError, self.twenty_samples.get_sensor_data, "nosource")
+
+    def test_expire_old_samples_compact(self):
+        count = COMPACT_THRESHOLD * 3
+        self.b.add_sample('one', [(i, 'data') for i in range(count)])
+        self.b.expire_old_samples(count - 10)
+        self.assertEqual(10, len(self.b.get_sensor_data('one')))
+        self.assertEqual(count - 10, self.b.get_sensor_data('one')[0][0])
+
+    def test_add_samples_after_expire(self):
+        self.twenty_samples.expire_old_samples(TEST_COUNT - 1)
+        self.twenty_samples.add_sample('one', [(TEST_COUNT, 'data')])
+        data = self.twenty_samples.get_sensor_data('one')
+        self.assertEqual([(TEST_COUNT - 1, 'data'), (TEST_COUNT, 'data')], data)
@@ -0,0 +1,93 @@
+# Copyright 2026 Donour Sizemore
+#
+# This file is part of RacePi
+#
+# RacePi is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 2
+#
+# RacePi is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RacePi.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Database fixture and sensor samples shared by the database tests
+"""
+
+import os
+import tempfile
+from unittest import TestCase
+
+from racepi.database.db_handler import DbHandler
+from racepi.database.objects import Base
+from racepi.sensor.recorder.data_buffer import DataBuffer
+
+TEST_CAN_FRAME = "085deadbeef"
+
+
+def gps_report(speed=0.0, **fields):
+    """
+    :param speed: reported speed
+    :param fields: additional or replaced report fields
+    :return: gpsd report dictionary
+    """
+    report = {'time': 'now', 'speed': speed, 'track': 1.0, 'lat': 35.0, 'lon': -80.0, 'alt': 10.0}
+    report.update(fields)
+    return report
+
+
+def imu_report():
+    return {'fusionPose': [1, 2, 3], 'accel': [4, 5, 6], 'gyro': [7, 8, 9]}
+
+
+def gps_samples(count, start=0, speeds=None):
+    """
+    :param speeds: optional speed of each sample, else 0
+    :return: list of gps samples, one second apart
+    """
+    return [(start + i, gps_report(speeds[i] if speeds else 0.0)) for i in range(count)]
+
+
+def imu_samples(count, start=0):
+    return [(start + i, imu_report()) for i in range(count)]
+
+
+def can_samples(count, start=0, frame=TEST_CAN_FRAME):
+    return [(start + i, frame) for i in range(count)]
+
+
+def session_buffer(count, start=0):
+    """
+    :return: DataBuffer with gps, can and imu samples interleaved in time
+    """
+    b = DataBuffer()
+    b.add_sample('gps', gps_samples(count, start))
+    b.add_sample('can', can_samples(count, start + 0.25))
+    b.add_sample('imu', imu_samples(count, start + 0.5))
+    return b
+
+
+class DatabaseTestCase(TestCase):
+    """
+    Test case with an empty database in a temporary directory
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "test.db")
+        self.h = DbHandler(self.db_path)
+        self.h.connect()
+        Base.metadata.create_all(self.h.db_session.get_bind())
+
+    def tearDown(self):
+        self.h.db_session.close()
+        self.tmpdir.cleanup()
+
+    def count(self, table, session_id):
+        """
+        :return: number of rows of a session in a table
+        """
+        return self.h.db_session.query(table).filter(table.session_id == session_id).count()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# Copyright 2026 Donour Sizemore
+#
+# This file is part of RacePi
+#
+# RacePi is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 2
+#
+# RacePi is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RacePi.  If not, see <http://www.gnu.org/licenses/>.
+
+from unittest import main
+
+from racepi.can.data import CanSample, CAN_EFF_FLAG, CAN_RTR_FLAG
+from racepi.database.objects import GPSData, IMUData, CANData
+from racepi.sensor.recorder.data_buffer import DataBuffer
+
+from db_fixtures import DatabaseTestCase, gps_report, gps_samples, imu_samples, can_samples
+
+TEST_COUNT = 100
+
+
+class DbHandlerBulkInsertTests(DatabaseTestCase):
+
+    def setUp(self):
+        DatabaseTestCase.setUp(self)
+        self.session_id = self.h.get_new_session()
+
+    def count(self, table):
+        return DatabaseTestCase.count(self, table, self.session_id)
+
+    def test_log_data_empty(self):
+        self.h.log_data_from_active_session(DataBuffer(), self.session_id)
+        self.assertEqual(0, self.count(GPSData))
+
+    def test_log_data_all_sources(self):
+        b = DataBuffer()
+        b.add_sample('gps', gps_samples(TEST_COUNT, speeds=['12.3'] * TEST_COUNT))
+        b.add_sample('imu', imu_samples(TEST_COUNT))
+        b.add_sample('can', can_samples(TEST_COUNT))
+        self.h.log_data_from_active_session(b, self.session_id)
+
+        self.assertEqual(TEST_COUNT, self.count(GPSData))
+        self.assertEqual(TEST_COUNT, self.count(IMUData))
+        self.assertEqual(TEST_COUNT, self.count(CANData))
+        can = self.h.db_session.query(CANData).first()
+        self.assertEqual(0x85, can.arbitration_id)
+        self.assertEqual(b'\xde\xad\xbe\xef', can.msg)
+        imu = self.h.db_session.query(IMUData).first()
+        self.assertEqual(5, imu.y_accel)
+
+    def test_log_gps_missing_errors(self):
+        b = DataBuffer()
+        b.add_sample('gps', [(0, gps_report(1.0, epx='n/a', epy=None, epv='2.5'))])
+        self.h.log_data_from_active_session(b, self.session_id)
+        row = self.h.db_session.query(GPSData).one()
+        self.assertEqual((None, None, 2.5), (row.epx, row.epy, row.epv))
+
+    def test_log_can_samples(self):
+        b = DataBuffer()
+        b.add_sample('can', [(0, CanSample.create(0x18daf110, b'\x01\x02', CAN_EFF_FLAG)),
+                             (1, CanSample.create(0x85, b'', CAN_RTR_FLAG))])
+        self.h.log_data_from_active_session(b, self.session_id)
+        rows = self.h.db_session.query(CANData).order_by(CANData.timestamp).all()
+        self.assertEqual([0x18daf110, 0x85], [r.arbitration_id for r in rows])
+        self.assertEqual([b'\x01\x02', b''], [r.msg for r in rows])
+        self.assertEqual([0, 1], [r.rtr for r in rows])
+
+    def test_log_data_skips_invalid(self):
+        b = DataBuffer()
+        b.add_sample('gps', [(0, {'speed': 'n/a'}), (1, {})])
+        b.add_sample('imu', [(0, {'accel': [1, 2, 3]})])
+        b.add_sample('can', [(0, "01"), (1, "xyz0000")])
+        self.h.log_data_from_active_session(b, self.session_id)
+        self.assertEqual(0, self.count(GPSData))
+        self.assertEqual(0, self.count(IMUData))
+        self.assertEqual(0, self.count(CANData))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# Copyright 2026 Donour Sizemore
+#
+# This file is part of RacePi
+#
+# RacePi is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 2
+#
+# RacePi is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RacePi.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import sqlite3
+import time
+from threading import Event, Timer
+from unittest import main
+
+from racepi.database.db_handler import DbHandler
+from racepi.database.objects import Session, SessionInfo, CANData
+from racepi.sensor.recorder.data_buffer import DataBuffer
+from racepi.sensor.recorder.db_writer import DatabaseWriter
+
+from db_fixtures import DatabaseTestCase, gps_samples, can_samples
+
+TEST_COUNT = 10
+
+
+def can_buffer(count, start=0):
+    b = DataBuffer()
+    b.add_sample('can', can_samples(count, start))
+    return b
+
+
+def gps_buffer(count, start=0):
+    b = DataBuffer()
+    b.add_sample('gps', gps_samples(count, start, speeds=[float(start + i) for i in range(count)]))
+    return b
+
+
+class DatabaseWriterTests(DatabaseTestCase):
+
+    def test_write_session(self):
+        w = DatabaseWriter(self.h)
+        w.start()
+        session_id = w.create_session()
+        for i in range(3):
+            self.assertTrue(w.submit(can_buffer(TEST_COUNT, i * TEST_COUNT), session_id))
+        w.stop()
+
+        self.assertEqual(1, self.h.db_session.query(Session).filter(Session.id == session_id).count())
+        self.assertEqual(3 * TEST_COUNT, self.count(CANData, session_id))
+        self.assertEqual(3 * TEST_COUNT, w.written_samples)
+        self.assertEqual(0, w.failed_jobs)
+
+    def test_drop_when_full(self):
+        w = DatabaseWriter(self.h, max_pending_batches=2)
+        session_id = w.create_session()
+        self.assertTrue(w.submit(can_buffer(TEST_COUNT), session_id))
+        self.assertFalse(w.submit(can_buffer(TEST_COUNT), session_id))
+        self.assertEqual(1, w.dropped_batches)
+        self.assertEqual(TEST_COUNT, w.dropped_samples)
+
+        # the worker drains everything queued before shutdown
+        w.start()
+        w.stop()
+        self.assertEqual(0, w.get_pending_count())
+        self.assertEqual(TEST_COUNT, w.written_samples)
+
+    def test_finalize_session(self):
+        w = DatabaseWriter(self.h)
+        w.start()
+        session_id = w.create_session()
+        w.submit(gps_buffer(TEST_COUNT), session_id)
+        w.submit(gps_buffer(TEST_COUNT, TEST_COUNT), session_id)
+        w.submit(can_buffer(TEST_COUNT), session_id)
+        w.finalize_session(session_id)
+        w.stop()
+
+        si = self.h.db_session.query(SessionInfo).filter(SessionInfo.session_id == session_id).one()
+        self.assertEqual(3 * TEST_COUNT, si.num_data_samples)
+        self.assertEqual(0, si.start_time_utc)
+        self.assertEqual(2 * TEST_COUNT - 1, si.duration)
+        self.assertEqual(2 * TEST_COUNT - 1, si.max_speed)
+
+        # the incremental summary matches one computed from the stored data
+        self.h.db_session.delete(si)
+        self.h.db_session.commit()
+        self.h.populate_session_info(session_id)
+        si = self.h.db_session.query(SessionInfo).filter(SessionInfo.session_id == session_id).one()
+        self.assertEqual(3 * TEST_COUNT, si.num_data_samples)
+        self.assertEqual(2 * TEST_COUNT - 1, si.duration)
+        self.assertEqual(2 * TEST_COUNT - 1, si.max_speed)
+
+    def test_finalize_without_gps(self):
+        w = DatabaseWriter(self.h)
+        w.start()
+        session_id = w.create_session()
+        w.submit(can_buffer(TEST_COUNT), session_id)
+        w.finalize_session(session_id)
+        w.stop()
+        self.assertEqual(0, w.failed_jobs)
+        self.assertEqual(0, self.h.db_session.query(SessionInfo).count())
+
+    def test_finalize_in_background(self):
+        class BlockingCache:
+            def __init__(self):
+                self.started = Event()
+                self.release = Event()
+                self.sessions = []
+
+            def write_session(self, db_session, session_id):
+                self.started.set()
+                self.release.wait(5)
+                self.sessions.append(session_id)
+
+        cache = BlockingCache()
+        w = DatabaseWriter(self.h, max_pending_batches=2, session_cache=cache)
+        w.start()
+        first = w.create_session()
+        w.submit(gps_buffer(TEST_COUNT), first)
+        w.finalize_session(first)
+        self.assertTrue(cache.started.wait(5))
+
+        # a new session is written while the ended one is being cached
+        second = w.create_session()
+        for i in range(5):
+            self.assertTrue(w.submit(can_buffer(TEST_COUNT, i * TEST_COUNT), second))
+            deadline = time.monotonic() + 5
+            while w.written_samples < (i + 2) * TEST_COUNT and time.monotonic() < deadline:
+                time.sleep(0.01)
+        self.assertEqual(0, w.dropped_batches)
+        self.assertEqual(6 * TEST_COUNT, w.written_samples)
+
+        cache.release.set()
+        w.stop()
+        self.assertEqual([first], cache.sessions)
+        self.assertEqual(1, self.h.db_session.query(SessionInfo).filter(SessionInfo.session_id == first).count())
+
+    def test_retry_when_locked(self):
+        h = DbHandler(self.db_path, busy_timeout=0.05)
+        h.connect()
+        w = DatabaseWriter(h)
+        w.start()
+        lock = sqlite3.connect(self.db_path)
+        try:
+            lock.execute("BEGIN EXCLUSIVE")
+            session_id = w.create_session()
+            w.submit(can_buffer(TEST_COUNT), session_id)
+            time.sleep(0.3)
+        finally:
+            lock.rollback()
+            lock.close()
+        w.stop()
+        h.db_session.close()
+        self.assertEqual(0, w.failed_jobs)
+        self.assertEqual(TEST_COUNT, self.count(CANData, session_id))
+
+    def test_stop_timeout_keeps_finalize(self):
+        class SlowCache:
+            def __init__(self):
+                self.started = Event()
+                self.release = Event()
+                self.sessions = []
+
+            def write_session(self, db_session, session_id):
+                if not self.sessions:
+                    self.started.set()
+                    self.release.wait(5)
+                self.sessions.append(session_id)
+
+        cache = SlowCache()
+        w = DatabaseWriter(self.h, session_cache=cache)
+        w.start()
+        first = w.create_session()
+        w.finalize_session(first)
+        self.assertTrue(cache.started.wait(5))
+        log_path = os.path.join(self.tmpdir.name, "missing.rpfr")
+        w.ingest_log(log_path)
+        second = w.create_session()
+        w.finalize_session(second)
+
+        # the first timeout expires while the cache is still blocked
+        Timer(0.3, cache.release.set).start()
+        w.stop(timeout=0.2)
+        self.assertEqual([first, second], cache.sessions)
+        # the log was left for ingestflightlogs.py instead of failing
+        self.assertEqual(0, w.failed_jobs)
+
+
+if __name__ == "__main__":
+    main()
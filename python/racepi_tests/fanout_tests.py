@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# Copyright 2026 Donour Sizemore
+#
+# This file is part of RacePi
+#
+# RacePi is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 2
+#
+# RacePi is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RacePi.  If not, see <http://www.gnu.org/licenses/>.
+
+import socket
+from unittest import TestCase, main
+
+from racepi.racetech.fanout import DL1Fanout
+
+CHUNK_SIZE = 1000
+MAX_BUFFERED_BYTES = 10 * CHUNK_SIZE
+
+
+def recv_all(sock):
+    sock.setblocking(False)
+    data = b''
+    while True:
+        try:
+            d = sock.recv(65536)
+        except BlockingIOError:
+            return data
+        if not d:
+            return data
+        data += d
+
+
+class DL1FanoutTests(TestCase):
+
+    def setUp(self):
+        self.fanout = DL1Fanout(MAX_BUFFERED_BYTES)
+        self.peers = []
+
+    def tearDown(self):
+        self.fanout.close()
+        for p in self.peers:
+            p.close()
+
+    def add_client(self, name):
+        a, b = socket.socketpair()
+        a.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4096)
+        self.peers.append(b)
+        self.fanout.add_client(a, name)
+        return b
+
+    def test_broadcast(self):
+        peer = self.add_client("fast")
+        self.fanout.broadcast(b'\x01\x02\x03')
+        self.fanout.broadcast(memoryview(b'\x04'))
+        self.assertEqual(b'\x01\x02\x03\x04', recv_all(peer))
+        m = self.fanout.get_metrics()[0]
+        self.assertEqual(4, m['bytes_sent'])
+        self.assertEqual(0, m['chunks_dropped'])
+        self.assertEqual(0.0, m['lag'])
+
+    def test_slow_client_does_not_block(self):
+        fast = self.add_client("fast")
+        self.add_client("slow")
+        received = b''
+        for i in range(1000):
+            self.fanout.broadcast(bytes([i % 256]) * CHUNK_SIZE)
+            received += recv_all(fast)
+        self.assertEqual(1000 * CHUNK_SIZE, len(received))
+
+        fast_metrics, slow_metrics = self.fanout.get_metrics()
+        self.assertEqual(0, fast_metrics['chunks_dropped'])
+        self.assertGreater(slow_metrics['chunks_dropped'], 0)
+        self.assertLessEqual(slow_metrics['buffered_bytes'], MAX_BUFFERED_BYTES)
+        self.assertGreater(slow_metrics['lag'], 0.0)
+
+    def test_drop_oldest_whole_chunks(self):
+        slow = self.add_client("slow")
+        for i in range(1000):
+            self.fanout.broadcast(bytes([i % 256]) * CHUNK_SIZE)
+        data = recv_all(slow)
+        for _ in range(10):
+            self.fanout.service()
+            data += recv_all(slow)
+        # data is received in whole chunks and ends with the newest
+        self.assertEqual(0, len(data) % CHUNK_SIZE)
+        chunks = [data[i:i + CHUNK_SIZE] for i in range(0, len(data), CHUNK_SIZE)]
+        for c in chunks:
+            self.assertEqual(1, len(set(c)))
+        self.assertEqual(999 % 256, chunks[-1][0])
+
+    def test_closed_client_removed(self):
+        peer = self.add_client("closed")
+        peer.close()
+        self.peers.remove(peer)
+        self.fanout.broadcast(b'\x01')
+        self.fanout.service()
+        self.assertEqual(0, self.fanout.get_client_count())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# Copyright 2026 Donour Sizemore
+#
+# This file is part of RacePi
+#
+# RacePi is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 2
+#
+# RacePi is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RacePi.  If not, see <http://www.gnu.org/licenses/>.
+
+import errno
+import os
+import tempfile
+from unittest import TestCase, main
+
+from racepi.can.data import CanSample
+from racepi.database.objects import Session, GPSData, IMUData, CANData, SessionInfo
+from racepi.sensor.recorder.data_buffer import DataBuffer
+from racepi.sensor.recorder.db_writer import DatabaseWriter
+from racepi.sensor.recorder.flight_recorder import FlightRecorder, FlightLogReader, FILE_HEADER, \
+    BLOCK_HEADER, find_flight_logs, recover_flight_log, ingest_flight_log
+from racepi.sensor.recorder.sensor_log import SensorLogger, LoggerState, ACTIVATE_RECORDING_M_PER_S
+
+from db_fixtures import DatabaseTestCase, gps_report
+
+TEST_COUNT = 100
+SESSION_ID = "5d1b3c5e-0000-11f1-8000-000000000001"
+
+
+def gps_samples(start=0):
+    return [(start + i + 0.1, {'time': '2026-10-18T12:00:00.000Z', 'mode': 3, 'lat': 35.0, 'lon': -80.0,
+                               'alt': 10.0, 'speed': 10.0 + i, 'track': 90.0, 'epx': 1.0, 'epy': 1.0,
+                               'epv': 'n/a', 'eps': 'n/a'}) for i in range(TEST_COUNT)]
+
+
+def imu_samples(start=0):
+    return [(start + i + 0.2, {'fusionPose': (1.0, 2.0, 3.0), 'accel': (4.0, 5.0, float(i)),
+                               'gyro': (7.0, 8.0, 9.0)}) for i in range(TEST_COUNT)]
+
+
+def can_samples(start=0):
+    return [(start + i + 0.3, CanSample.create(0x085, bytes([i, 1, 2, 3]))) for i in range(TEST_COUNT)]
+
+
+def read_all(reader):
+    data = {}
+    for source, samples in reader.read_blocks():
+        data.setdefault(source, []).extend(samples)
+    return data
+
+
+class FlightRecorderTests(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, SESSION_ID + ".rpfr")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def record(self, grow_size=4096):
+        r = FlightRecorder(self.path, SESSION_ID, grow_size=grow_size)
+        for i in range(0, TEST_COUNT, 10):
+            b = DataBuffer()
+            b.add_sample('gps', gps_samples()[i:i + 10])
+            b.add_sample('imu', imu_samples()[i:i + 10])
+            b.add_sample('can', can_samples()[i:i + 10])
+            r.write_buffer(b)
+        return r
+
+    def test_write_and_read(self):
+        r = self.record()
+        r.close()
+        self.assertEqual(3 * TEST_COUNT, r.written_samples)
+        self.assertEqual(r.offset, os.path.getsize(self.path))
+
+        reader = FlightLogReader(self.path)
+        self.assertEqual(SESSION_ID, reader.session_id)
+        data = read_all(reader)
+        self.assertEqual(imu_samples(), [(t, {k: tuple(v) for k, v in s.items()}) for t, s in data['imu']])
+        self.assertEqual(can_samples(), data['can'])
+        expected = gps_samples()
+        self.assertEqual([t for t, _ in expected], [t for t, _ in data['gps']])
+        self.assertEqual(expected[5][1], data['gps'][5][1])
+        self.assertEqual(30, reader.block_count)
+        self.assertEqual(0, reader.corrupt_bytes)
+        self.assertEqual(0, reader.lost_blocks)
+
+    def test_skipped_samples(self):
+        r = FlightRecorder(self.path, SESSION_ID)
+        r.write('tpms', [(1.0, {})])
+        r.write('imu', [(1.0, {'accel': (1, 2, 3)}), None] + imu_samples()[:2])
+        r.close()
+        self.assertEqual(3, r.skipped_samples)
+        self.assertEqual(2, len(read_all(FlightLogReader(self.path))['imu']))
+
+    def test_recover_unclosed_log(self):
+        r = self.record()
+        r.sync()
+        # the file still holds the space reserved after the last block
+        self.assertGreater(os.path.getsize(self.path), r.offset)
+        reader = recover_flight_log(self.path)
+        self.assertEqual(3 * TEST_COUNT, reader.sample_count)
+        self.assertEqual(0, reader.corrupt_bytes)
+        self.assertEqual(r.offset, os.path.getsize(self.path))
+
+    def test_allocate_ahead(self):
+        r = self.record(grow_size=8192)
+        r.sync()
+        # the worker keeps space allocated beyond the last block
+        self.assertGreaterEqual(os.path.getsize(self.path), r.offset + 4096)
+        r.close()
+        self.assertEqual(r.offset, os.path.getsize(self.path))
+        r.close()
+
+    def test_recover_truncated_block(self):
+        self.record().close()
+        with open(self.path, 'r+b') as f:
+            f.truncate(os.path.getsize(self.path) - 5)
+        reader = recover_flight_log(self.path)
+        self.assertEqual(29, reader.block_count)
+        self.assertEqual(TEST_COUNT - 10, len(read_all(FlightLogReader(self.path))['can']))
+
+    def test_recover_corrupt_block(self):
+        self.record().close()
+        with open(self.path, 'r+b') as f:
+            # damage a record in the first imu block
+            f.seek(FILE_HEADER.size)
+            f.seek(FILE_HEADER.size + BLOCK_HEADER.size + BLOCK_HEADER.unpack(f.read(BLOCK_HEADER.size))[4])
+            f.seek(BLOCK_HEADER.size + 10, os.SEEK_CUR)
+            f.write(b'\xff\xff')
+        reader = FlightLogReader(self.path)
+        data = read_all(reader)
+        self.assertEqual(TEST_COUNT, len(data['gps']))
+        self.assertEqual(TEST_COUNT - 10, len(data['imu']))
+        self.assertEqual(imu_samples()[10][0], data['imu'][0][0])
+        self.assertEqual(1, reader.lost_blocks)
+        self.assertGreater(reader.corrupt_bytes, 0)
+
+    def test_invalid_log(self):
+        with open(self.path, 'wb') as f:
+            f.write(bytes(FILE_HEADER.size))
+        self.assertRaises(IOError, FlightLogReader, self.path)
+
+    def test_existing_log_not_replaced(self):
+        self.record().close()
+        self.assertRaises(FileExistsError, FlightRecorder, self.path, SESSION_ID)
+
+    def test_find_flight_logs(self):
+        self.record().close()
+        self.assertEqual([self.path], find_flight_logs(self.tmpdir.name))
+        self.assertEqual([], find_flight_logs(os.path.join(self.tmpdir.name, "missing")))
+
+
+class FlightLogIngestTests(DatabaseTestCase):
+
+    def setUp(self):
+        DatabaseTestCase.setUp(self)
+        self.path = os.path.join(self.tmpdir.name, SESSION_ID + ".rpfr")
+        r = FlightRecorder(self.path, SESSION_ID)
+        r.write('gps', gps_samples())
+        r.write('imu', imu_samples())
+        r.write('can', can_samples())
+        r.close()
+
+    def assertIngested(self):
+        for table in (GPSData, IMUData, CANData):
+            self.assertEqual(TEST_COUNT, self.count(table, SESSION_ID))
+        si = self.h.db_session.query(SessionInfo).filter(SessionInfo.session_id == SESSION_ID).one()
+        self.assertEqual(3 * TEST_COUNT, si.num_data_samples)
+        self.assertEqual(10.0 + TEST_COUNT - 1, si.max_speed)
+        can = self.h.db_session.query(CANData).filter(CANData.session_id == SESSION_ID).\
+            order_by(CANData.timestamp).first()
+        self.assertEqual((0x085, bytes([0, 1, 2, 3])), (can.arbitration_id, can.msg))
+
+    def test_ingest(self):
+        reader = ingest_flight_log(self.path, self.h, batch_samples=TEST_COUNT)
+        self.assertEqual(3 * TEST_COUNT, reader.sample_count)
+        self.assertIngested()
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_ingest_again(self):
+        # a log loaded by an interrupted ingest replaces the loaded data
+        ingest_flight_log(self.path, self.h, keep=True)
+        ingest_flight_log(self.path, self.h, keep=True)
+        self.assertIngested()
+        self.assertTrue(os.path.exists(self.path))
+
+    def test_database_writer_ingest(self):
+        w = DatabaseWriter(self.h)
+        w.start()
+        w.ingest_log(self.path)
+        w.stop()
+        self.assertEqual(0, w.failed_jobs)
+        self.assertEqual(3 * TEST_COUNT, w.written_samples)
+        self.assertIngested()
+
+
+    def start_logger(self):
+        log_dir = os.path.join(self.tmpdir.name, "flight_logs")
+        os.makedirs(log_dir)
+        sl = SensorLogger(self.h, flight_recorder_dir=log_dir)
+        sl.state = LoggerState.ready
+        return sl, log_dir
+
+    @staticmethod
+    def gps_update(sl, t, speed=ACTIVATE_RECORDING_M_PER_S + 1):
+        data = [(t, gps_report(speed))]
+        sl.data.add_sample('gps', data)
+        sl.process_new_data({'gps': data})
+
+    @staticmethod
+    def fail_recorder(sl):
+        def write_buffer(data):
+            raise OSError(errno.ENOSPC, "No space left on device")
+        sl.flight_recorder.write_buffer = write_buffer
+
+    def assertSession(self, session_id, count):
+        self.assertEqual(count, self.count(GPSData, session_id))
+        si = self.h.db_session.query(SessionInfo).filter(SessionInfo.session_id == session_id).one()
+        self.assertEqual(count, si.num_data_samples)
+        self.assertEqual(1, self.h.db_session.query(Session).count())
+
+    def test_sensor_logger_session(self):
+        sl, log_dir = self.start_logger()
+        try:
+            for i in range(5):
+                self.gps_update(sl, 1000.0 + i)
+            self.assertEqual(LoggerState.logging, sl.state)
+            session_id = sl.session_id
+            self.assertEqual([os.path.join(log_dir, session_id + ".rpfr")], find_flight_logs(log_dir))
+
+            self.gps_update(sl, 1005.0, speed=0.0)
+            self.assertEqual(LoggerState.ready, sl.state)
+        finally:
+            sl.racetech_feed_writer.close()
+            sl.db_writer.stop()
+        self.assertEqual([], find_flight_logs(log_dir))
+        self.assertSession(session_id, 6)
+
+    def test_sensor_logger_recorder_failure(self):
+        sl, log_dir = self.start_logger()
+        try:
+            for i in range(3):
+                self.gps_update(sl, 1000.0 + i)
+            session_id = sl.session_id
+            self.fail_recorder(sl)
+            # the failed batch and later data go to the database, in the same session
+            for i in range(3, 6):
+                self.gps_update(sl, 1000.0 + i)
+            self.assertIsNone(sl.flight_recorder)
+            self.assertEqual(session_id, sl.session_id)
+            self.gps_update(sl, 1006.0, speed=0.0)
+        finally:
+            sl.racetech_feed_writer.close()
+            sl.db_writer.stop()
+        self.assertEqual(0, sl.db_writer.failed_jobs)
+        self.assertEqual([], find_flight_logs(log_dir))
+        self.assertSession(session_id, 7)
+
+    def test_sensor_logger_recorder_failure_at_end(self):
+        sl, log_dir = self.start_logger()
+        try:
+            for i in range(3):
+                self.gps_update(sl, 1000.0 + i)
+            session_id = sl.session_id
+            self.fail_recorder(sl)
+            self.gps_update(sl, 1003.0, speed=0.0)
+            self.assertEqual(LoggerState.ready, sl.state)
+        finally:
+            sl.racetech_feed_writer.close()
+            sl.db_writer.stop()
+        self.assertEqual(0, sl.db_writer.failed_jobs)
+        self.assertSession(session_id, 4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# Copyright 2026 Donour Sizemore
+#
+# This file is part of RacePi
+#
+# RacePi is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 2
+#
+# RacePi is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RacePi.  If not, see <http://www.gnu.org/licenses/>.
+
+import bz2
+import os
+import sqlite3
+import tempfile
+from unittest import TestCase, main
+
+from racepi.database.migrations import migrate, get_schema_version, SCHEMA_VERSION
+
+TEST_DB = os.path.join(os.path.dirname(__file__), "..", "..", "sql", "testdb", "test.db.bz2")
+
+
+class MigrationTests(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "test.db")
+        with bz2.open(TEST_DB) as src, open(self.db_path, "wb") as dst:
+            dst.write(src.read())
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_migrate_existing_db(self):
+        self.assertEqual(SCHEMA_VERSION, migrate(self.db_path))
+        conn = sqlite3.connect(self.db_path)
+        self.assertEqual(SCHEMA_VERSION, get_schema_version(conn))
+        plan = conn.execute("EXPLAIN QUERY PLAN SELECT * FROM gps_data WHERE session_id = ? "
+                            "ORDER BY timestamp", ("x",)).fetchall()
+        self.assertIn("ix_gps_data_session_time", str(plan))
+        # data is unchanged
+        self.assertEqual(1982, conn.execute("SELECT count(*) FROM gps_data").fetchone()[0])
+        conn.close()
+
+    def test_migrate_is_idempotent(self):
+        migrate(self.db_path)
+        self.assertEqual(0, migrate(self.db_path))
+
+    def test_migrate_can_payloads(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TABLE can_data (session_id BLOB NOT NULL, timestamp DATETIME NOT NULL, "
+                     "arbitration_id integer NOT NULL, rtr integer NOT NULL, msg BLOB NOT NULL)")
+        conn.executemany("INSERT INTO can_data VALUES ('s', ?, 133, 0, ?)",
+                         [(0, "deadbeef"), (1, "0102"), (2, "zz")])
+        conn.commit()
+        conn.close()
+
+        migrate(self.db_path)
+        conn = sqlite3.connect(self.db_path)
+        msgs = [r[0] for r in conn.execute("SELECT msg FROM can_data ORDER BY timestamp")]
+        conn.close()
+        self.assertEqual([b'\xde\xad\xbe\xef', b'\x01\x02', "zz"], msgs)
+
+    def test_migrate_empty_db(self):
+        path = os.path.join(self.tmpdir.name, "empty.db")
+        self.assertEqual(0, migrate(path))
+
+
+if __name__ == "__main__":
+    main()
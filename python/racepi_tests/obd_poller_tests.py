@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# Copyright 2026 Donour Sizemore
+#
+# This file is part of RacePi
+#
+# RacePi is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 2
+#
+# RacePi is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RacePi.  If not, see <http://www.gnu.org/licenses/>.
+
+from unittest import TestCase, main
+
+from racepi.sensor.handler.obd_poller import ObdPoller, ObdParameter, STANDARD_PARAMETERS, \
+    parse_elm_response, decode_mode01_response, PRIORITY_HIGH, PRIORITY_LOW
+
+# raw data bytes returned by the fake ECU for each pid
+ECU_DATA = {
+    0x0C: b"\x1a\xf8",  # 1726 rpm
+    0x11: b"\x80",
+    0x0D: b"\x32",
+    0x0B: b"\x65",
+    0x04: b"\x40",
+    0x0E: b"\x90",
+    0x0F: b"\x46",
+    0x05: b"\x7b",
+}
+
+
+class FakeSTN:
+    """
+    STNHandler answering mode 01 requests like an ELM without headers
+    """
+
+    def __init__(self, data=ECU_DATA):
+        self.data = data
+        self.requests = []
+
+    def send_request(self, cmd):
+        self.requests.append(cmd)
+        pids = bytes.fromhex(cmd)[1:]
+        message = b"\x41" + b"".join(bytes([p]) + self.data[p] for p in pids if p in self.data)
+        if len(message) == 1:
+            return ["NO DATA"]
+        if len(message) <= 7:
+            return [message.hex().upper()]
+        # ISO-TP multi frame, 6 bytes in the first frame and 7 in the others
+        lines = ["%03X" % len(message), "0:" + message[:6].hex().upper()]
+        for i, offset in enumerate(range(6, len(message), 7)):
+            lines.append("%d:" % (i + 1) + message[offset:offset + 7].hex().upper().ljust(14, "0"))
+        return lines
+
+
+class ObdResponseTests(TestCase):
+
+    def setUp(self):
+        self.parameters = {p.pid: p for p in STANDARD_PARAMETERS}
+
+    def test_single_frame(self):
+        messages = parse_elm_response(["410C1AF81180"])
+        self.assertEqual([b"\x41\x0c\x1a\xf8\x11\x80"], messages)
+        values = decode_mode01_response(messages[0], self.parameters)
+        self.assertEqual(1726.0, values['rpm'])
+        self.assertAlmostEqual(50.2, values['tps'], 1)
+
+    def test_multi_frame(self):
+        lines = FakeSTN().send_request("010C110D0B040E")
+        self.assertEqual("00E", lines[0])
+        messages = parse_elm_response(lines)
+        self.assertEqual(1, len(messages))
+        values = decode_mode01_response(messages[0], self.parameters)
+        self.assertEqual({'rpm', 'tps', 'speed', 'map', 'load', 'timing_advance'}, set(values))
+        self.assertEqual(50.0, values['speed'])
+        self.assertEqual(8.0, values['timing_advance'])
+
+    def test_status_lines(self):
+        self.assertEqual([], parse_elm_response(["NO DATA"]))
+        self.assertEqual([], parse_elm_response(["STOPPED", "CAN ERROR"]))
+        self.assertEqual({}, decode_mode01_response(b"\x7f\x01\x12", self.parameters))
+
+    def test_unknown_pid(self):
+        values = decode_mode01_response(b"\x41\x0c\x1a\xf8\x99\x01\x11\x80", self.parameters)
+        self.assertEqual({'rpm': 1726.0}, values)
+
+
+class ObdPollerTests(TestCase):
+
+    def test_pids_per_request(self):
+        stn = FakeSTN()
+        poller = ObdPoller(stn)
+        values = poller.poll(0.0)
+        self.assertEqual(6, len(values))
+        self.assertEqual(1, len(stn.requests))
+        self.assertEqual("010C11", stn.requests[0][:6])  # high priority first
+
+    def test_target_rates(self):
+        parameters = [
+            ObdParameter('rpm', 0x0C, 2, lambda d: d, 20.0, PRIORITY_HIGH),
+            ObdParameter('coolant_temp', 0x05, 1, lambda d: d, 1.0, PRIORITY_LOW),
+        ]
+        poller = ObdPoller(FakeSTN(), parameters)
+        t = 0.0
+        while t < 10.0:
+            poller.poll(t)
+            t += 0.01
+        rates = poller.get_achieved_rates(poller.start_time + 10.0)
+        self.assertEqual(200, poller.value_counts['rpm'])
+        self.assertEqual(10, poller.value_counts['coolant_temp'])
+        self.assertAlmostEqual(20.0, rates['rpm'], 0)
+
+    def test_priority_when_oversubscribed(self):
+        stn = FakeSTN()
+        poller = ObdPoller(stn, STANDARD_PARAMETERS, max_pids=2)
+        poller.poll(0.0)
+        self.assertEqual("010C11", stn.requests[0])
+
+    def test_wait_time(self):
+        poller = ObdPoller(FakeSTN())
+        self.assertEqual(0.0, poller.wait_time(0.0))
+        poller.poll(0.0)
+        poller.poll(0.0)
+        self.assertGreater(poller.wait_time(0.0), 0.0)
+        self.assertEqual({}, poller.poll(0.0))
+
+    def test_failed_request(self):
+        poller = ObdPoller(FakeSTN(data={}))
+        self.assertEqual({}, poller.poll(0.0))
+        self.assertEqual(1, poller.failed_requests)
+
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,7 @@
 # You should have received a copy of the GNU General Public License
 # along with RacePi.  If not, see <http://www.gnu.org/licenses/>.
 
+import random
 from unittest import TestCase, main
 
 from racepi.racetech.messages import *
@@ -257,5 +258,56 @@ class RaceCaptureMessageTests(TestCase):
         self.assertEqual(3, len(msg))
 
 
+class DL1MessageBufferTests(TestCase):
+
+    def test_pack(self):
+        b = DL1MessageBuffer()
+        b.pack(RPM_STRUCT, get_rpm_message_fields(1000))
+        b.pack(TIMESTAMP_STRUCT, get_timestamp_message_fields(0xDEADBEEF))
+        self.assertEqual(2, len(b))
+        expected = b"".join(m + get_message_checksum(m) for m in
+                            [get_rpm_message_bytes(1000), get_timestamp_message_bytes(0xDEADBEEF)])
+        self.assertEqual(expected, b.getvalue())
+
+    def test_append(self):
+        b = DL1MessageBuffer()
+        b.append(b'\xff\x01\x02')
+        self.assertEqual(b'\xff\x01\x02\x02', b.getvalue())
+
+    def test_grow(self):
+        b = DL1MessageBuffer(size=4)
+        for i in range(100):
+            b.pack(Z_ACCEL_STRUCT, get_z_accel_message_fields(0.1))
+        self.assertEqual(100, len(b))
+        self.assertEqual(100 * 4, len(b.getvalue()))
+
+    def test_clear(self):
+        b = DL1MessageBuffer()
+        b.append(b'\x01')
+        view = b.getbuffer()
+        self.assertEqual(b'\x01\x01', bytes(view))
+        view.release()
+        b.clear()
+        self.assertFalse(b)
+        self.assertEqual(b'', b.getvalue())
+
+
+class IMUBatchEncodingTests(TestCase):
+
+    def test_matches_single_messages(self):
+        rng = random.Random(1)
+        samples = [(rng.uniform(-1e7, 1e8), rng.uniform(-3, 3), rng.uniform(-3, 3), rng.uniform(-3, 3))
+                   for _ in range(1000)]
+        samples.append((0.0, 0.0, -0.0, 1.0))
+        expected = b"".join(
+            m + get_message_checksum(m) for t, x, y, z in samples
+            for m in [get_timestamp_message_bytes(t), get_xy_accel_message_bytes(x, y), get_z_accel_message_bytes(z)])
+        t, x, y, z = zip(*samples)
+        self.assertEqual(expected, get_imu_batch_message_bytes(t, x, y, z))
+
+    def test_empty(self):
+        self.assertEqual(b'', get_imu_batch_message_bytes([], [], [], []))
+
+
 if __name__ == "__main__":
     main()
@@ -50,6 +50,36 @@ class RaceCaptureWriterTests(TestCase):
         self.writer.send_steering_angle(-CLIP_STEERING_ANGLE+1e-4)
         self.assertEqual(2, len(self.writer.pending_messages))
 
+    def test_write_imu_samples(self):
+        samples = [(1000.0 + i, {'accel': (0.1 * i, -0.2 * i, 1.0)}) for i in range(10)]
+        samples.append((2000.0, {'accel': None}))
+        for t, d in samples:
+            self.writer.write_imu_sample(t, d)
+        expected = self.writer.pending_messages.getvalue()
+        self.writer.pending_messages.clear()
+
+        self.writer.write_imu_samples(samples)
+        self.assertEqual(30, len(self.writer.pending_messages))
+        self.assertEqual(expected, self.writer.pending_messages.getvalue())
+
+    def test_write_can_sample(self):
+        # engine speed, accelerator position and brake pedal
+        self.writer.write_can_sample(1000.0, "114" + "0400001a0001")
+        self.assertEqual(6 + 1, len(self.writer.pending_messages))
+
+    def test_write_can_sample_steering(self):
+        self.writer.write_can_sample(1500.0, "085" + "e8030000")
+        self.assertEqual(2, len(self.writer.pending_messages))
+
+    def test_write_can_sample_zero_values(self):
+        self.writer.write_can_sample(2000.0, "114" + "000000000000")
+        self.assertFalse(self.writer.pending_messages)
+
+    def test_write_can_sample_unknown(self):
+        self.writer.write_can_sample(3000.0, "7ff" + "0400001a0001")
+        self.writer.write_can_sample(3000.0, "114")
+        self.assertFalse(self.writer.pending_messages)
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# Copyright 2026 Donour Sizemore
+#
+# This file is part of RacePi
+#
+# RacePi is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 2
+#
+# RacePi is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RacePi.  If not, see <http://www.gnu.org/licenses/>.
+
+import socket
+from unittest import TestCase, main
+
+from racepi.racetech.fanout import DL1Fanout
+from racepi.racetech.messages import DL1MessageBuffer
+from racepi.racetech.rate_policy import ChannelRatePolicy, MAX_RATE_SCALE
+
+TEST_RATES = {'imu': 10.0, 'gps': None}
+
+
+class ChannelRatePolicyTests(TestCase):
+
+    def setUp(self):
+        self.policy = ChannelRatePolicy(TEST_RATES)
+
+    def count_allowed(self, channel, rate, seconds):
+        return sum(self.policy.allow(channel, i / rate) for i in range(int(rate * seconds)))
+
+    def test_limited_channel(self):
+        self.assertEqual(10, self.count_allowed('imu', 100.0, 1.0))
+
+    def test_native_channel(self):
+        self.assertEqual(100, self.count_allowed('gps', 100.0, 1.0))
+        self.assertEqual(100, self.count_allowed('unknown', 100.0, 1.0))
+        self.assertTrue(all(self.policy.allow(None, None) for _ in range(10)))
+
+    def test_time_reset(self):
+        self.assertTrue(self.policy.allow('imu', 100.0))
+        self.assertTrue(self.policy.allow('imu', 0.0))
+
+    def test_adapt(self):
+        self.policy.adapt(900, 1000, 0)
+        self.assertGreater(self.policy.scale, 1.0)
+        for i in range(100):
+            self.policy.adapt(0, 1000, i)
+        self.assertEqual(MAX_RATE_SCALE, self.policy.scale)
+        self.assertEqual(5, self.count_allowed('imu', 100.0, 4.0))
+        for i in range(100):
+            self.policy.adapt(0, 1000, 100)
+        self.assertEqual(1.0, self.policy.scale)
+
+    def test_select(self):
+        segments = [(None, None, 0, 1), ('imu', 0.0, 1, 3), ('imu', 0.01, 3, 5), ('gps', 0.01, 5, 6)]
+        self.assertEqual(b'\x00\x01\x02\x05', self.policy.select(b'\x00\x01\x02\x03\x04\x05', segments))
+
+    def test_select_all(self):
+        data = b'\x00\x01'
+        self.assertIs(data, self.policy.select(data, [('gps', 0.0, 0, 2)]))
+
+
+class SegmentTests(TestCase):
+
+    def test_segments(self):
+        b = DL1MessageBuffer()
+        b.append(b'\x01')
+        b.begin_segment('imu', 1.0)
+        b.append(b'\x02')
+        b.append(b'\x03')
+        b.begin_segment('gps', 2.0)
+        b.begin_segment('imu', 3.0)
+        b.append(b'\x04')
+        self.assertEqual([(None, None, 0, 2), ('imu', 1.0, 2, 6), ('imu', 3.0, 6, 8)], b.get_segments())
+        b.clear()
+        self.assertEqual([], b.get_segments())
+
+    def test_records(self):
+        b = DL1MessageBuffer()
+        b.extend_records(b'\x00' * 6, 2, 'imu', [1.0, 2.0, 3.0])
+        self.assertEqual(6, len(b))
+        self.assertEqual([('imu', 1.0, 0, 2), ('imu', 2.0, 2, 4), ('imu', 3.0, 4, 6)], b.get_segments())
+
+
+class FanoutPolicyTests(TestCase):
+
+    def test_per_client_rates(self):
+        fanout = DL1Fanout(policy_factory=lambda: ChannelRatePolicy(TEST_RATES))
+        a, b = socket.socketpair()
+        fanout.add_client(a, "client")
+        for i in range(100):
+            buffer = DL1MessageBuffer()
+            buffer.begin_segment('imu', i / 100.0)
+            buffer.append(b'\x01')
+            fanout.broadcast(buffer.getvalue(), buffer.get_segments())
+        b.setblocking(False)
+        self.assertEqual(b'\x01\x01' * 10, b.recv(1000))
+        self.assertEqual(90, fanout.get_metrics()[0]['samples_skipped'])
+        fanout.close()
+        b.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# Copyright 2026 Donour Sizemore
+#
+# This file is part of RacePi
+#
+# RacePi is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 2
+#
+# RacePi is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RacePi.  If not, see <http://www.gnu.org/licenses/>.
+
+import time
+from multiprocessing.connection import wait
+from unittest import TestCase, main
+
+from racepi.sensor.handler.sensor_handler import SensorHandler
+from racepi.sensor.handler.shared_memory_ring import ImuRecordCodec
+
+TEST_COUNT = 10
+IMU_SAMPLE = {'fusionPose': (0.0, 0.0, 0.0), 'accel': (0.0, 0.0, 1.0), 'gyro': (0.0, 0.0, 0.0)}
+
+
+class SensorHandlerBatchingTests(TestCase):
+
+    def setUp(self):
+        # samples are sent from the test process, so no reader is needed
+        self.h = SensorHandler(None)
+
+    def test_unbatched(self):
+        for i in range(TEST_COUNT):
+            self.h.send_sample(i, 'data')
+        self.assertEqual([(i, 'data') for i in range(TEST_COUNT)], self.h.get_all_data())
+
+    def test_batch_by_count(self):
+        self.h.set_batching(TEST_COUNT, batch_latency=60.0)
+        for i in range(TEST_COUNT - 1):
+            self.h.send_sample(i, 'data')
+        self.assertEqual([], self.h.get_all_data())
+        self.h.send_sample(TEST_COUNT - 1, 'data')
+        self.assertEqual([(i, 'data') for i in range(TEST_COUNT)], self.h.get_all_data())
+
+    def test_batch_by_latency(self):
+        self.h.set_batching(TEST_COUNT, batch_latency=0.01)
+        self.h.send_sample(0, 'data')
+        self.h.flush_samples_if_due()
+        self.assertEqual([], self.h.get_all_data())
+        time.sleep(0.02)
+        self.h.flush_samples_if_due()
+        self.assertEqual([(0, 'data')], self.h.get_all_data())
+
+    def test_flush(self):
+        self.h.set_batching(TEST_COUNT, batch_latency=60.0)
+        self.h.send_sample(0, 'data')
+        self.h.flush_samples()
+        self.assertEqual([(0, 'data')], self.h.get_all_data())
+
+    def test_invalid_batch_size(self):
+        self.assertRaises(ValueError, self.h.set_batching, 0)
+
+    def test_batch_timeout(self):
+        self.assertIsNone(self.h.get_batch_timeout())
+        self.assertEqual(2.0, self.h.get_batch_timeout(2.0))
+        self.h.set_batching(TEST_COUNT, batch_latency=0.01)
+        self.assertEqual(0.01, self.h.get_batch_timeout(2.0))
+
+
+class SensorHandlerWakeTests(TestCase):
+
+    def test_pipe_wake(self):
+        h = SensorHandler(None)
+        self.assertEqual([], wait([h.get_wait_handle()], 0))
+        h.send_sample(0, 'data')
+        self.assertEqual([h.get_wait_handle()], wait([h.get_wait_handle()], 0))
+        h.get_all_data()
+        self.assertEqual([], wait([h.get_wait_handle()], 0))
+
+    def test_ring_wake(self):
+        h = SensorHandler(None, ImuRecordCodec())
+        try:
+            self.assertEqual([], wait([h.get_wait_handle()], 0))
+            for i in range(TEST_COUNT):
+                h.send_sample(i, IMU_SAMPLE)
+            self.assertEqual([h.get_wait_handle()], wait([h.get_wait_handle()], 0))
+            self.assertEqual(TEST_COUNT, len(h.get_all_data()))
+            # tokens are discarded with the data
+            self.assertEqual([], wait([h.get_wait_handle()], 0))
+            self.assertEqual([], h.get_all_data())
+        finally:
+            h.ring.close()
+
+    def test_ring_wakes_once_per_drain(self):
+        h = SensorHandler(None, ImuRecordCodec())
+        try:
+            h.send_sample(0, IMU_SAMPLE)
+            h.send_sample(1, IMU_SAMPLE)
+            h.pipe_in.recv()
+            self.assertFalse(h.pipe_in.poll())
+        finally:
+            h.ring.close()
+
+
+if __name__ == "__main__":
+    main()
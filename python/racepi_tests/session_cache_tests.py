@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# Copyright 2026 Donour Sizemore
+#
+# This file is part of RacePi
+#
+# RacePi is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 2
+#
+# RacePi is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RacePi.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+from unittest import main, skipUnless
+
+import numpy as np
+
+from racepi.can import focus_rs_rpm_converter, focus_rs_tps_converter
+from racepi.can.data import CanFrame
+from racepi.database.session_cache import SessionCache, get_cache_dir, read_session_columns
+from racepi.sensor.data_utilities import TimeToDistanceConverter
+from racepi.sensor.recorder.data_buffer import DataBuffer
+from racepi.sensor.recorder.db_writer import DatabaseWriter
+
+from db_fixtures import DatabaseTestCase, gps_samples, imu_samples, can_samples
+
+TEST_COUNT = 50
+TPS_FRAME = "0801234567890abcdef"
+RPM_FRAME = "0900011223344556677"
+
+
+def session_buffer(start=0):
+    b = DataBuffer()
+    # stationary at the start, then moving
+    b.add_sample('gps', gps_samples(TEST_COUNT, start, speeds=[0.0 if i < 5 else float(i) for i in range(TEST_COUNT)]))
+    b.add_sample('imu', imu_samples(TEST_COUNT, start + 0.5))
+    b.add_sample('can', can_samples(TEST_COUNT, start + 0.25, TPS_FRAME))
+    b.add_sample('can', can_samples(TEST_COUNT, start + 0.75, RPM_FRAME))
+    return b
+
+
+class SessionCacheTests(DatabaseTestCase):
+
+    def setUp(self):
+        DatabaseTestCase.setUp(self)
+        self.session_id = self.h.get_new_session()
+        self.h.log_data_from_active_session(session_buffer(), self.session_id)
+        self.cache = SessionCache(get_cache_dir(self.db_path))
+
+    def test_read_session_columns(self):
+        tables = read_session_columns(self.h.db_session, self.session_id)
+        self.assertEqual({'gps', 'imu', 'can_tps', 'can_rpm'}, set(tables))
+        self.assertEqual(TEST_COUNT, len(tables['gps']['timestamp']))
+        self.assertEqual(10.0, tables['gps']['alt'][0])
+        self.assertTrue(np.isnan(tables['gps']['epx'][0]))
+        self.assertEqual(6.0, tables['imu']['z_accel'][0])
+
+        tps = focus_rs_tps_converter.convert_frame(CanFrame(TPS_FRAME[:3], TPS_FRAME[3:]))
+        rpm = focus_rs_rpm_converter.convert_frame(CanFrame(RPM_FRAME[:3], RPM_FRAME[3:]))
+        self.assertEqual([tps] * TEST_COUNT, tables['can_tps']['result'].tolist())
+        self.assertEqual([rpm] * TEST_COUNT, tables['can_rpm']['result'].tolist())
+
+        # distance uses only the samples in motion
+        tdc = TimeToDistanceConverter([(float(i), float(i)) for i in range(5, TEST_COUNT)])
+        t = tables['imu']['timestamp']
+        np.testing.assert_allclose(tdc.generate_distance_trace(t), tables['imu']['distance'])
+
+    def test_no_motion(self):
+        self.h.db_session.execute("UPDATE gps_data SET speed = 0")
+        tables = read_session_columns(self.h.db_session, self.session_id)
+        self.assertTrue(np.isnan(tables['gps']['distance']).all())
+
+    @skipUnless(SessionCache.is_available(), "pyarrow not installed")
+    def test_write_and_read(self):
+        self.assertFalse(self.cache.has_session(self.session_id))
+        self.assertIsNone(self.cache.read_session(self.session_id))
+
+        self.assertTrue(self.cache.write_session(self.h.db_session, self.session_id))
+        self.assertTrue(self.cache.has_session(self.session_id))
+        expected = read_session_columns(self.h.db_session, self.session_id)
+        tables = self.cache.read_session(self.session_id)
+        self.assertEqual(set(expected), set(tables))
+        for name, columns in expected.items():
+            self.assertEqual(set(columns), set(tables[name].column_names))
+            for c in columns:
+                np.testing.assert_array_equal(columns[c], tables[name].column(c).to_numpy())
+        self.assertIsNone(self.cache.read_table(self.session_id, 'can_steering'))
+
+        # rewriting replaces the cached copy
+        self.assertTrue(self.cache.write_session(self.h.db_session, self.session_id))
+        self.assertEqual([self.session_id], os.listdir(self.cache.cache_dir))
+
+    @skipUnless(SessionCache.is_available(), "pyarrow not installed")
+    def test_written_when_finalized(self):
+        w = DatabaseWriter(self.h, session_cache=self.cache)
+        w.start()
+        session_id = w.create_session()
+        w.submit(session_buffer(TEST_COUNT), session_id)
+        w.finalize_session(session_id)
+        w.stop()
+        self.assertEqual(0, w.failed_jobs)
+        self.assertEqual(TEST_COUNT, self.cache.read_table(session_id, 'gps').num_rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# Copyright 2026 Donour Sizemore
+#
+# This file is part of RacePi
+#
+# RacePi is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 2
+#
+# RacePi is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RacePi.  If not, see <http://www.gnu.org/licenses/>.
+
+from unittest import TestCase, main
+
+from racepi.can.data import CanSample, CAN_EFF_FLAG
+from racepi.sensor.handler.shared_memory_ring import SharedMemoryRing, \
+    CanRecordCodec, ImuRecordCodec, GpsRecordCodec
+
+TEST_CAPACITY = 4
+
+
+class SharedMemoryRingTests(TestCase):
+
+    def setUp(self):
+        self.ring = SharedMemoryRing(CanRecordCodec(), TEST_CAPACITY)
+
+    def tearDown(self):
+        self.ring.close()
+
+    def test_empty(self):
+        self.assertEqual([], self.ring.get_all())
+        self.assertEqual(0, self.ring.get_dropped_count())
+
+    def test_can_round_trip(self):
+        self.assertTrue(self.ring.put(1.5, "085deadbeef"))
+        self.assertEqual([(1.5, CanSample(0x85, b'\xde\xad\xbe\xef', 4, 0))], self.ring.get_all())
+        self.assertEqual([], self.ring.get_all())
+
+    def test_can_sample_round_trip(self):
+        sample = CanSample.create(0x18daf110, b'\x01\x02', CAN_EFF_FLAG)
+        self.assertTrue(self.ring.put(1.5, sample))
+        self.assertEqual([(1.5, sample)], self.ring.get_all())
+
+    def test_overrun(self):
+        for i in range(TEST_CAPACITY + 2):
+            self.ring.put(float(i), "0850000")
+        self.assertEqual(2, self.ring.get_dropped_count())
+        data = self.ring.get_all()
+        self.assertEqual([float(i) for i in range(TEST_CAPACITY)], [x[0] for x in data])
+
+    def test_wrap_around(self):
+        for i in range(TEST_CAPACITY - 1):
+            self.ring.put(float(i), "0850000")
+        self.ring.get_all()
+        for i in range(TEST_CAPACITY):
+            self.ring.put(float(i), "114%04x" % i)
+        data = self.ring.get_all()
+        self.assertEqual(TEST_CAPACITY, len(data))
+        self.assertEqual(["114%04x" % i for i in range(TEST_CAPACITY)], [x[1].to_hex() for x in data])
+        self.assertEqual(0, self.ring.get_dropped_count())
+
+    def test_invalid_can_data(self):
+        self.assertFalse(self.ring.put(0.0, "01"))
+        self.assertFalse(self.ring.put(0.0, "010" + "00" * 9))
+        self.assertEqual(2, self.ring.get_dropped_count())
+        self.assertEqual([], self.ring.get_all())
+
+
+class RecordCodecTests(TestCase):
+
+    def test_imu_round_trip(self):
+        ring = SharedMemoryRing(ImuRecordCodec(), TEST_CAPACITY)
+        ring.put(2.0, {'fusionPose': (1, 2, 3), 'accel': (4, 5, 6), 'gyro': (7, 8, 9), 'compass': None})
+        t, v = ring.get_all()[0]
+        ring.close()
+        self.assertEqual(2.0, t)
+        self.assertEqual((4.0, 5.0, 6.0), v['accel'])
+        self.assertEqual((7.0, 8.0, 9.0), v['gyro'])
+
+    def test_gps_round_trip(self):
+        ring = SharedMemoryRing(GpsRecordCodec(), TEST_CAPACITY)
+        ring.put(3.0, {'time': '2017-06-28T02:27:37.050Z', 'mode': 3, 'speed': 12.5,
+                       'lat': 35.1, 'lon': -80.2, 'epx': 'n/a'})
+        t, v = ring.get_all()[0]
+        ring.close()
+        self.assertEqual(3.0, t)
+        self.assertEqual('2017-06-28T02:27:37.050Z', v['time'])
+        self.assertEqual(3, v['mode'])
+        self.assertAlmostEqual(12.5, v['speed'])
+        self.assertEqual('n/a', v['epx'])
+        self.assertEqual('n/a', v['alt'])
+
+
+if __name__ == "__main__":
+    main()
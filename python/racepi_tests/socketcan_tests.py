@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# Copyright 2026 Donour Sizemore
+#
+# This file is part of RacePi
+#
+# RacePi is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 2
+#
+# RacePi is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RacePi.  If not, see <http://www.gnu.org/licenses/>.
+
+import socket
+import time
+from unittest import TestCase, main
+
+from racepi.can.data import CanSample, CAN_EFF_FLAG
+from racepi.sensor.handler.socketcan import CanFrameReceiver, CAN_MESSAGE, \
+    decode_can_fields, get_rx_timestamp
+
+TEST_COUNT = 10
+TEST_BATCH_FRAMES = 4
+
+
+def frame(can_id, payload):
+    return CAN_MESSAGE.pack(can_id, len(payload), payload)
+
+
+class CanFrameReceiverTests(TestCase):
+    """
+    Raw CAN sockets are not available everywhere, datagram socket pairs
+    deliver frames the same way
+    """
+
+    def setUp(self):
+        self.tx, self.rx = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.receiver = CanFrameReceiver(self.rx, TEST_BATCH_FRAMES)
+
+    def tearDown(self):
+        self.tx.close()
+        self.rx.close()
+
+    def test_empty(self):
+        self.assertEqual([], self.receiver.read_available())
+        self.assertEqual([], self.receiver.receive(0))
+
+    def test_receive(self):
+        before = time.time()
+        self.tx.send(frame(0x85, b"\xde\xad\xbe\xef"))
+        frames = self.receiver.receive(1.0)
+        self.assertEqual(1, len(frames))
+        t, sample = frames[0]
+        self.assertEqual(CanSample(0x85, b"\xde\xad\xbe\xef", 4, 0), sample)
+        self.assertGreaterEqual(t, before - 1e-3)
+        self.assertLessEqual(t, time.time())
+
+    def test_bulk_receive(self):
+        for i in range(TEST_COUNT):
+            self.tx.send(frame(i, bytes([i])))
+        samples = []
+        while True:
+            frames = self.receiver.read_available()
+            if not frames:
+                break
+            self.assertLessEqual(len(frames), TEST_BATCH_FRAMES)
+            samples.extend(frames)
+        self.assertEqual(list(range(TEST_COUNT)), [s.arbitration_id for _, s in samples])
+        times = [t for t, _ in samples]
+        self.assertEqual(sorted(times), times)
+
+    def test_incomplete_frame(self):
+        self.tx.send(b"\x00" * 4)
+        self.tx.send(frame(1, b"\x01"))
+        self.assertEqual([1], [s.arbitration_id for _, s in self.receiver.read_available()])
+
+
+class CanFrameDecodeTests(TestCase):
+
+    def test_extended_id(self):
+        sample = decode_can_fields(0x12345678 | CAN_EFF_FLAG, 2, b"\x01\x02" + bytes(6))
+        self.assertEqual(CanSample(0x12345678, b"\x01\x02", 2, CAN_EFF_FLAG), sample)
+
+    def test_standard_id_masked(self):
+        self.assertEqual(0x7ff, decode_can_fields(0xffff, 0, bytes(8)).arbitration_id)
+
+    def test_dlc_clipped(self):
+        self.assertEqual(8, decode_can_fields(1, 15, bytes(8)).dlc)
+
+    def test_missing_timestamp(self):
+        before = time.time()
+        self.assertGreaterEqual(get_rx_timestamp([]), before)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# Copyright 2026 Donour Sizemore
+#
+# This file is part of RacePi
+#
+# RacePi is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 2
+#
+# RacePi is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RacePi.  If not, see <http://www.gnu.org/licenses/>.
+
+import time
+from unittest import TestCase, main
+
+from racepi.can.data import CanSample, CAN_EFF_FLAG
+from racepi.sensor.handler.stn11xx import STNLineReader, STNHandler
+from racepi.sensor.handler.stn11xx_can import STN11XXCanSensorHandler
+
+DEVICE_RESPONSES = {
+    'atz': "\r\rELM327 v1.3a",
+    'ati': "ELM327 v1.3a",
+    'sti': "STN1110 v4.2.0",
+    'at@1': "OBDLink SX",
+    '0111': "4111A0",
+    '0105': "NO DATA",
+}
+
+
+class FakeSerialPort:
+    """
+    Serial port returning scripted chunks of output, one chunk per read
+    """
+
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+        self.reads = 0
+
+    @property
+    def in_waiting(self):
+        return len(self.chunks[0]) if self.chunks else 0
+
+    def read(self, size=1):
+        self.reads += 1
+        if not self.chunks:
+            return b''  # timeout
+        chunk = self.chunks.pop(0)
+        if size < len(chunk):
+            self.chunks.insert(0, chunk[size:])
+        return chunk[:size]
+
+
+class FakeSTNDevice(FakeSerialPort):
+    """
+    Serial port answering commands like an STN11xx, commands that are
+    not listed respond OK
+    """
+
+    def __init__(self, responses=DEVICE_RESPONSES, silent=()):
+        FakeSerialPort.__init__(self, [])
+        self.responses = responses
+        self.silent = silent
+        self.commands = []
+
+    def flushInput(self):
+        self.chunks = []
+
+    def flushOutput(self):
+        pass
+
+    def write(self, data):
+        cmd = data.decode().strip()
+        self.commands.append(cmd)
+        if cmd not in self.silent:
+            self.chunks.append((self.responses.get(cmd, "OK") + "\r\r>").encode())
+
+
+class FakeMonitoringSTNDevice(FakeSTNDevice):
+    """
+    Device in monitor mode, which takes the first command as an interrupt
+    """
+
+    def write(self, data):
+        if self.commands:
+            FakeSTNDevice.write(self, data)
+        else:
+            self.commands.append(data.decode().strip())
+            self.chunks.append(b"STOPPED\r\r>")
+
+
+class STNLineReaderTests(TestCase):
+
+    def test_timeout(self):
+        self.assertEqual([], STNLineReader(FakeSerialPort([])).read_lines())
+
+    def test_bulk_lines(self):
+        port = FakeSerialPort([b"085DEADBEEF\r114 01 02\r303AA\r"])
+        self.assertEqual(["085DEADBEEF", "114 01 02", "303AA"], STNLineReader(port).read_lines())
+        self.assertEqual(1, port.reads)
+
+    def test_timed_lines(self):
+        port = FakeSerialPort([b">085DEADBEEF\r\r303AA\r30"])
+        start = time.time()
+        timed = STNLineReader(port).read_timed_lines(0.001)
+        end = time.time()
+        self.assertEqual(["085DEADBEEF", "303AA"], [l for _, l in timed])
+        # each line ends a byte time per following byte before the read
+        times = [t for t, _ in timed]
+        self.assertAlmostEqual(0.007, times[1] - times[0], delta=1e-6)
+        self.assertTrue(start - 0.002 <= times[1] <= end - 0.002)
+        self.assertEqual([], STNLineReader(FakeSerialPort([])).read_timed_lines(0.001))
+
+    def test_partial_line(self):
+        reader = STNLineReader(FakeSerialPort([b"085DE", b"ADBEEF\r30", b"3AA\r"]))
+        self.assertEqual([], reader.read_lines())
+        self.assertEqual(["085DEADBEEF"], reader.read_lines())
+        self.assertEqual(["303AA"], reader.read_lines())
+
+    def test_prompt_and_empty_lines(self):
+        reader = STNLineReader(FakeSerialPort([b">ELM327 v1.3a\r\r>OK\r\r"]))
+        self.assertEqual(["ELM327 v1.3a", "OK"], reader.read_lines())
+
+    def test_clear(self):
+        reader = STNLineReader(FakeSerialPort([b"085DE", b"OK\r"]))
+        reader.read_lines()
+        reader.clear()
+        self.assertEqual(["OK"], reader.read_lines())
+
+    def test_read_response(self):
+        reader = STNLineReader(FakeSerialPort([b"41", b"0C1AF8\r\r", b">"]))
+        self.assertEqual(["410C1AF8"], reader.read_response(1.0))
+
+    def test_read_response_timeout(self):
+        reader = STNLineReader(FakeSerialPort([b"410C"]))
+        self.assertRaises(IOError, reader.read_response, 0.01)
+
+
+class STNHandlerTests(TestCase):
+
+    def test_init_without_sleeps(self):
+        port = FakeSTNDevice()
+        start = time.monotonic()
+        stn = STNHandler(port=port)
+        self.assertLess(time.monotonic() - start, 1.0)
+        self.assertEqual("STN1110 v4.2.0", stn.stn_version)
+        self.assertEqual(['atz', 'ATE0', 'ATL0', 'ATS0', 'ATAL', 'ATH1', 'ati', 'sti', 'at@1',
+                          'stp 33', 'atsp 6'], port.commands)
+
+    def test_reset_retried(self):
+        port = FakeMonitoringSTNDevice()
+        STNHandler(port=port)
+        self.assertEqual(['atz', 'atz'], port.commands[:2])
+
+    def test_config_failure(self):
+        responses = dict(DEVICE_RESPONSES)
+        responses['ATAL'] = "?"
+        self.assertRaises(IOError, STNHandler, port=FakeSTNDevice(responses))
+
+    def test_command_timeout(self):
+        stn = STNHandler(port=FakeSTNDevice())
+        stn.port.silent = ('0100',)
+        self.assertRaises(IOError, stn.send_request, '0100', 0.01)
+
+    def test_get_pid(self):
+        stn = STNHandler(port=FakeSTNDevice())
+        self.assertEqual("4111A0", stn.get_pid("01", "11"))
+        self.assertIsNone(stn.get_pid("01", "05"))
+
+    def test_set_monitor_ids(self):
+        stn = STNHandler(port=FakeSTNDevice())
+        stn.set_monitor_ids([0x85, 0x18daf110])
+        self.assertEqual(['stfcp', 'stfcb', 'stfab FFF,FFF', 'stfap 085,7ff', 'stfap 18daf110,1fffffff'],
+                         stn.port.commands[-5:])
+        self.assertIsNone(stn.monitor_extended)
+        stn.set_monitor_ids([0x85])
+        self.assertFalse(stn.monitor_extended)
+
+
+class STN11XXCanSensorHandlerTests(TestCase):
+
+    def setUp(self):
+        self.handler = STN11XXCanSensorHandler()
+        self.handler.stn = STNHandler(port=FakeSTNDevice())
+
+    def test_send_lines(self):
+        self.handler.stn.set_monitor_ids([0x85, 0x18daf110])
+        self.handler.send_lines([(1.0, "18DAF1100211223344"), (2.0, "085DEADBEEF"), (3.0, "CAN ERROR")])
+        data = self.handler.get_all_data()
+        self.assertEqual([(1.0, CanSample.create(0x18daf110, b'\x02\x11\x22\x33\x44', CAN_EFF_FLAG)),
+                          (2.0, CanSample.create(0x85, b'\xde\xad\xbe\xef'))], data)
+
+    def test_send_lines_standard_only(self):
+        # a garbled line of even length is not taken for an extended frame
+        self.handler.stn.set_monitor_ids([0x85])
+        self.handler.send_lines([(1.0, "085DEADBE"), (2.0, "085DEADBEEF0")])
+        self.assertEqual([(1.0, CanSample.create(0x85, b'\xde\xad\xbe'))], self.handler.get_all_data())
+
+
+if __name__ == "__main__":
+    main()
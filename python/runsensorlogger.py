@@ -19,10 +19,14 @@
 import os
 
 from racepi.sensor.data_utilities import uptime_helper
+from racepi.sensor.recorder.flight_recorder import get_flight_log_dir
 from racepi.sensor.recorder.sensor_log import SensorLogger
 from racepi.database.db_handler import DbHandler
+from racepi.database.session_cache import SessionCache, get_cache_dir
+from racepi.sensor.handler.async_ingest import AsyncIngestLoop
 from racepi.sensor.handler.gps import GpsSensorHandler
 from racepi.sensor.handler.pi_sense_hat_imu import RpiImuSensorHandler
+from racepi.sensor.handler.sensor_handler import SensorHandler
 from racepi.sensor.handler.stn11xx_can import STN11XXCanSensorHandler
 
 # TODO: move the DB filename to a config file in /etc
@@ -32,6 +36,12 @@ FORD_FOCUS_RS_CAN_IDS  = [0x010, 0x070, 0x080, 0x090, 0x190, 0x130, 0x213, 0x420
 LOTUS_EVORA_S1_CAN_IDS = [0x085, 0x114, 0x303]
 ACTIVE_CAN_IDS = LOTUS_EVORA_S1_CAN_IDS
 DBC_FILENAME = os.environ['HOME'] + "/git/racepi/dbc/evora.dbc"
+# read socket based sensors in the logger process instead of handler processes
+USE_ASYNC_INGEST = False
+# record sessions to flight recorder logs next to the database, see ingestflightlogs.py
+USE_FLIGHT_RECORDER = True
+# can frames sent to the logger per pipe message, held at most the default 5ms
+CAN_BATCH_SIZE = 32
 ENDCOLOR  = '\033[0m'
 UNDERLINE = '\033[4m'
 
@@ -51,17 +61,31 @@ if __name__ == "__main__":
     print(UNDERLINE+"Starting RacePi Sensor Logger"+ENDCOLOR)
 
     print("Opening Sensor Handlers")
+    ingest = AsyncIngestLoop() if USE_ASYNC_INGEST else None
     handlers = {
-        'gps': GpsSensorHandler(),
+        'gps': ingest.add_gps() if ingest else GpsSensorHandler(),
         'imu': RpiImuSensorHandler(),
         # 'can': SocketCanSensorHandler(can_filters=ACTIVE_CAN_IDS),
+        # 'can': ingest.add_socketcan(can_filters=ACTIVE_CAN_IDS),
         'can': STN11XXCanSensorHandler(ACTIVE_CAN_IDS),
         # 'tpms': LightSpeedTPMSSensorHandler(),
     }
+    # handlers run by the async ingest loop do not use the pipe transport
+    if isinstance(handlers['can'], SensorHandler):
+        handlers['can'].set_batching(CAN_BATCH_SIZE)
 
     print("Opening Database: %s" % dbfile)
     # TODO: look at opening DB as needed
     # to avoid corruption of tables
     db_handler = DbHandler(dbfile)
-    sl = SensorLogger(db_handler, handlers, DBC_FILENAME)
+    session_cache = SessionCache(get_cache_dir(dbfile))
+    if not session_cache.is_available():
+        print("pyarrow not found, session cache disabled")
+        session_cache = None
+    flight_recorder_dir = None
+    if USE_FLIGHT_RECORDER:
+        flight_recorder_dir = get_flight_log_dir(dbfile)
+        os.makedirs(flight_recorder_dir, exist_ok=True)
+    sl = SensorLogger(db_handler, handlers, DBC_FILENAME, session_cache=session_cache,
+                      flight_recorder_dir=flight_recorder_dir)
     sl.start()
@@ -18,6 +18,7 @@
 
 from sqlalchemy import create_engine
 from racepi_webapp import app
+from racepi.database.session_cache import SessionCache, get_cache_dir
 
 DEFAULT_SQLITE_FILE = '/external/racepi_data/test.db'
 #DEFAULT_SQLITE_FILE = '/home/donour/houston.db'
@@ -31,6 +32,7 @@ if __name__ == "__main__":
         dbfile = sys.argv[1]
 
     app.db = create_engine("sqlite:///"+dbfile)
+    app.session_cache = SessionCache(get_cache_dir(dbfile))
     # FIXME: disabling debugging causes 100% cpu usage, notifier?
     app.run(host='0.0.0.0', debug=True, threaded=True)
 
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# Copyright 2026 Donour Sizemore
+#
+# This file is part of RacePi
+#
+# RacePi is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 2.
+#
+# RacePi is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RacePi.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Write the columnar session cache for sessions recorded before the cache
+was enabled. Sessions already cached are skipped unless --rebuild is given.
+"""
+
+import sys
+
+from racepi.database.db_handler import DbHandler
+from racepi.database.objects import Session
+from racepi.database.session_cache import SessionCache, get_cache_dir
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if a != '--rebuild']
+    if not args:
+        print("Usage: %s [--rebuild] <sqlite db filename> [session id ...]" % sys.argv[0])
+        sys.exit(1)
+    rebuild = len(args) < len(sys.argv) - 1
+    dbfile = args[0]
+
+    cache = SessionCache(get_cache_dir(dbfile))
+    if not cache.is_available():
+        print("pyarrow is required to build the session cache")
+        sys.exit(1)
+
+    h = DbHandler(dbfile)
+    h.connect()
+    session_ids = args[1:] or [s.id for s in h.db_session.query(Session.id)]
+    for session_id in session_ids:
+        if cache.has_session(session_id) and not rebuild:
+            continue
+        print("Caching session %s" % session_id)
+        cache.write_session(h.db_session, session_id)
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# Copyright 2026 Donour Sizemore
+#
+# This file is part of RacePi
+#
+# RacePi is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 2.
+#
+# RacePi is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RacePi.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Micro-benchmark of DataBuffer sample expiry, as done by the logger in
+the ready state. A pre-trigger buffer of the specified size is filled
+and then a number of 30ms ticks are simulated, each adding new samples
+and expiring the oldest ones.
+"""
+
+import sys
+import time
+from collections import defaultdict
+
+from racepi.sensor.recorder.data_buffer import DataBuffer
+
+BUFFER_SIZES = [1000, 10000, 100000]
+BUFFER_SECONDS = 10.0
+TICK_SECONDS = 0.03
+TICKS = 100
+
+
+class ListDataBuffer:
+    """Previous list based implementation, for comparison"""
+    def __init__(self):
+        self.data = defaultdict(list)
+
+    def add_sample(self, source_name, values):
+        self.data[source_name].extend(values)
+
+    def expire_old_samples(self, expire_time):
+        for k in self.data:
+            while self.data[k] and self.data[k][0][0] < expire_time:
+                self.data[k].pop(0)
+
+
+def run(buffer_class, size):
+    b = buffer_class()
+    interval = BUFFER_SECONDS / size
+    per_tick = max(1, int(TICK_SECONDS / interval))
+    b.add_sample('can', [(i * interval, 'data') for i in range(size)])
+
+    t = BUFFER_SECONDS
+    start = time.perf_counter()
+    for _ in range(TICKS):
+        b.add_sample('can', [(t + i * interval, 'data') for i in range(per_tick)])
+        t += per_tick * interval
+        b.expire_old_samples(t - BUFFER_SECONDS)
+    return (time.perf_counter() - start) / TICKS
+
+
+if __name__ == "__main__":
+    sizes = [int(x) for x in sys.argv[1:]] or BUFFER_SIZES
+    print("%10s %14s %14s" % ("samples", "list (ms)", "buffer (ms)"))
+    for n in sizes:
+        old = run(ListDataBuffer, n)
+        new = run(DataBuffer, n)
+        print("%10d %14.3f %14.3f" % (n, old * 1e3, new * 1e3))
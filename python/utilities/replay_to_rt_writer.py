@@ -26,12 +26,14 @@ import time
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
+from racepi.can.data import CanSample
 from racepi.racetech.writers import RaceTechnologyDL1FeedWriter
 from racepi_database_handler import Base, SessionInfo, GPSData, IMUData, CANData
-from racepi.sensor.data_utilities import merge_and_generate_ordered_log
+from racepi.sensor.data_utilities import iter_ordered_log
 
 
 BLUETOOTH_CLIENT_WAIT_SECONDS = 0.1
+QUERY_BATCH_SIZE = 1000
 
 
 def replay(db_file, session_id):
@@ -53,20 +55,23 @@ def replay(db_file, session_id):
             continue  # skip if different session_id specified
 
         data = {}
-        # load all data for session
-        gps_data = s.query(GPSData).filter(GPSData.session_id == si.session_id).all()
-        imu_data = s.query(IMUData).filter(IMUData.session_id == si.session_id).all()
-        can_data = s.query(CANData).filter(CANData.session_id == si.session_id).all()
+        # stream session data in time order, using the session time indexes
+        gps_data = s.query(GPSData).filter(GPSData.session_id == si.session_id)\
+            .order_by(GPSData.timestamp).yield_per(QUERY_BATCH_SIZE)
+        imu_data = s.query(IMUData).filter(IMUData.session_id == si.session_id)\
+            .order_by(IMUData.timestamp).yield_per(QUERY_BATCH_SIZE)
+        can_data = s.query(CANData).filter(CANData.session_id == si.session_id)\
+            .order_by(CANData.timestamp).yield_per(QUERY_BATCH_SIZE)
 
         # construct replay messages
-        data['gps'] = [(x.timestamp, {'speed': x.speed, 'lat': x.lat, 'lon': x.lon, 'alt': x.alt})
-                       for x in gps_data]
-        data['imu'] = [(x.timestamp, {'accel': (x.x_accel, x.y_accel, x.z_accel)})
-                       for x in imu_data]
-        data['can'] = [(x.timestamp, "%03x%s" % (x.arbitration_id, x.msg))
-                       for x in can_data]
-
-        flat_data = merge_and_generate_ordered_log(data)
+        data['gps'] = ((x.timestamp, {'speed': x.speed, 'lat': x.lat, 'lon': x.lon, 'alt': x.alt})
+                       for x in gps_data)
+        data['imu'] = ((x.timestamp, {'accel': (x.x_accel, x.y_accel, x.z_accel)})
+                       for x in imu_data)
+        data['can'] = ((x.timestamp, CanSample.create(x.arbitration_id, x.msg))
+                       for x in can_data)
+
+        flat_data = iter_ordered_log(data)
 
         for val in flat_data:
             if val:
@@ -24,7 +24,9 @@ CREATE TABLE can_data
 	timestamp DATETIME NOT NULL,
 	arbitration_id integer NOT NULL, -- base (11bit) or extended (29bit)
 	rtr integer NOT NULL,            -- 0 for data frames, 1 for data requests
-	msg BLOB NOT NULL,               -- data payload, string of 8 hexidecimal bytes	
+	msg BLOB NOT NULL,               -- data payload, up to 8 bytes
 	FOREIGN KEY(session_id) REFERENCES sessions(id)
-);COMMIT;
+);
+CREATE INDEX ix_can_data_session_id_time ON can_data (session_id, arbitration_id, timestamp);
+COMMIT;
 --============================================================================
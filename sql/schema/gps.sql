@@ -32,5 +32,7 @@ CREATE TABLE gps_data
 	epv DOUBLE,
     alt DOUBLE,
 	FOREIGN KEY(session_id) REFERENCES sessions(id)
-);COMMIT;
+);
+CREATE INDEX ix_gps_data_session_time ON gps_data (session_id, timestamp);
+COMMIT;
 --============================================================================
\ No newline at end of file
@@ -32,5 +32,7 @@ CREATE TABLE imu_data
 	y_gyro DOUBLE,	
 	z_gyro DOUBLE,
 	FOREIGN KEY(session_id) REFERENCES sessions(id)
-);COMMIT;
+);
+CREATE INDEX ix_imu_data_session_time ON imu_data (session_id, timestamp);
+COMMIT;
 --============================================================================
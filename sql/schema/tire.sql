@@ -39,5 +39,7 @@ CREATE TABLE tire_data
 
 
 	FOREIGN KEY(session_id) REFERENCES sessions(id)
-);COMMIT;
+);
+CREATE INDEX ix_tire_data_session_time ON tire_data (session_id, timestamp);
+COMMIT;
 --============================================================================